@@ -0,0 +1,38 @@
+from logging.config import fileConfig
+
+from alembic import context
+
+from app.core.database import Base, engine
+from app.models import sql_models  # noqa: F401 - rejestruje tabele w Base.metadata
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline() -> None:
+    """Generuje SQL bez połączenia z bazą (`alembic upgrade head --sql`)."""
+    context.configure(
+        url=str(engine.url),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        render_as_batch=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    with engine.connect() as connection:
+        # render_as_batch - SQLite nie obsługuje większości ALTER TABLE
+        context.configure(connection=connection, target_metadata=target_metadata, render_as_batch=True)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,27 @@
+"""Indeksy złożone (owner_id, date) dla dziennych odczytów
+
+Tabele tworzy Base.metadata.create_all przy starcie aplikacji, ale nie dodaje ona indeksów
+do już istniejących tabel - stąd ta migracja. if_not_exists, bo nowa baza ma je od razu.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16
+"""
+from alembic import op
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+TABLES = ("meals", "water_entries", "workouts", "weight_entries")
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.create_index(f"ix_{table}_owner_id_date", table, ["owner_id", "date"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_owner_id_date", table_name=table, if_exists=True)
@@ -0,0 +1,36 @@
+"""Tabela daily_totals (zmaterializowane sumy dnia)
+
+Po migracji tabelę wypełnia: python scripts/rebuild_daily_totals.py
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Przy świeżej bazie tabelę tworzy już create_all przy starcie aplikacji
+    if sa.inspect(op.get_bind()).has_table("daily_totals"):
+        return
+    op.create_table(
+        "daily_totals",
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("date", sa.Date(), primary_key=True),
+        sa.Column("calories", sa.Float(), nullable=False),
+        sa.Column("protein", sa.Float(), nullable=False),
+        sa.Column("fat", sa.Float(), nullable=False),
+        sa.Column("carbs", sa.Float(), nullable=False),
+        sa.Column("water_ml", sa.Integer(), nullable=False),
+        sa.Column("calories_burned", sa.Integer(), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("daily_totals")
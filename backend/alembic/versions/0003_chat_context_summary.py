@@ -0,0 +1,32 @@
+"""Streszczenie kontekstu czatu i indeks ostatnich wiadomości wątku
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = {col["name"] for col in sa.inspect(op.get_bind()).get_columns("conversations")}
+    with op.batch_alter_table("conversations") as batch_op:
+        if "context_summary" not in existing:
+            batch_op.add_column(sa.Column("context_summary", sa.Text(), nullable=True))
+        if "summarized_until_id" not in existing:
+            batch_op.add_column(sa.Column("summarized_until_id", sa.Integer(), nullable=True))
+    op.create_index(
+        "ix_chat_messages_conversation_id_id", "chat_messages", ["conversation_id", "id"], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_chat_messages_conversation_id_id", table_name="chat_messages", if_exists=True)
+    with op.batch_alter_table("conversations") as batch_op:
+        batch_op.drop_column("summarized_until_id")
+        batch_op.drop_column("context_summary")
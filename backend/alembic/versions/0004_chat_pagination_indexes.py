@@ -0,0 +1,28 @@
+"""Indeksy do stronicowania listy rozmów i historii wiadomości
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_chat_messages_conversation_id_created_at", "chat_messages",
+        ["conversation_id", "created_at", "id"], if_not_exists=True
+    )
+    op.create_index(
+        "ix_conversations_user_id_pinned_created_at", "conversations",
+        ["user_id", "is_pinned", "created_at", "id"], if_not_exists=True
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_conversations_user_id_pinned_created_at", table_name="conversations", if_exists=True)
+    op.drop_index("ix_chat_messages_conversation_id_created_at", table_name="chat_messages", if_exists=True)
@@ -0,0 +1,62 @@
+"""Synonimy nazw (dawny SYNONYM_MAP) jako aliasy produktów i dań
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+# Nazwa w bazie -> synonimy, które dotąd były wpisane na sztywno w app/core/units.py
+SYNONYMS = {
+    "kotlet de volaille": ["dewolaj", "devolay", "kotlet po kijowsku"],
+    "podudzie z kurczaka": ["pałka z kurczaka", "nóżka z kurczaka"],
+    "kotlet schabowy": ["schabowy"],
+    "kotlet mielony": ["mielony"],
+}
+
+
+def _food_tables():
+    return [
+        sa.table(name, sa.column("id", sa.Integer), sa.column("name", sa.String), sa.column("aliases", sa.JSON))
+        for name in ("products", "dishes")
+    ]
+
+
+def _update_aliases(add: bool) -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    changed = False
+    for table in _food_tables():
+        if not inspector.has_table(table.name):
+            continue
+        for name, synonyms in SYNONYMS.items():
+            rows = bind.execute(
+                sa.select(table.c.id, table.c.aliases).where(sa.func.lower(table.c.name) == name)
+            ).all()
+            for row_id, aliases in rows:
+                current = list(aliases or [])
+                if add:
+                    updated = current + [s for s in synonyms if s not in current]
+                else:
+                    updated = [a for a in current if a not in synonyms]
+                if updated != current:
+                    bind.execute(sa.update(table).where(table.c.id == row_id).values(aliases=updated))
+                    changed = True
+
+    # Workery przeładują leksykon przy najbliższym sprawdzeniu wersji
+    if changed and inspector.has_table("food_lexicon_version"):
+        bind.execute(sa.text("UPDATE food_lexicon_version SET version = version + 1 WHERE id = 1"))
+
+
+def upgrade() -> None:
+    _update_aliases(add=True)
+
+
+def downgrade() -> None:
+    _update_aliases(add=False)
@@ -0,0 +1,45 @@
+"""Indeks wyszukiwania użytkowników (FTS5 z trigramami + indeksy prefiksowe)
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+# Te same instrukcje wykonuje crud.ensure_user_search_index przy starcie aplikacji (dla świeżych baz)
+USER_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5("
+    "email, name, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_search(rowid, email, name) VALUES (new.id, new.email, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_search(users_search, rowid, email, name) VALUES ('delete', old.id, old.email, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF email, name ON users BEGIN "
+    "INSERT INTO users_search(users_search, rowid, email, name) VALUES ('delete', old.id, old.email, old.name); "
+    "INSERT INTO users_search(rowid, email, name) VALUES (new.id, new.email, new.name); END",
+    "CREATE INDEX IF NOT EXISTS ix_users_lower_email ON users (lower(email))",
+    "CREATE INDEX IF NOT EXISTS ix_users_lower_name ON users (lower(name))",
+]
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    exists = sa.inspect(bind).has_table("users_search")
+    for statement in USER_SEARCH_DDL:
+        op.execute(statement)
+    if not exists:
+        op.execute("INSERT INTO users_search(users_search) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    for trigger in ("users_search_ai", "users_search_ad", "users_search_au"):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP INDEX IF EXISTS ix_users_lower_email")
+    op.execute("DROP INDEX IF EXISTS ix_users_lower_name")
+    op.execute("DROP TABLE IF EXISTS users_search")
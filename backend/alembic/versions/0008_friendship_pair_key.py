@@ -0,0 +1,62 @@
+"""Uporządkowana para w friendships (unikalny klucz) i indeksy po obu stronach relacji
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def _drop_duplicate_pairs(bind) -> None:
+    """Zostawia jedną relację na parę użytkowników: zaakceptowaną, a jeśli takiej nie ma - najstarszą."""
+    rows = bind.execute(sa.text(
+        "SELECT id, user_low_id, user_high_id, status FROM friendships ORDER BY user_low_id, user_high_id, id"
+    )).all()
+    kept = {}
+    duplicates = []
+    for row_id, low, high, status in rows:
+        pair = (low, high)
+        if pair not in kept:
+            kept[pair] = (row_id, status)
+        elif status == "ACCEPTED" and kept[pair][1] != "ACCEPTED":
+            duplicates.append(kept[pair][0])
+            kept[pair] = (row_id, status)
+        else:
+            duplicates.append(row_id)
+    if duplicates:
+        bind.execute(sa.text("DELETE FROM friendships WHERE id IN :ids").bindparams(sa.bindparam("ids", expanding=True)),
+                     {"ids": duplicates})
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing = {col["name"] for col in sa.inspect(bind).get_columns("friendships")}
+    if "user_low_id" not in existing:
+        with op.batch_alter_table("friendships") as batch_op:
+            batch_op.add_column(sa.Column("user_low_id", sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column("user_high_id", sa.Integer(), nullable=True))
+        # Skalarne min()/max() SQLite z dwoma argumentami
+        op.execute("UPDATE friendships SET user_low_id = min(user_id, friend_id), user_high_id = max(user_id, friend_id)")
+        _drop_duplicate_pairs(bind)
+        with op.batch_alter_table("friendships") as batch_op:
+            batch_op.alter_column("user_low_id", existing_type=sa.Integer(), nullable=False)
+            batch_op.alter_column("user_high_id", existing_type=sa.Integer(), nullable=False)
+
+    op.create_index("ux_friendships_pair", "friendships", ["user_low_id", "user_high_id"], unique=True, if_not_exists=True)
+    op.create_index("ix_friendships_user_id_status", "friendships", ["user_id", "status"], if_not_exists=True)
+    op.create_index("ix_friendships_friend_id_status", "friendships", ["friend_id", "status"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_friendships_friend_id_status", table_name="friendships", if_exists=True)
+    op.drop_index("ix_friendships_user_id_status", table_name="friendships", if_exists=True)
+    op.drop_index("ux_friendships_pair", table_name="friendships", if_exists=True)
+    with op.batch_alter_table("friendships") as batch_op:
+        batch_op.drop_column("user_high_id")
+        batch_op.drop_column("user_low_id")
@@ -0,0 +1,30 @@
+"""Dzierżawa wierszy user_challenges przez worker weryfikacji wyzwań
+
+Kolumna verification_claimed_at pozwala kilku workerom (i ręcznemu wyzwalaczowi) dzielić pracę
+bez podwójnych werdyktów, a indeks (status, end_date) - tanio znaleźć wygasłe, aktywne wyzwania.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = {col["name"] for col in sa.inspect(op.get_bind()).get_columns("user_challenges")}
+    if "verification_claimed_at" not in existing:
+        with op.batch_alter_table("user_challenges") as batch_op:
+            batch_op.add_column(sa.Column("verification_claimed_at", sa.DateTime(), nullable=True))
+    op.create_index("ix_user_challenges_status_end_date", "user_challenges", ["status", "end_date"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_user_challenges_status_end_date", table_name="user_challenges", if_exists=True)
+    with op.batch_alter_table("user_challenges") as batch_op:
+        batch_op.drop_column("verification_claimed_at")
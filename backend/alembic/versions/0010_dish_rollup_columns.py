@@ -0,0 +1,40 @@
+"""Kolumny podsumowań dań (waga przepisu, stan, makro na 100g)
+
+Dotąd dodawał je ręcznie skrypt scripts/rebuild_dish_rollups.py; teraz robi to migracja,
+a skrypt tylko przelicza wartości. Puste podsumowania leksykon liczy w locie ze składników.
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+ROLLUP_COLUMNS = [
+    ("total_weight_g", sa.Float()),
+    ("state", sa.String(length=6)),
+    ("calories_per_100g", sa.Float()),
+    ("protein_per_100g", sa.Float()),
+    ("fat_per_100g", sa.Float()),
+    ("carbs_per_100g", sa.Float()),
+]
+
+
+def upgrade() -> None:
+    existing = {col["name"] for col in sa.inspect(op.get_bind()).get_columns("dishes")}
+    missing = [(name, type_) for name, type_ in ROLLUP_COLUMNS if name not in existing]
+    if missing:
+        with op.batch_alter_table("dishes") as batch_op:
+            for name, type_ in missing:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("dishes") as batch_op:
+        for name, _ in reversed(ROLLUP_COLUMNS):
+            batch_op.drop_column(name)
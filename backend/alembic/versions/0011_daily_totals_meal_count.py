@@ -0,0 +1,32 @@
+"""Liczba posiłków w daily_totals (dzień z samą wodą lub treningiem to nie dzień z jedzeniem)
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    existing = {col["name"] for col in sa.inspect(op.get_bind()).get_columns("daily_totals")}
+    if "meal_count" in existing:
+        return
+    with op.batch_alter_table("daily_totals") as batch_op:
+        batch_op.add_column(sa.Column("meal_count", sa.Integer(), nullable=False, server_default="0"))
+    # Tak samo jak crud.refresh_daily_totals: posiłki, które mają choć jeden wpis
+    op.execute(
+        "UPDATE daily_totals SET meal_count = ("
+        "SELECT count(DISTINCT meals.id) FROM meals JOIN meal_entries ON meal_entries.meal_id = meals.id "
+        "WHERE meals.owner_id = daily_totals.owner_id AND meals.date = daily_totals.date)"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("daily_totals") as batch_op:
+        batch_op.drop_column("meal_count")
@@ -0,0 +1,73 @@
+"""Kolumny search_email/search_name (małe litery wg Unicode) zamiast indeksów na lower()
+
+lower() w SQLite zmienia tylko litery ASCII, więc wyszukiwanie prefiksem "łuk" nie trafiało w "Łukasz".
+Kolumny wypełniamy w Pythonie (str.lower), dalej utrzymuje je zdarzenie ORM przy zapisie użytkownika.
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-17
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0012"
+down_revision = "0011"
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+# Kopia wyzwalaczy z 0007 - przebudowa tabeli users (batch w downgrade) usuwa je razem ze starą tabelą
+USER_SEARCH_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_search(rowid, email, name) VALUES (new.id, new.email, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_search(users_search, rowid, email, name) VALUES ('delete', old.id, old.email, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF email, name ON users BEGIN "
+    "INSERT INTO users_search(users_search, rowid, email, name) VALUES ('delete', old.id, old.email, old.name); "
+    "INSERT INTO users_search(rowid, email, name) VALUES (new.id, new.email, new.name); END",
+]
+
+
+def _backfill(bind) -> None:
+    users = sa.table(
+        "users", sa.column("id", sa.Integer), sa.column("email", sa.String), sa.column("name", sa.String),
+        sa.column("search_email", sa.String), sa.column("search_name", sa.String),
+    )
+    rows = bind.execute(sa.select(users.c.id, users.c.email, users.c.name)).all()
+    update = (
+        sa.update(users).where(users.c.id == sa.bindparam("user_id"))
+        .values(search_email=sa.bindparam("new_email"), search_name=sa.bindparam("new_name"))
+    )
+    for start in range(0, len(rows), BATCH_SIZE):
+        bind.execute(update, [
+            {"user_id": user_id, "new_email": email.lower() if email else None, "new_name": name.lower() if name else None}
+            for user_id, email, name in rows[start:start + BATCH_SIZE]
+        ])
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    existing = {col["name"] for col in sa.inspect(bind).get_columns("users")}
+    if "search_email" not in existing:
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.add_column(sa.Column("search_email", sa.String(), nullable=True))
+            batch_op.add_column(sa.Column("search_name", sa.String(), nullable=True))
+    _backfill(bind)
+    op.create_index("ix_users_search_email", "users", ["search_email"], if_not_exists=True)
+    op.create_index("ix_users_search_name", "users", ["search_name"], if_not_exists=True)
+    op.execute("DROP INDEX IF EXISTS ix_users_lower_email")
+    op.execute("DROP INDEX IF EXISTS ix_users_lower_name")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_search_name", table_name="users", if_exists=True)
+    op.drop_index("ix_users_search_email", table_name="users", if_exists=True)
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("search_name")
+        batch_op.drop_column("search_email")
+    # Po przebudowie tabeli (batch) - inaczej wyzwalacze FTS i indeksy wyrażeniowe by przepadły
+    for statement in USER_SEARCH_TRIGGERS:
+        op.execute(statement)
+    op.execute("CREATE INDEX IF NOT EXISTS ix_users_lower_email ON users (lower(email))")
+    op.execute("CREATE INDEX IF NOT EXISTS ix_users_lower_name ON users (lower(name))")
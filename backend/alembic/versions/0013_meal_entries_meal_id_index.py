@@ -0,0 +1,23 @@
+"""Indeks meal_entries.meal_id dla wczytywania wpisów posiłków
+
+Wpisy posiłków dnia wczytuje selectinload (meal_id IN (...)); bez indeksu każde takie zapytanie
+przeszukiwało całą tabelę meal_entries. if_not_exists, bo nowa baza (create_all) ma go od razu.
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-17
+"""
+from alembic import op
+
+revision = "0013"
+down_revision = "0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_meal_entries_meal_id", "meal_entries", ["meal_id"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_meal_entries_meal_id", table_name="meal_entries", if_exists=True)
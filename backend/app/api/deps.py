@@ -1,38 +1,72 @@
-from typing import Generator, Optional
+from typing import Generator, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
+from app.crud import crud_async
+from app.core.principal_cache import principal_cache
 from app.models.sql_models import User
-from app.core.security import verify_password
+from app.core.security import verify_password, verify_and_update_password_async
 
 # To mówi FastAPI, że token przychodzi w nagłówku "Authorization: Bearer ..."
 # UWAGA: tokenUrl musi wskazywać na Twój endpoint logowania
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/users/login")
 
-def get_current_user(
-    db: Session = Depends(get_db),
-    token: str = Depends(oauth2_scheme)
-) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _principal_from_token(token: str) -> Tuple[str, Optional[int]]:
+    """Dekoduje token JWT i zwraca e-mail użytkownika (pole 'sub') oraz jego id (pole 'uid', jeśli jest)."""
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
+            raise _credentials_exception()
     except JWTError:
-        raise credentials_exception
-    
-    user = db.query(User).filter(User.email == email).first()
-    if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return email, payload.get("uid")
+
+def get_current_user(
+    db: Session = Depends(get_db),
+    token: str = Depends(oauth2_scheme)
+) -> User:
+    email, user_id = _principal_from_token(token)
+    cached = principal_cache.get(user_id=user_id, email=email)
+    if cached is not None:
+        return db.merge(cached, load=False)
+
+    query = db.query(User)
+    user = query.filter(User.id == user_id).first() if user_id is not None else query.filter(User.email == email).first()
+    if user is None or user.email != email:
+        raise _credentials_exception()
+    principal_cache.put(user)
+    return user
+
+async def get_current_user_async(
+    db: AsyncSession = Depends(get_async_db),
+    token: str = Depends(oauth2_scheme)
+) -> User:
+    """Odpowiednik get_current_user dla endpointów asynchronicznych (użytkownik z tej samej AsyncSession)."""
+    email, user_id = _principal_from_token(token)
+    cached = principal_cache.get(user_id=user_id, email=email)
+    if cached is not None:
+        return await db.merge(cached, load=False)
+
+    if user_id is not None:
+        user = await crud_async.get_user_by_id(db, user_id=user_id)
+    else:
+        user = await crud_async.get_user_by_email(db, email=email)
+    if user is None or user.email != email:
+        raise _credentials_exception()
+    principal_cache.put(user)
     return user
 
 def authenticate_user(db: Session, email: str, password: str):
@@ -42,4 +76,21 @@ def authenticate_user(db: Session, email: str, password: str):
         return False
     if not verify_password(password, user.hashed_password):
         return False
+    return user
+
+async def authenticate_user_async(db: AsyncSession, email: str, password: str):
+    """
+    Jak authenticate_user, ale bcrypt liczy się w puli procesów (nie blokuje pętli ani wątków).
+    Jeśli hash ma nieaktualny koszt (BCRYPT_ROUNDS), przy okazji zapisujemy nowy.
+    """
+    user = await crud_async.get_user_by_email(db, email=email)
+    # Konta z logowaniem Google nie mają hasła
+    if not user or not user.hashed_password:
+        return False
+    is_valid, new_hash = await verify_and_update_password_async(password, user.hashed_password)
+    if not is_valid:
+        return False
+    if new_hash:
+        user.hashed_password = new_hash
+        await db.commit()
     return user
\ No newline at end of file
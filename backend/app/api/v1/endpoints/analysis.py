@@ -1,17 +1,18 @@
-from typing import Any, Dict
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Any, Dict, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import datetime, timedelta, date
 import json
 
-from app.core.database import get_db
-from app.api import deps
-from app.api.deps import get_current_user
-from app.crud import crud_base as crud
+from app.core.config import settings
+from app.core.database import get_async_db
+from app.api.deps import get_current_user_async
+from app.crud import crud_async
 from app.models import sql_models as models
 from app.schemas import all_schemas as schemas
 # Importujemy poprawiony serwis AI (z funkcją analyze_meal_text)
 from app.services import legacy_analyzer as ai_analyzer
+from app.services import trends
 
 router = APIRouter()
 
@@ -43,11 +44,28 @@ async def analyze_meal_endpoint(
         raise HTTPException(status_code=500, detail=f"Błąd serwera: {e}")
 
 
+@router.post("/meal/items", response_model=schemas.MealItemsAnalysisResponse)
+async def analyze_meal_items_endpoint(
+    request: schemas.MealItemsAnalysisRequest,
+):
+    """
+    Analiza kilku pozycji z jednego zdania - wynik dla każdej pozycji i suma posiłku.
+    Nieznane pozycje są douczane jednym wspólnym zapytaniem do AI.
+    """
+    try:
+        return await ai_analyzer.analyze_meal_items(request.text)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        print(f"Błąd analizy posiłku: {e}")
+        raise HTTPException(status_code=500, detail=f"Błąd serwera: {e}")
+
+
 # --- ENDPOINTY DLA AI CHEFA ---
 @router.get("/suggest-diet-plan", response_model=list[schemas.DietPlanSuggestion])
 async def get_diet_plan_suggestion(
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
     """Generuje plan dietetyczny."""
     today = date.today()
@@ -75,8 +93,7 @@ async def get_diet_plan_suggestion(
     
     # Aktualizacja użytkownika
     current_user.last_diet_plan = plan_json_string
-    db.add(current_user)
-    db.commit()
+    await db.commit()
     
     return plan
 
@@ -86,8 +103,8 @@ async def get_diet_plan_suggestion(
 @router.post("/generate", response_model=schemas.WeeklyAnalysisResponse)
 async def generate_weekly_analysis_endpoint(
     request: schemas.AnalysisGenerateRequest,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
     """Generuje analizę (Tekst + Statystyki)."""
     
@@ -99,9 +116,10 @@ async def generate_weekly_analysis_endpoint(
     start_date, end_date = request.start_date, request.end_date
     
     # Pobranie danych z bazy
-    meals = crud.get_meals_by_date_range(db, current_user.id, start_date, end_date)
-    workouts = crud.get_workouts_by_date_range(db, current_user.id, start_date, end_date)
-    weight_history = crud.get_weight_history_by_date_range(db, current_user.id, start_date, end_date)
+    meals = await crud_async.get_meals_by_date_range(db, current_user.id, start_date, end_date)
+    workouts = await crud_async.get_workouts_by_date_range(db, current_user.id, start_date, end_date)
+    weight_history = await crud_async.get_weight_history_by_date_range(db, current_user.id, start_date, end_date)
+    daily_totals = await crud_async.get_daily_totals_by_date_range(db, current_user.id, start_date, end_date)
     
     # Generowanie podsumowania tekstowego przez AI
     ai_coach_summary = await ai_analyzer.generate_weekly_analysis(
@@ -111,11 +129,11 @@ async def generate_weekly_analysis_endpoint(
 
     # --- TU BYŁ BŁĄD: BRAKOWAŁO OBLICZEŃ STATYSTYCZNYCH ---
     
-    # 1. Oblicz średnie makro
-    total_cals = sum(e.calories for m in meals for e in m.entries)
-    total_protein = sum(e.protein for m in meals for e in m.entries)
-    total_fat = sum(e.fat for m in meals for e in m.entries)
-    total_carbs = sum(e.carbs for m in meals for e in m.entries)
+    # 1. Oblicz średnie makro (z sum dziennych - jeden wiersz na dzień)
+    total_cals = sum(d.calories for d in daily_totals)
+    total_protein = sum(d.protein for d in daily_totals)
+    total_fat = sum(d.fat for d in daily_totals)
+    total_carbs = sum(d.carbs for d in daily_totals)
     
     days_count = (end_date - start_date).days + 1
     
@@ -127,7 +145,7 @@ async def generate_weekly_analysis_endpoint(
     }
 
     # 2. Statystyki treningowe
-    total_burned = sum(w.calories_burned for w in workouts)
+    total_burned = sum(d.calories_burned for d in daily_totals)
     
     # 3. Wykres wagi
     weight_chart = {
@@ -149,14 +167,37 @@ async def generate_weekly_analysis_endpoint(
     # Zapis do bazy
     current_user.last_weekly_analysis = analysis_data.model_dump_json()
     current_user.last_analysis_generated_at = datetime.now()
-    db.add(current_user)
-    db.commit()
+    await db.commit()
     
     return analysis_data
 
+@router.get("/trends", response_model=schemas.TrendsResponse)
+async def get_trends_endpoint(
+    days: int = Query(90, ge=7, le=settings.TRENDS_MAX_DAYS, description="Długość okresu w dniach (np. 90 lub 365)"),
+    end_date: Optional[date] = Query(None, description="Ostatni dzień okresu (domyślnie dziś)"),
+    window: int = Query(7, ge=1, le=60, description="Okno średniej kroczącej kalorii (dni)"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """Trendy długookresowe: makro dzień po dniu, średnia krocząca, deficyt względem celu i trend wagi."""
+    end_date = end_date or date.today()
+    start_date = end_date - timedelta(days=days - 1)
+
+    # Jeden wiersz na dzień prosto z SQL (bez obiektów ORM); resztę liczy NumPy
+    totals_rows = await crud_async.get_daily_totals_columns(db, current_user.id, start_date, end_date)
+    weight_rows = await crud_async.get_daily_weights(db, current_user.id, start_date, end_date)
+
+    return trends.compute_trends(
+        totals_rows, weight_rows, start_date, end_date,
+        calorie_goal=current_user.calorie_goal,
+        add_workout_calories_to_goal=current_user.add_workout_calories_to_goal,
+        window=window,
+        max_points=settings.TRENDS_MAX_POINTS,
+    )
+
 @router.get("/latest", response_model=schemas.WeeklyAnalysisResponse)
 async def get_latest_weekly_analysis_endpoint(
-    current_user: models.User = Depends(get_current_user)
+    current_user: models.User = Depends(get_current_user_async)
 ):
     if not current_user.last_weekly_analysis:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Brak analizy.")
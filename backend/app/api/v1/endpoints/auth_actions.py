@@ -3,12 +3,15 @@ import uuid
 from typing import Any
 
 from fastapi import APIRouter, Body, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
+from app.core.database import get_db, get_async_db
 from app.models.sql_models import User
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
 # UWAGA: Zakładam, że przeniesiemy email_utils.py później.
 # Jeśli jeszcze go nie ma, zakomentuj import i linię z send_reset_password_email
 # from app.services.email_service import send_reset_password_email 
@@ -42,26 +45,27 @@ def request_password_reset(
     return {"msg": "Password recovery email sent"}
 
 @router.post("/reset-password")
-def reset_password(
+async def reset_password(
     token: str = Body(...),
     new_password: str = Body(...),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ) -> Any:
     """
     Zmienia hasło na podstawie ważnego tokena.
     """
-    user = db.query(User).filter(
+    result = await db.execute(select(User).filter(
         User.password_reset_token == token,
         User.password_reset_expires > datetime.utcnow()
-    ).first()
+    ))
+    user = result.scalars().first()
 
     if not user:
         raise HTTPException(status_code=400, detail="Invalid or expired token")
 
-    user.hashed_password = get_password_hash(new_password)
+    user.hashed_password = await get_password_hash_async(new_password)
     user.password_reset_token = None
     user.password_reset_expires = None
-    db.add(user)
-    db.commit()
+    await db.commit()
+    principal_cache.invalidate(user.id)
     
     return {"msg": "Password updated successfully"}
\ No newline at end of file
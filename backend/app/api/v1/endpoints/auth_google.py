@@ -67,7 +67,7 @@ def google_auth_callback(
     # 4. Wygeneruj Token
     access_token_expires = timedelta(minutes=60)
     access_token = create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+        subject=user.email, expires_delta=access_token_expires, user_id=user.id
     )
     
     # --- ZMIANA: Zamiast zwracać JSON, robimy przekierowanie na Dashboard ---
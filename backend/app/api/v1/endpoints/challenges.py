@@ -5,13 +5,13 @@ from sqlalchemy.orm import Session
 import logging
 
 # Nowe importy zgodne z architekturą
-from app.core.database import SessionLocal, get_db
+from app.core.database import get_db
 from app.api.deps import get_current_user
 from app.crud import crud_base as crud
 from app.models import sql_models as models
 from app.schemas import all_schemas as schemas
-from app.services import legacy_analyzer as ai_analyzer
 from app.services import challenges_service
+from app.services import challenge_verification
 from app.models.enums import ChallengeStatus  # Zakładam, że enums są w app.core.enums
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -48,42 +48,13 @@ def join_challenge(
         raise HTTPException(status_code=400, detail="Już bierzesz udział w tym wyzwaniu.")
     return crud.create_user_challenge(db=db, user_id=current_user.id, challenge_id=challenge_id, duration_days=challenge['duration_days'])
 
-async def verify_ended_challenges_task():
-    logging.info("Starting independent background challenge verification task...")
-    db = SessionLocal()
-    try:
-        challenges_to_verify = crud.get_active_challenges_to_verify(db)
-        if not challenges_to_verify:
-            logging.info("No challenges found to verify. Task finished.")
-            return
-        logging.info(f"Found {len(challenges_to_verify)} challenges to verify.")
-        for user_challenge in challenges_to_verify:
-            try:
-                logging.info(f"Verifying challenge_id: {user_challenge.challenge_id} for user_id: {user_challenge.user_id}")
-                challenge_info = challenges_service.get_challenge_by_id(user_challenge.challenge_id)
-                if not challenge_info:
-                    logging.warning(f"Could not find info for challenge_id: {user_challenge.challenge_id}. Skipping.")
-                    continue
-                logs = []
-                if challenge_info['category'] == 'dieta':
-                    meals = crud.get_meals_by_date_range(db, user_id=user_challenge.user_id, start_date=user_challenge.start_date, end_date=user_challenge.end_date)
-                    logs = [entry.product_name for meal in meals for entry in meal.entries]
-                elif challenge_info['category'] == 'aktywność':
-                    workouts = crud.get_workouts_by_date_range(db, user_id=user_challenge.user_id, start_date=user_challenge.start_date, end_date=user_challenge.end_date)
-                    logs = [w.name for w in workouts]
-                is_completed = await ai_analyzer.verify_challenge_completion(challenge_title=challenge_info['title'], challenge_description=challenge_info['description'], user_logs=logs, category=challenge_info['category'])
-                new_status = ChallengeStatus.COMPLETED if is_completed else ChallengeStatus.FAILED
-                crud.update_user_challenge_status(db, user_challenge_id=user_challenge.id, status=new_status)
-                logging.info(f"Challenge {user_challenge.id} for user {user_challenge.user_id} verified with status: {new_status.value}")
-            except Exception as e:
-                logging.error(f"Error verifying challenge {user_challenge.id}: {e}", exc_info=True)
-    except Exception as e:
-        logging.error(f"A critical error occurred in the verification task: {e}", exc_info=True)
-    finally:
-        db.close()
-    logging.info("Challenge verification task finished.")
-
 @router.post("/challenges/verify", summary="Uruchom weryfikację zakończonych wyzwań", status_code=202)
-def trigger_verification(background_tasks: BackgroundTasks):
-    background_tasks.add_task(verify_ended_challenges_task)
-    return {"message": "Proces weryfikacji wyzwań został przyjęty i uruchomiony w tle."}
\ No newline at end of file
+def trigger_verification(
+    background_tasks: BackgroundTasks,
+    current_user: models.User = Depends(get_current_user)
+):
+    """Ręczne uruchomienie przebiegu, który i tak wykonuje się cyklicznie (CHALLENGE_VERIFY_INTERVAL_SECONDS)."""
+    if challenge_verification.verification_lock.locked():
+        return {"message": "Weryfikacja wyzwań jest już w toku."}
+    background_tasks.add_task(challenge_verification.verify_ended_challenges)
+    return {"message": "Proces weryfikacji wyzwań został przyjęty i uruchomiony w tle."}
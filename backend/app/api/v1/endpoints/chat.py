@@ -1,24 +1,56 @@
-from fastapi import APIRouter, Depends, HTTPException, Body
+import json
+from contextlib import aclosing
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Body, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import AsyncIterator, List, Optional
 
 # Nowe importy zgodne z architekturą
 from app.crud import crud_base as crud
+from app.crud import crud_async
 from app.models import sql_models as models
 from app.schemas import all_schemas as schemas
 from app.services import legacy_analyzer as ai_analyzer
-from app.core.database import get_db
-from app.api.deps import get_current_user
+from app.core.database import get_db, get_async_db, AsyncSessionLocal
+from app.core.pagination import encode_cursor, decode_cursor
+from app.api.deps import get_current_user, get_current_user_async
 
 router = APIRouter()
 
+def _message_page(db: Session, conversation_id: int, limit: int, before: Optional[str] = None):
+    """Strona wiadomości (chronologicznie) i kursor do starszych - None, jeśli to już początek rozmowy."""
+    position = decode_cursor(before, created_at=datetime, id=int) if before else None
+    newest_first = crud.get_conversation_messages(
+        db, conversation_id=conversation_id, limit=limit,
+        before=(position["created_at"], position["id"]) if position else None
+    )
+    next_cursor = None
+    if len(newest_first) == limit:
+        oldest = newest_first[-1]
+        next_cursor = encode_cursor(created_at=oldest.created_at, id=oldest.id)
+    return list(reversed(newest_first)), next_cursor
+
 @router.get("/conversations", response_model=List[schemas.ConversationInfo])
 def get_user_conversations(
+    response: Response,
+    limit: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="Wartość nagłówka X-Next-Cursor z poprzedniej strony"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Pobiera listę wszystkich konwersacji użytkownika."""
-    return crud.get_user_conversations(db, user_id=current_user.id)
+    """Pobiera listę konwersacji użytkownika (przypięte, potem najnowsze), stronami po `limit`."""
+    position = decode_cursor(cursor, is_pinned=bool, created_at=datetime, id=int) if cursor else None
+    conversations = crud.get_user_conversations(
+        db, user_id=current_user.id, limit=limit,
+        after=(position["is_pinned"], position["created_at"], position["id"]) if position else None
+    )
+    # Lista zostaje listą (zgodność z klientami), kursor następnej strony idzie w nagłówku
+    if len(conversations) == limit:
+        last = conversations[-1]
+        response.headers["X-Next-Cursor"] = encode_cursor(is_pinned=last.is_pinned, created_at=last.created_at, id=last.id)
+    return conversations
 
 @router.post("/conversations", response_model=schemas.Conversation)
 def create_new_conversation(
@@ -31,38 +63,116 @@ def create_new_conversation(
 @router.get("/conversations/{conversation_id}", response_model=schemas.Conversation)
 def get_conversation_details(
     conversation_id: int,
+    limit: int = Query(50, ge=1, le=200, description="Ile najnowszych wiadomości zwrócić"),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
-    """Pobiera jedną, konkretną konwersację wraz z całą historią wiadomości."""
+    """Pobiera jedną konwersację z najnowszymi wiadomościami; starsze - przez GET .../messages?before=next_cursor."""
     conversation = crud.get_conversation_by_id(db, conversation_id=conversation_id, user_id=current_user.id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Konwersacja nie została znaleziona.")
-    return conversation
+    messages, next_cursor = _message_page(db, conversation.id, limit)
+    return schemas.Conversation(
+        **schemas.ConversationInfo.model_validate(conversation).model_dump(),
+        messages=messages, next_cursor=next_cursor
+    )
+
+@router.get("/conversations/{conversation_id}/messages", response_model=schemas.ChatMessagePage)
+def get_conversation_messages(
+    conversation_id: int,
+    limit: int = Query(50, ge=1, le=200),
+    before: Optional[str] = Query(None, description="Kursor next_cursor z poprzedniej strony"),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Przewijanie historii: wiadomości starsze niż kursor (chronologicznie) i kursor do kolejnej strony."""
+    conversation = crud.get_conversation_by_id(db, conversation_id=conversation_id, user_id=current_user.id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Konwersacja nie została znaleziona.")
+    messages, next_cursor = _message_page(db, conversation.id, limit, before)
+    return schemas.ChatMessagePage(messages=messages, next_cursor=next_cursor)
 
 @router.post("/conversations/{conversation_id}/messages", response_model=schemas.ChatMessage)
 async def send_message_to_conversation(
     conversation_id: int,
     request: schemas.ChatRequest,
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
 ):
     """Wysyła nową wiadomość do istniejącej konwersacji i zwraca odpowiedź AI."""
-    conversation = crud.get_conversation_by_id(db, conversation_id=conversation_id, user_id=current_user.id)
+    conversation = await crud_async.get_conversation_by_id(db, conversation_id=conversation_id, user_id=current_user.id)
     if not conversation:
         raise HTTPException(status_code=404, detail="Konwersacja nie została znaleziona.")
 
     # 1. Zapisz wiadomość od użytkownika w bazie
-    crud.add_message_to_conversation(db, conversation_id=conversation.id, role="user", content=request.message)
+    await crud_async.add_message_to_conversation(db, conversation=conversation, role="user", content=request.message)
 
     # 2. Uzyskaj odpowiedź od AI, przekazując cały obiekt konwersacji
     response_text = await ai_analyzer.get_chat_response(db, current_user, conversation, request.message)
 
     # 3. Zapisz odpowiedź AI w bazie
-    ai_message = crud.add_message_to_conversation(db, conversation_id=conversation.id, role="ai", content=response_text)
+    ai_message = await crud_async.add_message_to_conversation(db, conversation=conversation, role="ai", content=response_text)
 
     return ai_message
 
+def _sse_event(data: dict, event: str = None) -> str:
+    """Formatuje jedno zdarzenie Server-Sent Events (dane jako JSON, więc bez problemu z nowymi liniami)."""
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+async def _relay_chat_stream(history_for_model: list, conversation_id: int, user_id: int) -> AsyncIterator[str]:
+    """
+    Przekazuje fragmenty odpowiedzi AI jako zdarzenia SSE, a po końcu strumienia zapisuje całą odpowiedź.
+    Sesja do zapisu otwierana jest dopiero wtedy - jeśli klient rozłączy się w trakcie, generator zostaje
+    anulowany, zanim jakakolwiek sesja powstanie, a niepełna odpowiedź nie trafia do historii.
+    Strumień od modelu zamykamy razem z generatorem (aclosing), a nie dopiero przy sprzątaniu pętli zdarzeń.
+    """
+    parts = []
+    try:
+        async with aclosing(ai_analyzer.stream_chat_response(history_for_model)) as chunks:
+            async for text in chunks:
+                parts.append(text)
+                yield _sse_event({"delta": text})
+    except Exception as e:
+        print(f"BŁĄD: Strumieniowanie odpowiedzi czatu nie powiodło się: {e}")
+        yield _sse_event({"detail": "Nie udało się uzyskać odpowiedzi AI."}, event="error")
+        return
+
+    response_text = "".join(parts) or ai_analyzer.CHAT_FALLBACK_RESPONSE
+    async with AsyncSessionLocal() as db:
+        conversation = await crud_async.get_conversation_by_id(db, conversation_id=conversation_id, user_id=user_id)
+        if not conversation:
+            # Konwersację usunięto w trakcie generowania odpowiedzi
+            yield _sse_event({"detail": "Konwersacja nie została znaleziona."}, event="error")
+            return
+        ai_message = await crud_async.add_message_to_conversation(db, conversation=conversation, role="ai", content=response_text)
+        yield _sse_event(schemas.ChatMessage.model_validate(ai_message).model_dump(mode="json"), event="done")
+
+@router.post("/conversations/{conversation_id}/messages/stream")
+async def stream_message_to_conversation(
+    conversation_id: int,
+    request: schemas.ChatRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: models.User = Depends(get_current_user_async)
+):
+    """
+    Jak wysyłanie wiadomości, ale odpowiedź AI płynie jako Server-Sent Events: zdarzenia z polem 'delta'
+    w miarę generowania, a na końcu zdarzenie 'done' z zapisaną wiadomością (lub 'error').
+    """
+    conversation = await crud_async.get_conversation_by_id(db, conversation_id=conversation_id, user_id=current_user.id)
+    if not conversation:
+        raise HTTPException(status_code=404, detail="Konwersacja nie została znaleziona.")
+
+    await crud_async.add_message_to_conversation(db, conversation=conversation, role="user", content=request.message)
+    history_for_model = await ai_analyzer.build_chat_history(db, current_user, conversation)
+
+    return StreamingResponse(
+        _relay_chat_stream(history_for_model, conversation_id, current_user.id),
+        media_type="text/event-stream",
+        # Bez buforowania po drodze (np. w proxy), żeby fragmenty docierały od razu
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @router.post("/conversations/{conversation_id}/pin", response_model=schemas.ConversationInfo)
 def toggle_pin_conversation(
     conversation_id: int,
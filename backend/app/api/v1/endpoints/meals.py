@@ -1,7 +1,9 @@
-from typing import List, Any
+import hashlib
+from typing import List, Any, Optional
 from datetime import date
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 # --- IMPORTY SYSTEMOWE I ZALEŻNOŚCI ---
@@ -58,6 +60,52 @@ def add_meal_entry(
     
     return crud.add_entry_to_meal(db=db, entry=entry, meal_id=meal_id)
 
+@router.post("/meals/batch", response_model=schemas.MealBatchResult)
+def create_meals_batch(
+    batch: schemas.MealBatchCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=100),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(deps.get_current_user)
+) -> Any:
+    """
+    Zapisuje cały dzień (lub jego część) jednym żądaniem: nowe posiłki z wpisami oraz wpisy do istniejących
+    posiłków, w jednej transakcji. Ponowienie z tym samym nagłówkiem Idempotency-Key zwraca pierwotny wynik
+    zamiast tworzyć duplikaty.
+    """
+    request_hash = hashlib.sha256(batch.model_dump_json().encode("utf-8")).hexdigest()
+
+    def stored_result(record):
+        if record.request_hash != request_hash:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Ten klucz Idempotency-Key został już użyty z inną treścią żądania."
+            )
+        return record.response
+
+    if idempotency_key:
+        record = crud.get_idempotency_key(db, user_id=current_user.id, key=idempotency_key)
+        if record:
+            return stored_result(record)
+
+    try:
+        result = crud.create_meals_batch(
+            db, batch=batch, user_id=current_user.id, idempotency_key=idempotency_key, request_hash=request_hash
+        )
+    except IntegrityError:
+        # Równoległe ponowienie z tym samym kluczem zdążyło zapisać się pierwsze
+        db.rollback()
+        record = crud.get_idempotency_key(db, user_id=current_user.id, key=idempotency_key) if idempotency_key else None
+        if not record:
+            raise
+        return stored_result(record)
+
+    if result is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Posiłek nie został znaleziony lub nie należy do Ciebie."
+        )
+    return result
+
 @router.get("/meals", response_model=List[schemas.Meal])
 def read_meals(
     date: date,
@@ -1,12 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Dict, List, Optional
 
 # Nowe importy zgodne z architekturą
 from app.crud import crud_base as crud
 from app.models import sql_models as models
 from app.schemas import all_schemas as schemas
 from app.services import challenges_service
+from app.core.config import settings
 from app.core.database import get_db
 from app.api.deps import get_current_user
 from app.models.enums import FriendshipStatus # Zakładam, że enums są w app.core.enums
@@ -16,39 +17,51 @@ router = APIRouter(
     tags=["Społeczność"]
 )
 
-@router.get("/users/search", response_model=List[schemas.FriendInfo], summary="Wyszukaj użytkowników po e-mailu")
+def _recent_badges(db: Session, user_ids: List[int]) -> Dict[int, List[schemas.CompletedChallengeBadge]]:
+    """Odznaki za niedawno ukończone wyzwania wielu użytkowników - jedno zapytanie, tytuły ze słownika wyzwań."""
+    badges_by_user = {}
+    for user_id, completed in crud.get_recently_completed_challenges_for_users(db, user_ids).items():
+        badges_by_user[user_id] = []
+        for c in completed:
+            challenge_info = challenges_service.get_challenge_by_id(c.challenge_id)
+            if challenge_info:
+                badges_by_user[user_id].append(
+                    schemas.CompletedChallengeBadge(title=challenge_info['title'], end_date=c.end_date)
+                )
+    return badges_by_user
+
+@router.get("/users/search", response_model=List[schemas.FriendInfo], summary="Wyszukaj użytkowników po e-mailu lub imieniu")
 def search_users(
-    email: str = Query(..., min_length=3, description="Fragment adresu e-mail użytkownika (min. 3 znaki)"),
+    q: Optional[str] = Query(None, min_length=3, description="Fragment adresu e-mail lub imienia (min. 3 znaki)"),
+    email: Optional[str] = Query(None, min_length=3, deprecated=True, description="Dawna nazwa parametru q"),
+    limit: int = Query(10, ge=1, le=50),
+    offset: int = Query(0, ge=0, le=settings.USER_SEARCH_CANDIDATES),
     db: Session = Depends(get_db),
     current_user: models.User = Depends(get_current_user)
 ):
+    """
+    Wyniki od najlepiej dopasowanych (prefiks e-maila, początek imienia, dowolny fragment), stronicowane limit/offset.
+    Zapytania idą po indeksach, więc można je wysyłać na bieżąco podczas pisania.
+    """
     if not current_user.is_social_profile_active:
         raise HTTPException(status_code=403, detail="Twój profil społecznościowy jest nieaktywny.")
-        
-    found_users = crud.search_users_by_email(db, email_query=email, current_user_id=current_user.id)
-    
-    results = []
-    for user in found_users:
-        friendship = crud.get_friendship(db, user_id=current_user.id, friend_id=user.id)
-        completed_challenges_db = crud.get_recently_completed_challenges_for_user(db, user_id=user.id)
-        
-        badges = []
-        for c in completed_challenges_db:
-            challenge_info = challenges_service.get_challenge_by_id(c.challenge_id)
-            if challenge_info:
-                badges.append(schemas.CompletedChallengeBadge(
-                    title=challenge_info['title'],
-                    end_date=c.end_date
-                ))
+    search_query = q or email
+    if not search_query:
+        raise HTTPException(status_code=400, detail="Podaj fragment e-maila lub imienia (parametr q).")
 
-        friend_info = schemas.FriendInfo(
+    found_users = crud.search_users_with_friendship(
+        db, query=search_query, current_user_id=current_user.id, limit=limit, offset=offset
+    )
+    badges_by_user = _recent_badges(db, [user.id for user, _ in found_users])
+
+    return [
+        schemas.FriendInfo(
             id=user.id, name=user.name, email=user.email,
-            friendship_status=friendship.status if friendship else None,
-            completed_challenges=badges
+            friendship_status=friendship_status,
+            completed_challenges=badges_by_user[user.id]
         )
-        results.append(friend_info)
-        
-    return results
+        for user, friendship_status in found_users
+    ]
 
 @router.post("/friends/request", response_model=schemas.Friendship, summary="Wyślij zaproszenie do znajomych")
 def send_friend_request(
@@ -67,7 +80,10 @@ def send_friend_request(
     if existing_friendship:
         raise HTTPException(status_code=400, detail=f"Istnieje już relacja z tym użytkownikiem (status: {existing_friendship.status.value}).")
 
-    return crud.send_friend_request(db=db, user_id=current_user.id, friend_id=friend_request.friend_id)
+    db_friendship = crud.send_friend_request(db=db, user_id=current_user.id, friend_id=friend_request.friend_id)
+    if db_friendship is None:
+        raise HTTPException(status_code=400, detail="Istnieje już relacja z tym użytkownikiem.")
+    return db_friendship
 
 @router.get("/friends/requests", response_model=List[schemas.FriendRequestWithUserInfo], summary="Pobierz oczekujące zaproszenia")
 def get_pending_friend_requests(
@@ -77,7 +93,7 @@ def get_pending_friend_requests(
     pending_requests = crud.get_friend_requests(db, user_id=current_user.id)
     results = []
     for req in pending_requests:
-        sender_info = crud.get_user_by_id(db, user_id=req.user_id)
+        sender_info = req.user
         if sender_info:
             response_item = schemas.FriendRequestWithUserInfo(
                 id=req.id, user_id=req.user_id, friend_id=req.friend_id,
@@ -106,18 +122,13 @@ def get_friends_list(
     current_user: models.User = Depends(get_current_user)
 ):
     friends = crud.get_friends_list(db, user_id=current_user.id)
-    results_with_badges = []
-    for friend in friends:
-        completed_challenges_db = crud.get_recently_completed_challenges_for_user(db, user_id=friend.id)
-        badges = [
-            schemas.CompletedChallengeBadge(title=challenges_service.get_challenge_by_id(c.challenge_id)['title'], end_date=c.end_date)
-            for c in completed_challenges_db if challenges_service.get_challenge_by_id(c.challenge_id)
-        ]
-        friend_with_badges = schemas.FriendWithBadges(
-            id=friend.id, name=friend.name, email=friend.email, completed_challenges=badges
+    badges_by_user = _recent_badges(db, [friend.id for friend in friends])
+    return [
+        schemas.FriendWithBadges(
+            id=friend.id, name=friend.name, email=friend.email, completed_challenges=badges_by_user[friend.id]
         )
-        results_with_badges.append(friend_with_badges)
-    return results_with_badges
+        for friend in friends
+    ]
 
 @router.delete("/friends/{friend_id}", status_code=204, summary="Usuń znajomego")
 def delete_friend(
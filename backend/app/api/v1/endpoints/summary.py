@@ -27,13 +27,20 @@ def get_daily_summary(
     water_entries = crud.get_water_entries_by_date(db, user_id=current_user.id, target_date=target_date)
 
     # --- POCZĄTEK NOWEJ LOGIKI: WZBOGACANIE DANYCH ---
+    # Wszystkie produkty ze składników dnia pobieramy jednym zapytaniem (zamiast jednego na składnik)
+    ingredient_names = [
+        detail.get("name") for meal in meals for entry in meal.entries
+        for detail in (entry.deconstruction_details or []) if isinstance(detail.get("name"), str)
+    ]
+    products_by_name = crud.get_products_by_names(db, ingredient_names)
     for meal in meals:
         for entry in meal.entries:
             if entry.deconstruction_details:
                 enriched_details = []
                 for ingredient_detail in entry.deconstruction_details:
                     # Szukamy produktu w naszej bazie, aby pobrać jego wartości bazowe
-                    product = crud.get_product_by_name(db, name=ingredient_detail.get("name"))
+                    name = ingredient_detail.get("name")
+                    product = products_by_name.get(name.lower()) if isinstance(name, str) else None
                     if product:
                         # Kopiujemy istniejące dane i dodajemy kluczową, brakującą informację
                         new_detail = ingredient_detail.copy()
@@ -42,9 +49,9 @@ def get_daily_summary(
                 entry.deconstruction_details = enriched_details
     # --- KONIEC NOWEJ LOGIKI ---
 
-    calories_consumed = sum(e.calories for m in meals for e in m.entries)
-    calories_burned = sum(w.calories_burned for w in workouts)
-    water_consumed = sum(w.amount for w in water_entries)
+    # Sumy dnia z gotowego wiersza daily_totals (zamiast liczenia po wszystkich wpisach)
+    totals = crud.get_daily_totals(db, user_id=current_user.id, target_date=target_date)
+    calories_burned = totals.calories_burned if totals else 0
     
     effective_calorie_goal = current_user.calorie_goal or 0
     if current_user.add_workout_calories_to_goal:
@@ -55,11 +62,11 @@ def get_daily_summary(
     # Użycie nowego schematu DaySummary zamiast starego schemas.DailySummary
     summary = DaySummary(
         date=target_date,
-        calories_consumed=calories_consumed,
-        protein_consumed=sum(e.protein for m in meals for e in m.entries),
-        fat_consumed=sum(e.fat for m in meals for e in m.entries),
-        carbs_consumed=sum(e.carbs for m in meals for e in m.entries),
-        water_consumed=water_consumed,
+        calories_consumed=totals.calories if totals else 0.0,
+        protein_consumed=totals.protein if totals else 0.0,
+        fat_consumed=totals.fat if totals else 0.0,
+        carbs_consumed=totals.carbs if totals else 0.0,
+        water_consumed=totals.water_ml if totals else 0,
         calories_burned=calories_burned,
         total_calories_burned_today=calories_burned,
         calorie_goal=effective_calorie_goal,
@@ -3,11 +3,14 @@ from typing import Any, List
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from app.core.database import get_db
-from app.core.security import create_access_token, get_password_hash
+from app.core.database import get_db, get_async_db
+from app.core.security import create_access_token, get_password_hash_async
 from app.core.config import settings
+from app.core.principal_cache import principal_cache
 # --- ZMIANA: Dodano WeightEntry do importów ---
 from app.models.sql_models import User, WeightEntry
 from app.schemas.all_schemas import UserCreate, UserUpdate, UserResponse, Token 
@@ -18,46 +21,47 @@ router = APIRouter()
 
 # --- LOGOWANIE ---
 @router.post("/login", response_model=Token)
-def login_access_token(
-    db: Session = Depends(get_db), 
+async def login_access_token(
+    db: AsyncSession = Depends(get_async_db), 
     form_data: OAuth2PasswordRequestForm = Depends()
 ):
     """
     OAuth2 compatible token login, get an access token for future requests
     """
-    user = deps.authenticate_user(db, email=form_data.username, password=form_data.password)
+    user = await deps.authenticate_user_async(db, email=form_data.username, password=form_data.password)
     if not user:
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     
     # Używamy czasu wygasania z ustawień
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        subject=user.email, expires_delta=access_token_expires
+        subject=user.email, expires_delta=access_token_expires, user_id=user.id
     )
     return {"access_token": access_token, "token_type": "bearer", "user_name": user.name}
 
 # --- REJESTRACJA ---
 @router.post("/register", response_model=UserResponse)
-def register_user(
+async def register_user(
     user_in: UserCreate, 
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = db.query(User).filter(User.email == user_in.email).first()
+    user = (await db.execute(select(User).filter(User.email == user_in.email))).scalars().first()
     if user:
         raise HTTPException(
             status_code=400,
             detail="The user with this email already exists in the system.",
         )
     
-    hashed_pw = get_password_hash(user_in.password)
+    hashed_pw = await get_password_hash_async(user_in.password)
     db_user = User(
         email=user_in.email,
         hashed_password=hashed_pw,
         name="Użytkownik" # Domyślna nazwa
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    # Odpowiedź zawiera wagę (User.weight), więc od razu ją wczytujemy
+    await db.refresh(db_user, attribute_names=["latest_weight"])
     return db_user
 
 # --- PROFIL UŻYTKOWNIKA ---
@@ -101,6 +105,7 @@ def update_user_me(
 
     db.add(current_user)
     db.commit()
+    principal_cache.invalidate(current_user.id)
     
     # --- KLUCZOWA ZMIANA: ODŚWIEŻAMY WSZYSTKO ---
     # expire_all() zmusza SQLAlchemy do ponownego pobrania danych z bazy przy następnym użyciu.
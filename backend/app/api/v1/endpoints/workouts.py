@@ -1,15 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import date
 
 # Nowe importy zgodne z architekturą
 from app.crud import crud_base as crud
+from app.crud import crud_async
 from app.models import sql_models as models
 from app.schemas import all_schemas as schemas
 from app.services import legacy_analyzer as ai_analyzer
-from app.core.database import get_db
-from app.api.deps import get_current_user
+from app.core.database import get_db, get_async_db
+from app.api.deps import get_current_user, get_current_user_async
 
 router = APIRouter(
     prefix="/api/workouts",
@@ -19,8 +21,8 @@ router = APIRouter(
 @router.post("", response_model=schemas.Workout, summary="Dodaj nową aktywność fizyczną")
 async def create_workout_entry(
     request: schemas.WorkoutCreate, 
-    db: Session = Depends(get_db), 
-    current_user: models.User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db), 
+    current_user: models.User = Depends(get_current_user_async)
 ):
     """
     Analizuje opis treningu, szacuje spalone kalorie i zapisuje go w dzienniku.
@@ -41,7 +43,7 @@ async def create_workout_entry(
     if workout_data.calories_burned == 0 and workout_data.name == "Nierozpoznana aktywność":
         raise HTTPException(status_code=400, detail="Podana aktywność nie jest rozpoznawana jako trening.")
 
-    return crud.create_workout(db=db, workout=workout_data, user_id=current_user.id)
+    return await crud_async.create_workout(db=db, workout=workout_data, user_id=current_user.id)
 
 
 @router.get("", response_model=List[schemas.Workout], summary="Pobierz treningi z danego dnia")
@@ -9,6 +9,17 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str
     SECRET_KEY: str
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Koszt bcrypt (zmiana powoduje przeliczenie hasha przy najbliższym logowaniu)
+    BCRYPT_ROUNDS: int = 12
+    # Osobna pula procesów do hashowania haseł i maksymalna liczba oczekujących zadań (powyżej - 503)
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    # Pamięć podręczna zalogowanych użytkowników (na worker): czas życia wpisu i maksymalna liczba wpisów
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 30
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = 10000
+    # Zbiory id znajomych (na worker); zmiany z innych workerów widać najpóźniej po TTL
+    FRIEND_CACHE_TTL_SECONDS: int = 60
+    FRIEND_CACHE_MAX_ENTRIES: int = 10000
 
     # Baza wektorowa (ChromaDB)
     CHROMA_DB_DIR: str = "/app/chroma_db"
@@ -24,6 +35,40 @@ class Settings(BaseSettings):
     MAIL_PORT: int = 587
     MAIL_SERVER: str = ""
 
+    # Leksykon żywności (co ile sekund worker sprawdza, czy jego kopia jest aktualna)
+    FOOD_LEXICON_REFRESH_SECONDS: int = 30
+    # Minimalne podobieństwo trigramowe (0..1), przy którym ufamy lokalnemu dopasowaniu zamiast pytać AI
+    FOOD_MATCH_THRESHOLD: float = 0.75
+    # Ile znormalizowanych kluczy nazw (stemming) pamiętamy w LRU procesu
+    NAME_KEY_CACHE_SIZE: int = 8192
+    # Ile pojedynczych zapytań do AI o nowe składniki może trwać naraz w jednym workerze
+    INGREDIENT_LEARNING_CONCURRENCY: int = 4
+
+    # Pamięć podręczna odpowiedzi AI (liczba wpisów trzymanych w pamięci procesu, reszta w bazie)
+    AI_CACHE_MAX_MEMORY_ENTRIES: int = 1024
+
+    # Kontekst czatu: ile ostatnich wiadomości trafia do modelu dosłownie i co ile starszych
+    # wiadomości dopisujemy je do podsumowania rozmowy
+    CHAT_CONTEXT_MESSAGES: int = 15
+    CHAT_SUMMARY_BATCH: int = 10
+
+    # Jak długo (w godzinach) pamiętamy klucze idempotencji zapisów wsadowych
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+
+    # Trendy długookresowe: najdłuższy obsługiwany okres (dni) i maksymalna liczba punktów na wykresie
+    TRENDS_MAX_DAYS: int = 730
+    TRENDS_MAX_POINTS: int = 120
+
+    # Wyszukiwarka użytkowników: ilu kandydatów (z indeksów) szeregujemy - to też limit stronicowania wyników
+    USER_SEARCH_CANDIDATES: int = 200
+
+    # Weryfikacja zakończonych wyzwań: co ile sekund uruchamia się w każdym workerze (0 - tylko ręcznie),
+    # ile wierszy przejmuje naraz, ile werdyktów AI trwa równolegle i po ilu minutach porzucona dzierżawa wygasa
+    CHALLENGE_VERIFY_INTERVAL_SECONDS: int = 3600
+    CHALLENGE_VERIFY_BATCH_SIZE: int = 200
+    CHALLENGE_VERIFY_CONCURRENCY: int = 8
+    CHALLENGE_VERIFY_LEASE_MINUTES: int = 30
+
     # Konfiguracja wczytywania pliku .env
     model_config = SettingsConfigDict(
         env_file=".env", 
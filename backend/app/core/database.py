@@ -1,9 +1,12 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker, declarative_base
 from app.core.config import settings
 
 # Używamy SQLite lokalnie (plik powstanie w folderze backend/app w kontenerze)
 SQLALCHEMY_DATABASE_URL = "sqlite:////app/app/sql_app.db"
+# Ten sam plik, ale przez sterownik asynchroniczny (aiosqlite) - dla endpointów 'async def'
+ASYNC_SQLALCHEMY_DATABASE_URL = "sqlite+aiosqlite:////app/app/sql_app.db"
 
 # Tworzenie silnika (engine)
 # connect_args={"check_same_thread": False} jest wymagane tylko dla SQLite
@@ -14,6 +17,11 @@ engine = create_engine(
 # Fabryka sesji - to z niej będziesz korzystać w endpointach
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Silnik i fabryka sesji asynchronicznych: zapytania nie blokują pętli zdarzeń uvicorna.
+# expire_on_commit=False - po commit obiekty zostają czytelne bez ponownego (niejawnego) zapytania.
+async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Klasa bazowa dla Twoich modeli (User, Meal, itp.)
 Base = declarative_base()
 
@@ -23,4 +31,9 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+# Odpowiednik get_db dla endpointów asynchronicznych
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,70 @@
+"""
+Pamięć podręczna zbiorów znajomych (na worker).
+
+Lista znajomych, odznaki i sprawdzenia "czy to mój znajomy" potrzebują tylko id drugiej strony
+zaakceptowanych relacji. Trzymamy więc krótko (FRIEND_CACHE_TTL_SECONDS) zbiór id znajomych każdego użytkownika.
+
+Każdy flush, który dodaje, zmienia lub usuwa relację (zaproszenie, akceptacja, usunięcie), unieważnia
+wpisy obu jej stron w tym workerze. Zmiany z innych workerów widać najpóźniej po upływie TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import FrozenSet, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.sql_models import Friendship
+
+
+class FriendIdCache:
+    """Zbiory id znajomych indeksowane id użytkownika (LRU z TTL)."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[FrozenSet[int], float]]" = OrderedDict()
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+
+    def get(self, user_id: int) -> Optional[FrozenSet[int]]:
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if not cached:
+                return None
+            friend_ids, expires_at = cached
+            if expires_at <= time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return friend_ids
+
+    def put(self, user_id: int, friend_ids: Iterable[int]) -> FrozenSet[int]:
+        friend_ids = frozenset(friend_ids)
+        with self._lock:
+            self._entries[user_id] = (friend_ids, time.monotonic() + self._ttl_seconds)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return friend_ids
+
+    def invalidate(self, *user_ids: Optional[int]) -> None:
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+friend_cache = FriendIdCache(settings.FRIEND_CACHE_TTL_SECONDS, settings.FRIEND_CACHE_MAX_ENTRIES)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_friendships(session: Session, flush_context) -> None:
+    """Unieważnia zbiory znajomych obu stron relacji zmienionych w tym flushu (także przez AsyncSession)."""
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Friendship):
+            friend_cache.invalidate(obj.user_id, obj.friend_id)
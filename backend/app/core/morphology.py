@@ -0,0 +1,65 @@
+"""
+Lekki stemmer polskich nazw żywności do budowy kluczy wyszukiwania.
+
+Klucz nazwy powstaje przez: małe litery, usunięcie polskich znaków i interpunkcji,
+pominięcie słów funkcyjnych ("z", "na", "w"...) i obcięcie końcówek fleksyjnych każdego słowa,
+dzięki czemu "jajka", "jajek" i "jajko" (albo "kawa z mlekiem" i "kawę z mleka") dają ten sam klucz.
+Klucz służy wyłącznie do porównywania - nazwy pokazywane użytkownikowi pozostają bez zmian.
+Stemming bywa zbyt zachłanny ("mąka" i "mak" dają "mak"), dlatego obok jest exact_key - ta sama nazwa
+bez obcinania końcówek, sprawdzana przed kluczem ze stemmingiem.
+"""
+import re
+from functools import lru_cache
+from typing import List
+
+from app.core import units
+from app.core.config import settings
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Słowa funkcyjne, które nie odróżniają produktów ("bez" celowo zostaje - "kawa bez cukru" to inny produkt)
+STOP_WORDS = frozenset({"z", "ze", "na", "w", "we", "do", "od", "po", "o", "dla", "i", "oraz", "a"})
+
+# Końcówki fleksyjne rzeczowników i przymiotników (po usunięciu diakrytyków), od najdłuższych
+_SUFFIXES = (
+    "iego", "iemu",
+    "ami", "ach", "iem", "ego", "emu", "iej", "ymi", "imi", "ych", "ich", "owi",
+    "om", "ow", "em", "ej", "ym", "im", "ie", "mi",
+    "a", "e", "i", "y", "o", "u",
+)
+# Krótszych rdzeni nie obcinamy ("ser", "ryz" zostają bez zmian)
+MIN_STEM_LENGTH = 3
+
+
+def stem_word(word: str) -> str:
+    """Obcina jedną końcówkę fleksyjną słowa (już bez diakrytyków): "jajkami" -> "jajk", "pomidorow" -> "pomidor"."""
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            word = word[:-len(suffix)]
+            break
+    # Ruchome "e" w dopełniaczu liczby mnogiej i zdrobnieniach: "jajek" -> "jajk", "serek" -> "serk"
+    if word.endswith("ek") and len(word) > MIN_STEM_LENGTH + 1:
+        word = word[:-2] + "k"
+    return word
+
+
+def tokens(text: str) -> List[str]:
+    """Słowa nazwy: małe litery, bez diakrytyków i interpunkcji."""
+    folded = units.fold_diacritics(str(text).lower())
+    return _NON_ALNUM.sub(" ", folded).split()
+
+
+def exact_key(text: str) -> str:
+    """Klucz dokładnej nazwy - bez diakrytyków i interpunkcji, ale bez stemmingu: "Mąka (pszenna)" -> "maka pszenna"."""
+    return " ".join(tokens(text))
+
+
+@lru_cache(maxsize=settings.NAME_KEY_CACHE_SIZE)
+def name_key(text: str) -> str:
+    """
+    Klucz porównawczy nazwy produktu: "2 Jajka na twardo" -> "2 jajk tward".
+    Wynik jest zapamiętywany (LRU), bo te same nazwy wracają przy każdej analizie i przebudowie leksykonu.
+    """
+    words = tokens(text)
+    content = [word for word in words if word not in STOP_WORDS] or words
+    return " ".join(stem_word(word) for word in content)
@@ -0,0 +1,41 @@
+"""
+Kursory do stronicowania typu keyset ("pokaż starsze").
+
+Kursor to zakodowana (base64, JSON) pozycja ostatniego elementu poprzedniej strony, np. (created_at, id).
+Kolejna strona to warunek "starsze niż ta pozycja" na indeksie, więc jej koszt nie zależy od tego,
+jak daleko w historię przewinął użytkownik (w przeciwieństwie do OFFSET).
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict
+
+from fastapi import HTTPException, status
+
+
+def encode_cursor(**position: Any) -> str:
+    data = {key: value.isoformat() if isinstance(value, datetime) else value for key, value in position.items()}
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode("utf-8")).decode("ascii")
+
+
+def _field(value: Any, field_type: type) -> Any:
+    if field_type is datetime:
+        return datetime.fromisoformat(value)
+    # bool to podklasa int - id nie może być true/false, a flaga - liczbą
+    if type(value) is not field_type:
+        raise TypeError(f"Oczekiwano {field_type.__name__}")
+    return value
+
+
+def decode_cursor(cursor: str, **fields: type) -> Dict[str, Any]:
+    """
+    Odczytuje kursor i sprawdza, że ma dokładnie pola `fields` (nazwa=typ, datetime z ISO).
+    Niepoprawny lub obcy kursor (np. z innego endpointu) -> 400.
+    """
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if not isinstance(data, dict) or set(data) != set(fields):
+            raise ValueError("Nieoczekiwane pola kursora")
+        return {key: _field(data[key], field_type) for key, field_type in fields.items()}
+    except (ValueError, TypeError, UnicodeError):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Niepoprawny kursor stronicowania.")
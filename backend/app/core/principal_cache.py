@@ -0,0 +1,96 @@
+"""
+Pamięć podręczna zalogowanych użytkowników (na worker).
+
+get_current_user wywoływany jest przy każdym uwierzytelnionym żądaniu, a dashboard wysyła ich kilka
+na jedno otwarcie strony. Trzymamy więc krótko (PRINCIPAL_CACHE_TTL_SECONDS) odłączoną migawkę kolumn
+użytkownika i dołączamy ją do sesji żądania przez merge(load=False) - bez zapytania do tabeli users.
+
+Każdy flush, który zmienia lub usuwa użytkownika albo jego wpisy wagi, unieważnia wpis w tym workerze.
+Zmiany z innych workerów widać najpóźniej po upływie TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.session import make_transient_to_detached
+
+from app.core.config import settings
+from app.models.sql_models import User, WeightEntry
+
+
+def _snapshot(user: User) -> User:
+    """Odłączona kopia samych kolumn użytkownika (bez relacji), bezpieczna do współdzielenia między żądaniami."""
+    mapper = inspect(User)
+    snapshot = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        set_committed_value(snapshot, attr.key, getattr(user, attr.key))
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+
+class PrincipalCache:
+    """Migawki użytkowników indeksowane id (oraz e-mailem - dla tokenów bez 'uid')."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int):
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[int, Tuple[User, float]]" = OrderedDict()
+        self._ids_by_email: Dict[str, int] = {}
+        self._ttl_seconds = ttl_seconds
+        self._max_entries = max_entries
+
+    def get(self, user_id: Optional[int] = None, email: Optional[str] = None) -> Optional[User]:
+        """Zwraca odłączoną migawkę (do użycia z merge(load=False)) lub None."""
+        with self._lock:
+            if user_id is None and email is not None:
+                user_id = self._ids_by_email.get(email)
+            cached = self._entries.get(user_id) if user_id is not None else None
+            if not cached:
+                return None
+            snapshot, expires_at = cached
+            if expires_at <= time.monotonic() or (email is not None and snapshot.email != email):
+                self._drop(user_id)
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def put(self, user: User) -> None:
+        snapshot = _snapshot(user)
+        with self._lock:
+            self._drop(snapshot.id)
+            self._entries[snapshot.id] = (snapshot, time.monotonic() + self._ttl_seconds)
+            self._ids_by_email[snapshot.email] = snapshot.id
+            while len(self._entries) > self._max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self, user_id: Optional[int]) -> None:
+        if user_id is None:
+            return
+        with self._lock:
+            self._drop(user_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._ids_by_email.clear()
+
+    def _drop(self, user_id: int) -> None:
+        cached = self._entries.pop(user_id, None)
+        if cached and self._ids_by_email.get(cached[0].email) == user_id:
+            del self._ids_by_email[cached[0].email]
+
+
+principal_cache = PrincipalCache(settings.PRINCIPAL_CACHE_TTL_SECONDS, settings.PRINCIPAL_CACHE_MAX_ENTRIES)
+
+
+@event.listens_for(Session, "after_flush")
+def _invalidate_flushed_users(session: Session, flush_context) -> None:
+    """Unieważnia migawki użytkowników zmienionych w tym flushu (także przez AsyncSession)."""
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            principal_cache.invalidate(obj.id)
+        elif isinstance(obj, WeightEntry):
+            principal_cache.invalidate(obj.owner_id)
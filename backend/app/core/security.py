@@ -1,23 +1,30 @@
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Any, Union
+from typing import Any, Optional, Tuple, Union
+from fastapi import HTTPException, status
 from jose import jwt
 from passlib.context import CryptContext
 from app.core.config import settings
 
 # Konfiguracja hashowania haseł
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
 
 ALGORITHM = "HS256"
 
-def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None) -> str:
+def create_access_token(subject: Union[str, Any], expires_delta: timedelta = None, user_id: Optional[int] = None) -> str:
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         # Pobieramy czas wygasania z ustawień lub domyślnie 30 minut
         expire_minutes = getattr(settings, "ACCESS_TOKEN_EXPIRE_MINUTES", 30)
         expire = datetime.utcnow() + timedelta(minutes=expire_minutes)
-    
+
     to_encode = {"exp": expire, "sub": str(subject)}
+    if user_id is not None:
+        # Niezmienne id użytkownika - pozwala pominąć wyszukiwanie po e-mailu
+        to_encode["uid"] = user_id
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
@@ -25,4 +32,52 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
\ No newline at end of file
+    return pwd_context.hash(password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Weryfikuje hasło; jeśli hash ma przestarzały koszt (BCRYPT_ROUNDS), zwraca też nowy hash."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+# --- HASHOWANIE POZA PĘTLĄ ZDARZEŃ ---
+# bcrypt to ~250 ms CPU na wywołanie. Liczymy go w osobnej puli procesów, żeby fala logowań
+# nie zajęła wątków, z których korzystają wszystkie pozostałe (synchroniczne) endpointy.
+
+_hash_executor: Optional[ProcessPoolExecutor] = None
+_pending_hash_jobs = 0
+
+def _get_hash_executor() -> ProcessPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        # 'spawn' - bezpieczniej niż fork w procesie z działającymi wątkami (uvicorn, pula wątków)
+        _hash_executor = ProcessPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _hash_executor
+
+def shutdown_hash_executor() -> None:
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False, cancel_futures=True)
+        _hash_executor = None
+
+async def _run_hash_job(func, *args):
+    """Uruchamia zadanie w puli procesów; przy zbyt długiej kolejce od razu odpowiada 503."""
+    global _pending_hash_jobs
+    if _pending_hash_jobs >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Serwer jest chwilowo przeciążony. Spróbuj ponownie za chwilę.",
+            headers={"Retry-After": "5"},
+        )
+    _pending_hash_jobs += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        _pending_hash_jobs -= 1
+
+async def get_password_hash_async(password: str) -> str:
+    return await _run_hash_job(get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return await _run_hash_job(verify_and_update_password, plain_password, hashed_password)
@@ -0,0 +1,38 @@
+"""
+Deduplikacja równoległych, kosztownych zadań ("single-flight").
+
+Jeśli kilka żądań w tym samym procesie poprosi o wynik dla tego samego klucza
+(np. naukę tego samego, nowego dania przez AI), uruchamiamy zadanie tylko raz,
+a pozostałe żądania czekają na jego wynik.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """Grupa zadań w locie, indeksowana kluczem."""
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def do(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Zwraca wynik zadania dla klucza. Pierwsze wywołanie tworzy zadanie, kolejne dołączają do niego.
+        Zadanie jest osłonięte (shield) - przerwanie jednego żądania nie przerywa nauki dla pozostałych.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda finished, k=key: self._forget(k, finished))
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Odbieramy wyjątek, nawet jeśli nikt już nie czeka na wynik (brak ostrzeżeń w logach)
+        if not task.cancelled():
+            task.exception()
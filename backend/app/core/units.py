@@ -2,12 +2,16 @@
 Moduł odpowiedzialny za standaryzację jednostek i nazw produktów.
 
 Ten plik zawiera logikę do:
-1.  Normalizacji nazw produktów (obsługa synonimów i częstych błędów).
-2.  Konwersji różnych jednostek miar na podstawowe jednostki metryczne (gramy 'g' lub mililitry 'ml').
+1.  Normalizacji nazw produktów (małe litery, polskie znaki; klucze porównawcze buduje morphology.name_key).
+2.  Konwersji różnych jednostek miar (także odmienionych, np. "2 łyżek") na podstawowe jednostki
+    metryczne (gramy 'g' lub mililitry 'ml') według skompilowanej tablicy przeliczników.
 3.  Inteligentnego domyślania się wagi na podstawie średniej wagi produktu,
     gdy jednostka to "sztuka" lub nie jest standardową jednostką miary.
 """
-from typing import Tuple, Union, Optional
+import unicodedata
+from typing import List, Optional, Sequence, Tuple, Union
+
+import numpy as np
 
 # Zakładając, że ProductState jest w pliku enums.py w tym samym katalogu
 try:
@@ -18,106 +22,172 @@ except ImportError:
         SOLID = "solid"
         LIQUID = "liquid"
 
-# --- Słownik Synonimów i Częstych Błędów ---
-SYNONYM_MAP = {
-    "dewolaj": "kotlet de volaille",
-    "devolay": "kotlet de volaille",
-    "kotlet po kijowsku": "kotlet de volaille",
-    "pałka z kurczaka": "podudzie z kurczaka",
-    "nóżka z kurczaka": "podudzie z kurczaka",
-    "schabowy": "kotlet schabowy",
-    "mielony": "kotlet mielony",
-    "talez": "talerz",
-    "plasterek": "plaster",
-}
-
-# --- NOWA ZMIANA: Lista wszystkich znanych, standardowych jednostek ---
-KNOWN_UNITS = [
+# --- Rejestr jednostek ---
+# Kanoniczna jednostka -> wszystkie akceptowane formy (odmiany, liczba mnoga, skróty).
+UNIT_ALIASES = {
     # Waga
-    "g", "gram", "gramy",
-    "dag", "dkg", "dekagram",
-    "kg", "kilogram", "kilogramy",
+    "g": ["g", "gram", "gramy", "grama", "gramów"],
+    "dag": ["dag", "dkg", "dekagram", "dekagramy", "dekagramów"],
+    "kg": ["kg", "kilogram", "kilogramy", "kilograma", "kilogramów"],
     # Objętość
-    "ml", "mililitr", "mililitry",
-    "l", "litr", "litry",
-    # Jednostki kuchenne i sztukowe
-    "szklanka", "szklanki",
-    "łyżka", "łyżki",
-    "łyżeczka", "łyżeczki",
-    "talerz", "miska", "plaster", "kromka", "garść",
-    "sztuka", "sztuki", "szt.", "szt"
-]
+    "ml": ["ml", "mililitr", "mililitry", "mililitrów"],
+    "l": ["l", "litr", "litry", "litra", "litrów"],
+    # Jednostki kuchenne
+    "szklanka": ["szklanka", "szklanki", "szklankę", "szklanek", "szkl", "szkl."],
+    "łyżka": ["łyżka", "łyżki", "łyżkę", "łyżek", "łyż", "łyż."],
+    "łyżeczka": ["łyżeczka", "łyżeczki", "łyżeczkę", "łyżeczek"],
+    "talerz": ["talerz", "talerze", "talerzy", "talez"],
+    "miska": ["miska", "miski", "miskę", "misek"],
+    "plaster": ["plaster", "plastry", "plastrów", "plasterek", "plasterki", "plasterków"],
+    "kromka": ["kromka", "kromki", "kromkę", "kromek"],
+    "garść": ["garść", "garści"],
+    # Sztuki - przeliczane przez średnią wagę produktu
+    "sztuka": ["sztuka", "sztuki", "sztukę", "sztuk", "szt.", "szt"],
+}
+
+# Przeliczniki jednostek kanonicznych na jednostkę bazową stanu (g dla ciał stałych, ml dla płynów)
+UNIT_FACTORS = {
+    ProductState.SOLID: {
+        "g": 1.0, "dag": 10.0, "kg": 1000.0,
+        "szklanka": 150.0, "łyżka": 15.0, "łyżeczka": 5.0,
+        "talerz": 200.0, "miska": 180.0, "plaster": 20.0, "kromka": 35.0, "garść": 30.0,
+    },
+    ProductState.LIQUID: {
+        "ml": 1.0, "l": 1000.0,
+        "szklanka": 250.0, "łyżka": 15.0, "łyżeczka": 5.0,
+        "talerz": 300.0, "miska": 400.0,
+    },
+}
+BASE_UNITS = {ProductState.SOLID: "g", ProductState.LIQUID: "ml"}
+
+# Masa podana dla płynu (lub objętość dla ciała stałego) - przeliczamy gęstością produktu (domyślnie jak woda)
+_CROSS_STATE_FACTORS = {
+    ProductState.SOLID: {"ml": 1.0, "l": 1000.0},
+    ProductState.LIQUID: {"g": 1.0, "dag": 10.0, "kg": 1000.0},
+}
+DEFAULT_DENSITY_G_PER_ML = 1.0
+
+PIECE_UNIT = "sztuka"
+
+# Skompilowane tablice: forma jednostki -> jednostka kanoniczna oraz (forma, stan) -> przelicznik
+UNIT_CANONICAL = {alias: canonical for canonical, aliases in UNIT_ALIASES.items() for alias in aliases}
+CONVERSION_TABLE = {
+    (alias, state): factors[canonical]
+    for alias, canonical in UNIT_CANONICAL.items()
+    for state, factors in UNIT_FACTORS.items() if canonical in factors
+}
+CROSS_STATE_TABLE = {
+    (alias, state): factors[canonical]
+    for alias, canonical in UNIT_CANONICAL.items()
+    for state, factors in _CROSS_STATE_FACTORS.items() if canonical in factors
+}
+
+# Wszystkie znane formy jednostek (do rozpoznawania jednostki w tekście)
+KNOWN_UNITS = frozenset(UNIT_CANONICAL)
+
+# Litery, których NFKD nie rozkłada na literę bazową + znak diakrytyczny
+_DIACRITIC_FOLD_MAP = str.maketrans({"ł": "l", "Ł": "L"})
+
+def fold_diacritics(text: str) -> str:
+    """
+    Usuwa polskie (i inne) znaki diakrytyczne: "chłodnik źródlany" -> "chlodnik zrodlany".
+    """
+    if not isinstance(text, str):
+        return text
+    decomposed = unicodedata.normalize("NFKD", text.translate(_DIACRITIC_FOLD_MAP))
+    return "".join(ch for ch in decomposed if not unicodedata.combining(ch))
 
 def normalize_name(name: str) -> str:
     """
-    Normalizuje nazwę produktu: zamienia na małe litery i sprawdza w słowniku synonimów.
+    Normalizuje nazwę produktu do wyświetlania i zapisu: małe litery, pojedyncze spacje.
+    Synonimy (np. "schabowy" -> "kotlet schabowy") są aliasami produktów i dań w bazie - rozwiązuje je leksykon,
+    a odmiany ("jajka"/"jajek"/"jajko") sprowadza do wspólnego klucza morphology.name_key.
     """
     if not isinstance(name, str):
         return name
-    
-    name_lower = name.lower().strip()
-    
-    if name_lower.endswith(('i', 'y')):
-        name_singular = name_lower[:-1]
-        if name_singular in SYNONYM_MAP:
-             return SYNONYM_MAP[name_singular]
+    return " ".join(name.lower().split())
+
+def canonical_unit(unit: str) -> Optional[str]:
+    """Zwraca kanoniczną nazwę jednostki ("łyżek" -> "łyżka") lub None dla nieznanej jednostki."""
+    return UNIT_CANONICAL.get(str(unit).lower().strip())
+
+def is_piece_unit(unit: str) -> bool:
+    return canonical_unit(unit) == PIECE_UNIT
+
+def _conversion(
+    unit: str,
+    state: Union[ProductState, str],
+    average_weight_g: Optional[float] = None,
+    density_g_per_ml: Optional[float] = None
+) -> Optional[Tuple[float, str]]:
+    """Przelicznik (mnożnik, jednostka bazowa) dla jednej pozycji albo None, gdy jednostki nie da się przeliczyć."""
+    unit_key = str(unit).lower().strip()
+    canonical = UNIT_CANONICAL.get(unit_key)
 
-    return SYNONYM_MAP.get(name_lower, name_lower)
+    # Jednostka niestandardowa (np. 'jabłko') lub 'sztuka' + znana średnia waga -> 'amount' sztuk produktu
+    if (canonical is None or canonical == PIECE_UNIT) and average_weight_g is not None and average_weight_g > 0:
+        return average_weight_g, "g"
+
+    # ProductState to str-enum, więc "solid" i ProductState.SOLID trafiają w ten sam klucz tablicy
+    factor = CONVERSION_TABLE.get((unit_key, state))
+    if factor is not None:
+        return factor, BASE_UNITS[state]
+
+    # Gramy dla płynu lub mililitry dla ciała stałego - przez gęstość
+    factor = CROSS_STATE_TABLE.get((unit_key, state))
+    if factor is not None:
+        density = density_g_per_ml if density_g_per_ml and density_g_per_ml > 0 else DEFAULT_DENSITY_G_PER_ML
+        if state == ProductState.SOLID:
+            return factor * density, "g"
+        return factor / density, "ml"
+    return None
 
-# --- NOWA, ZMODYFIKOWANA FUNKCJA ---
 def standardize_unit(
     amount: float,
     unit: str,
-    state: ProductState,
-    average_weight_g: Optional[float] = None
+    state: Union[ProductState, str],
+    average_weight_g: Optional[float] = None,
+    density_g_per_ml: Optional[float] = None
 ) -> Tuple[float, str]:
     """
     Standaryzuje jednostkę na gramy lub mililitry.
 
     Jeśli jednostka nie jest standardową miarą (np. 'jabłko') lub jest to 'sztuka',
     a produkt ma zdefiniowaną średnią wagę, używa tej wagi do konwersji.
-    W przeciwnym razie stosuje standardowe przeliczniki dla znanych jednostek.
+    W przeciwnym razie korzysta z tablicy przeliczników (obsługuje też odmiany, np. "2 łyżek", "szklankę").
+    """
+    conversion = _conversion(unit, state, average_weight_g, density_g_per_ml)
+    if conversion is None:
+        # Jednostka jest niestandardowa (np. "jabłko"), ale nie podano dla niej average_weight_g.
+        state_value = state.value if isinstance(state, ProductState) else state
+        raise ValueError(
+            f"Nie można przetworzyć jednostki '{unit}' dla produktu o stanie '{state_value}'. "
+            f"Jednostka jest nieznana lub wymaga podania średniej wagi (average_weight_g)."
+        )
+    factor, base_unit = conversion
+    return amount * factor, base_unit
+
+def standardize_many(
+    amounts: Sequence[float],
+    unit_names: Sequence[str],
+    states: Sequence[Union[ProductState, str]],
+    average_weights_g: Optional[Sequence[Optional[float]]] = None,
+    densities_g_per_ml: Optional[Sequence[Optional[float]]] = None
+) -> Tuple[np.ndarray, List[Optional[str]]]:
+    """
+    Wsadowa wersja standardize_unit: przeliczniki pobiera z tablicy raz na pozycję, a mnożenie robi NumPy.
+    Pozycje, których nie da się przeliczyć, dostają NaN i jednostkę None (zamiast wyjątku dla całej partii).
     """
-    unit_lower = str(unit).lower().strip()
-
-    # --- POCZĄTEK NOWEJ, INTELIGENTNEJ LOGIKI ---
-    is_standard_unit = unit_lower in KNOWN_UNITS
-    is_piece_unit = unit_lower in ["sztuka", "sztuki", "szt.", "szt"]
-
-    # Jeśli jednostka nie jest standardowa (np. unit='jabłko') LUB jest to 'sztuka',
-    # I mamy podaną średnią wagę, to używamy jej do konwersji.
-    if (not is_standard_unit or is_piece_unit) and average_weight_g is not None and average_weight_g > 0:
-        # Zakładamy, że użytkownik miał na myśli 'amount' sztuk produktu.
-        return amount * average_weight_g, "g"
-    # --- KONIEC NOWEJ LOGIKI ---
-
-    # --- Obsługa standardowych jednostek (logika zachowana, ale w nowej formie) ---
-    if state == ProductState.SOLID:
-        if unit_lower in ["g", "gram", "gramy"]: return amount, "g"
-        if unit_lower in ["dag", "dkg", "dekagram"]: return amount * 10, "g"
-        if unit_lower in ["kg", "kilogram", "kilogramy"]: return amount * 1000, "g"
-        if unit_lower in ["szklanka", "szklanki"]: return amount * 150.0, "g"
-        if unit_lower in ["łyżka", "łyżki"]: return amount * 15.0, "g"
-        if unit_lower in ["łyżeczka", "łyżeczki"]: return amount * 5.0, "g"
-        if unit_lower == "talerz": return amount * 200.0, "g"
-        if unit_lower == "miska": return amount * 180.0, "g"
-        if unit_lower == "plaster": return amount * 20.0, "g"
-        if unit_lower == "kromka": return amount * 35.0, "g"
-        if unit_lower == "garść": return amount * 30.0, "g"
-
-    elif state == ProductState.LIQUID:
-        if unit_lower in ["ml", "mililitr", "mililitry"]: return amount, "ml"
-        if unit_lower in ["l", "litr", "litry"]: return amount * 1000, "ml"
-        if unit_lower in ["szklanka", "szklanki"]: return amount * 250.0, "ml"
-        if unit_lower in ["łyżka", "łyżki"]: return amount * 15.0, "ml"
-        if unit_lower in ["łyżeczka", "łyżeczki"]: return amount * 5.0, "ml"
-        if unit_lower == "talerz": return amount * 300.0, "ml"
-        if unit_lower == "miska": return amount * 400.0, "ml"
-
-    # Jeśli nie udało się dopasować żadnej reguły, zgłaszamy błąd.
-    # Dzieje się tak, gdy jednostka jest niestandardowa (np. "jabłko"),
-    # ale nie podano dla niej average_weight_g.
-    raise ValueError(
-        f"Nie można przetworzyć jednostki '{unit}' dla produktu o stanie '{state.value}'. "
-        f"Jednostka jest nieznana lub wymaga podania średniej wagi (average_weight_g)."
-    )
+    count = len(amounts)
+    average_weights_g = average_weights_g if average_weights_g is not None else [None] * count
+    densities_g_per_ml = densities_g_per_ml if densities_g_per_ml is not None else [None] * count
+
+    factors = np.full(count, np.nan)
+    base_units: List[Optional[str]] = [None] * count
+    for i, (unit, state, average_weight_g, density) in enumerate(
+        zip(unit_names, states, average_weights_g, densities_g_per_ml)
+    ):
+        conversion = _conversion(unit, state, average_weight_g, density)
+        if conversion is not None:
+            factors[i], base_units[i] = conversion
+    return np.asarray(amounts, dtype=float) * factors, base_units
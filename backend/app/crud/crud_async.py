@@ -0,0 +1,260 @@
+"""
+Asynchroniczne odpowiedniki funkcji z crud_base (AsyncSession + aiosqlite) dla endpointów 'async def'.
+Relacje czytane poza sesją (np. wpisy posiłków) są ładowane od razu (selectinload),
+bo niejawne leniwe ładowanie nie działa w trybie asynchronicznym.
+"""
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+
+from app.crud import crud_base
+from app.models.sql_models import (
+    User, Meal, MealEntry, Workout, WaterEntry, WeightEntry, Conversation, ChatMessage, DailyTotals, UserChallenge
+)
+from app.models.enums import ChallengeStatus
+from app.schemas.all_schemas import WorkoutCreate
+
+
+# --- User Operations ---
+
+async def get_user_by_email(db: AsyncSession, email: str):
+    result = await db.execute(select(User).filter(User.email == email))
+    return result.scalars().first()
+
+async def get_user_by_id(db: AsyncSession, user_id: int):
+    result = await db.execute(select(User).filter(User.id == user_id))
+    return result.scalars().first()
+
+
+# --- Chat Operations ---
+
+async def get_conversation_by_id(db: AsyncSession, conversation_id: int, user_id: int):
+    """Pobiera jedną konwersację (bez wiadomości), sprawdzając, czy należy do użytkownika."""
+    result = await db.execute(
+        select(Conversation).filter(Conversation.id == conversation_id, Conversation.user_id == user_id)
+    )
+    return result.scalars().first()
+
+async def get_recent_messages(db: AsyncSession, conversation_id: int, limit: int, after_id: int = None):
+    """Ostatnie `limit` wiadomości konwersacji (opcjonalnie tylko nowsze niż after_id), w kolejności chronologicznej."""
+    query = select(ChatMessage).filter(ChatMessage.conversation_id == conversation_id)
+    if after_id is not None:
+        query = query.filter(ChatMessage.id > after_id)
+    result = await db.execute(query.order_by(ChatMessage.id.desc()).limit(limit))
+    return list(reversed(result.scalars().all()))
+
+async def get_oldest_messages(db: AsyncSession, conversation_id: int, limit: int, after_id: int = None):
+    """Najstarsze `limit` wiadomości konwersacji (opcjonalnie tylko nowsze niż after_id), w kolejności chronologicznej."""
+    query = select(ChatMessage).filter(ChatMessage.conversation_id == conversation_id)
+    if after_id is not None:
+        query = query.filter(ChatMessage.id > after_id)
+    result = await db.execute(query.order_by(ChatMessage.id).limit(limit))
+    return result.scalars().all()
+
+async def add_message_to_conversation(db: AsyncSession, conversation: Conversation, role: str, content: str):
+    """Dodaje nową wiadomość do konwersacji i aktualizuje jej znacznik czasu."""
+    db_message = ChatMessage(conversation_id=conversation.id, role=role, content=content)
+    db.add(db_message)
+    # Aktualizuje 'created_at', aby działało jako znacznik czasu 'updated_at'
+    conversation.created_at = datetime.utcnow()
+    await db.commit()
+    await db.refresh(db_message)
+    return db_message
+
+
+# --- Meal Operations ---
+
+async def get_meals_by_date(db: AsyncSession, user_id: int, target_date: date):
+    """Pobiera posiłki użytkownika (z wpisami) z określonej daty."""
+    result = await db.execute(
+        select(Meal)
+        .options(selectinload(Meal.entries))
+        .filter(Meal.owner_id == user_id, Meal.date == target_date)
+    )
+    return result.scalars().all()
+
+async def get_meals_by_date_range(db: AsyncSession, user_id: int, start_date: date, end_date: date):
+    """Pobiera posiłki użytkownika (z wpisami) z zadanego okresu."""
+    result = await db.execute(
+        select(Meal)
+        .options(selectinload(Meal.entries))
+        .filter(Meal.owner_id == user_id, Meal.date.between(start_date, end_date))
+        .order_by(Meal.date)
+    )
+    return result.scalars().all()
+
+
+# --- Workout Operations ---
+
+async def create_workout(db: AsyncSession, workout: WorkoutCreate, user_id: int):
+    """Tworzy wpis o treningu."""
+    db_workout = Workout(**workout.model_dump(exclude={"text", "manual_calories"}), owner_id=user_id)
+    db.add(db_workout)
+    await db.run_sync(crud_base.refresh_daily_totals, user_id=user_id, days=[db_workout.date])
+    await db.commit()
+    await db.refresh(db_workout)
+    return db_workout
+
+async def get_workouts_by_date_range(db: AsyncSession, user_id: int, start_date: date, end_date: date):
+    """Pobiera treningi z zadanego okresu."""
+    result = await db.execute(
+        select(Workout).filter(Workout.owner_id == user_id, Workout.date.between(start_date, end_date))
+    )
+    return result.scalars().all()
+
+
+# --- Weight Operations ---
+
+async def get_weight_history_by_date_range(db: AsyncSession, user_id: int, start_date: date, end_date: date):
+    """Pobiera historię wagi z zadanego okresu."""
+    result = await db.execute(
+        select(WeightEntry)
+        .filter(WeightEntry.owner_id == user_id, WeightEntry.date.between(start_date, end_date))
+        .order_by(WeightEntry.date)
+    )
+    return result.scalars().all()
+
+
+# --- Daily Totals ---
+
+async def get_daily_totals_by_date_range(db: AsyncSession, user_id: int, start_date: date, end_date: date):
+    """Pobiera sumy dzienne z zadanego okresu (tylko dni z wpisami)."""
+    result = await db.execute(
+        select(DailyTotals)
+        .filter(DailyTotals.owner_id == user_id, DailyTotals.date.between(start_date, end_date))
+        .order_by(DailyTotals.date)
+    )
+    return result.scalars().all()
+
+async def get_daily_totals_columns(db: AsyncSession, user_id: int, start_date: date, end_date: date):
+    """
+    Sumy dzienne z okresu jako krotki (data, calories, protein, fat, carbs, calories_burned, meal_count)
+    - do obliczeń w NumPy.
+    """
+    result = await db.execute(
+        select(
+            DailyTotals.date, DailyTotals.calories, DailyTotals.protein,
+            DailyTotals.fat, DailyTotals.carbs, DailyTotals.calories_burned, DailyTotals.meal_count
+        )
+        .filter(DailyTotals.owner_id == user_id, DailyTotals.date.between(start_date, end_date))
+        .order_by(DailyTotals.date)
+    )
+    return result.all()
+
+async def get_daily_weights(db: AsyncSession, user_id: int, start_date: date, end_date: date):
+    """Średnia waga z każdego dnia z pomiarem w zadanym okresie, jako krotki (data, waga)."""
+    result = await db.execute(
+        select(WeightEntry.date, func.avg(WeightEntry.weight))
+        .filter(WeightEntry.owner_id == user_id, WeightEntry.date.between(start_date, end_date))
+        .group_by(WeightEntry.date)
+        .order_by(WeightEntry.date)
+    )
+    return result.all()
+
+
+# --- Challenge Verification ---
+
+async def claim_challenges_to_verify(db: AsyncSession, limit: int, lease_minutes: int):
+    """
+    Przejmuje (dzierżawi) do `limit` aktywnych wyzwań po terminie i zwraca je jako krotki
+    (id, user_id, challenge_id, start_date, end_date). Jedno UPDATE ... RETURNING, więc dwa workery
+    nie dostaną tego samego wiersza; dzierżawa porzucona przez przerwany proces wygasa po lease_minutes.
+    """
+    now = datetime.utcnow()
+    claimable = (
+        select(UserChallenge.id)
+        .filter(
+            UserChallenge.status == ChallengeStatus.ACTIVE,
+            UserChallenge.end_date < date.today(),
+            or_(
+                UserChallenge.verification_claimed_at.is_(None),
+                UserChallenge.verification_claimed_at < now - timedelta(minutes=lease_minutes),
+            ),
+        )
+        .order_by(UserChallenge.end_date, UserChallenge.id)
+        .limit(limit)
+    )
+    result = await db.execute(
+        update(UserChallenge)
+        .where(UserChallenge.id.in_(claimable.scalar_subquery()))
+        .values(verification_claimed_at=now)
+        .returning(
+            UserChallenge.id, UserChallenge.user_id, UserChallenge.challenge_id,
+            UserChallenge.start_date, UserChallenge.end_date
+        )
+        .execution_options(synchronize_session=False)
+    )
+    claimed = result.all()
+    await db.commit()
+    return claimed
+
+async def get_meal_logs_for_users(db: AsyncSession, user_ids, start_date: date, end_date: date):
+    """Nazwy wpisów posiłków wielu użytkowników z okresu, jako krotki (owner_id, data, nazwa) w kolejności dni."""
+    result = await db.execute(
+        select(Meal.owner_id, Meal.date, MealEntry.product_name)
+        .join(MealEntry, MealEntry.meal_id == Meal.id)
+        .filter(Meal.owner_id.in_(user_ids), Meal.date.between(start_date, end_date))
+        .order_by(Meal.owner_id, Meal.date, Meal.id, MealEntry.id)
+    )
+    return result.all()
+
+async def get_workout_logs_for_users(db: AsyncSession, user_ids, start_date: date, end_date: date):
+    """Nazwy treningów wielu użytkowników z okresu, jako krotki (owner_id, data, nazwa) w kolejności dni."""
+    result = await db.execute(
+        select(Workout.owner_id, Workout.date, Workout.name)
+        .filter(Workout.owner_id.in_(user_ids), Workout.date.between(start_date, end_date))
+        .order_by(Workout.owner_id, Workout.date, Workout.id)
+    )
+    return result.all()
+
+async def get_daily_sums_for_users(db: AsyncSession, source: str, metric: str, user_ids, start_date: date, end_date: date,
+                                   meal_category=None):
+    """
+    Dzienne sumy kolumny `metric` (albo liczba posiłków/wpisów dla metric="count") ze źródła "meals", "water"
+    lub "workouts" dla wielu użytkowników, jako krotki (owner_id, data, wartość) - tylko dni z wpisami.
+    """
+    if source == "meals":
+        model = Meal
+        value = func.count(func.distinct(Meal.id)) if metric == "count" else func.sum(getattr(MealEntry, metric))
+        # Złączenie wewnętrzne - posiłek bez wpisów się nie liczy (jak meal_count w daily_totals)
+        query = select(Meal.owner_id, Meal.date, value).join(MealEntry, MealEntry.meal_id == Meal.id)
+        if meal_category is not None:
+            query = query.filter(Meal.category == meal_category)
+    else:
+        model = WaterEntry if source == "water" else Workout
+        value = func.count(model.id) if metric == "count" else func.sum(getattr(model, metric))
+        query = select(model.owner_id, model.date, value)
+    result = await db.execute(
+        query.filter(model.owner_id.in_(user_ids), model.date.between(start_date, end_date))
+        .group_by(model.owner_id, model.date)
+    )
+    return result.all()
+
+async def get_user_goals(db: AsyncSession, user_ids, goals) -> dict:
+    """Wybrane cele z profili użytkowników: user_id -> {nazwa celu: wartość}."""
+    goals = sorted(goals)
+    result = await db.execute(select(User.id, *(getattr(User, goal) for goal in goals)).filter(User.id.in_(user_ids)))
+    return {user_id: dict(zip(goals, values)) for user_id, *values in result.all()}
+
+async def finish_challenge_verification(db: AsyncSession, user_challenge_id: int, status: ChallengeStatus) -> bool:
+    """Zapisuje werdykt i zwalnia dzierżawę (od razu commit - to punkt kontrolny). False, jeśli wyzwanie nie było już aktywne."""
+    result = await db.execute(
+        update(UserChallenge)
+        .where(UserChallenge.id == user_challenge_id, UserChallenge.status == ChallengeStatus.ACTIVE)
+        .values(status=status, verification_claimed_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+async def release_challenge_claims(db: AsyncSession, user_challenge_ids) -> None:
+    """Zwalnia dzierżawy wierszy bez werdyktu (pominiętych lub z błędem), żeby następny przebieg wziął je od razu."""
+    await db.execute(
+        update(UserChallenge)
+        .where(UserChallenge.id.in_(user_challenge_ids), UserChallenge.status == ChallengeStatus.ACTIVE)
+        .values(verification_claimed_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
@@ -1,5 +1,6 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import func, or_
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import case, func, insert, or_, text, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm.attributes import flag_modified # Upewnij się, że masz ten import
 from datetime import date, datetime, timedelta
 import json
@@ -9,16 +10,21 @@ import json
 # Modele SQL
 from app.models.sql_models import (
     User, Meal, MealEntry, WaterEntry, WeightEntry, Workout,
-    Dish, DishIngredient, Product, Friendship, UserChallenge, Conversation, ChatMessage
+    Dish, DishIngredient, Product, Friendship, UserChallenge, Conversation, ChatMessage,
+    FoodLexiconVersion, AIResponseCache, DailyTotals, IdempotencyKey
 )
 # Schematy Pydantic
 from app.schemas.all_schemas import (
-    UserCreate, UserUpdate, MealCreate, MealEntryCreate, WaterEntryCreate,
+    UserCreate, UserUpdate, MealCreate, MealEntryCreate, MealBatchCreate, WaterEntryCreate,
     WeightEntryCreate, WorkoutCreate, ProductCreate, DishCreate, FriendshipStatus,
-    ChallengeStatus # Przeniesienie Enumów do schematów/bazowej lokalizacji
+    ChallengeStatus, # Przeniesienie Enumów do schematów/bazowej lokalizacji
+    ProductState
 )
 # Bezpieczeństwo
+from app.core.config import settings
 from app.core.security import get_password_hash
+from app.core.principal_cache import principal_cache
+from app.core.friend_cache import friend_cache
 # Enums, jeśli nie są częścią schematów (zakładam, że powinny być globalne lub w schemas)
 # ZAKŁADAM, ŻE FriendshipStatus, ChallengeStatus SĄ DOSTĘPNE W all_schemas
 # Usuwam pierwotne importy schemas i models
@@ -80,6 +86,7 @@ def delete_user(db: Session, user_id: int) -> bool:
     if db_user:
         db.delete(db_user)
         db.commit()
+        principal_cache.invalidate(user_id)
         return True
     return False
 
@@ -89,11 +96,57 @@ def get_product_by_name(db: Session, name: str):
     """Wyszukuje produkt podstawowy po jego unikalnej nazwie (ignoruje wielkość liter)."""
     return db.query(Product).filter(func.lower(Product.name) == func.lower(name)).first()
 
+def get_products_by_names(db: Session, names) -> dict:
+    """
+    Wyszukuje wiele produktów jednym zapytaniem (IN) zamiast osobnego zapytania na nazwę.
+    Zwraca słownik: nazwa małymi literami -> produkt (tylko dla nazw, które istnieją w bazie).
+    """
+    unique_names = {name.lower(): name for name in names if name}
+    if not unique_names:
+        return {}
+    products = db.query(Product).filter(
+        func.lower(Product.name).in_([func.lower(name) for name in unique_names.values()])
+    ).all()
+    return {product.name.lower(): product for product in products}
+
+# Wartości odżywcze produktu utworzonego tylko po to, by przepis dania miał składnik (do uzupełnienia przez AI)
+PLACEHOLDER_NUTRIENTS = {"calories": 0, "protein": 0, "fat": 0, "carbs": 0}
+
+def is_placeholder_product(product: Product) -> bool:
+    """Czy produkt to symbol zastępczy składnika (same zera w wartościach odżywczych)."""
+    return not any((product.nutrients or {}).get(key) for key in PLACEHOLDER_NUTRIENTS)
+
+def fill_placeholder_product(db: Session, product: ProductCreate, names) -> Product:
+    """
+    Jeśli produkt o jednej z nazw to symbol zastępczy, uzupełnia go danymi `product` (razem z podsumowaniami
+    dań, w których występuje) i zwraca. W przeciwnym razie zwraca None.
+    """
+    for name in names:
+        existing = get_product_by_name(db, name=name)
+        if existing is None or not is_placeholder_product(existing):
+            continue
+        new_aliases = [alias for alias in (product.name, *product.aliases) if alias.lower() != existing.name.lower()]
+        existing.aliases = list(dict.fromkeys([*(existing.aliases or []), *new_aliases]))
+        existing.state = product.state
+        existing.average_weight_g = product.average_weight_g
+        return update_product_nutrients(db, existing, product.nutrients)
+    return None
+
 def create_product(db: Session, product: ProductCreate) -> Product:
-    """Tworzy nowy produkt podstawowy w bazie."""
+    """
+    Tworzy nowy produkt podstawowy w bazie.
+    Jeśli produkt o tej nazwie właśnie powstał (np. w innym workerze), zwraca istniejący zamiast zgłaszać błąd.
+    """
     db_product = Product(**product.model_dump())
     db.add(db_product)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = get_product_by_name(db, name=product.name)
+        if existing is None:
+            raise
+        return existing
     db.refresh(db_product)
     return db_product
 
@@ -102,41 +155,198 @@ def get_dish_by_name(db: Session, name: str):
     return db.query(Dish).filter(func.lower(Dish.name) == func.lower(name)).first()
 
 def create_dish_with_ingredients(db: Session, dish: DishCreate) -> Dish:
-    """Tworzy nowe danie i jego powiązania ze składnikami."""
+    """
+    Tworzy nowe danie i jego powiązania ze składnikami.
+    Jeśli danie o tej nazwie już istnieje (wyścig między workerami), zwraca istniejące.
+    """
     db_dish = Dish(name=dish.name, category=dish.category, aliases=dish.aliases)
     db.add(db_dish)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        existing = get_dish_by_name(db, name=dish.name)
+        if existing is None:
+            raise
+        return existing
     db.refresh(db_dish)
 
+    existing_products = get_products_by_names(db, [ing.product_name for ing in dish.ingredients])
     for ing in dish.ingredients:
-        db_product = get_product_by_name(db, name=ing.product_name)
+        db_product = existing_products.get(ing.product_name.lower())
         # Jeśli produkt składnika nie istnieje, utwórz dla niego symbol zastępczy
         if not db_product:
             placeholder_product = ProductCreate(
                 name=ing.product_name,
-                nutrients={"calories": 0, "protein": 0, "fat": 0, "carbs": 0},
-                state="SOLID" # Zakładając, że ProductState jest zaimportowany lub używamy surowego ciągu/enum
+                nutrients=dict(PLACEHOLDER_NUTRIENTS),
+                state=ProductState.SOLID
             )
             db_product = create_product(db, placeholder_product)
+            existing_products[ing.product_name.lower()] = db_product
         # Utwórz połączenie między daniem a składnikiem
         db_dish_ingredient = DishIngredient(
             dish_id=db_dish.id, product_id=db_product.id, weight_g=ing.weight_g
         )
         db.add(db_dish_ingredient)
+    db.flush()
+    refresh_dish_rollups(db, dish_ids=[db_dish.id])
     db.commit()
     db.refresh(db_dish)
     return db_dish
 
+def update_product_nutrients(db: Session, product: Product, nutrients: dict) -> Product:
+    """Aktualizuje wartości odżywcze produktu i przelicza podsumowania dań, w których występuje."""
+    product.nutrients = nutrients
+    flag_modified(product, "nutrients")
+    db.flush()
+    dish_ids = [row.dish_id for row in db.query(DishIngredient.dish_id).filter(DishIngredient.product_id == product.id).distinct()]
+    refresh_dish_rollups(db, dish_ids=dish_ids)
+    db.commit()
+    db.refresh(product)
+    return product
+
+# --- PODSUMOWANIA (ROLLUPY) DAŃ ---
+
+def compute_dish_rollup(ingredients) -> dict:
+    """
+    Liczy podsumowanie przepisu z krotek (waga_g, nutrienty_na_100g, stan):
+    łączną wagę, stan dania (płynne, jeśli >50% wagi to płyny) i makro na 100g.
+    """
+    total_weight = 0.0
+    liquid_weight = 0.0
+    totals = {"calories": 0.0, "protein": 0.0, "fat": 0.0, "carbs": 0.0}
+    for weight_g, nutrients, state in ingredients:
+        if weight_g is None:
+            continue
+        total_weight += weight_g
+        if state == ProductState.LIQUID:
+            liquid_weight += weight_g
+        if nutrients:
+            for key in totals:
+                totals[key] += (nutrients.get(key) or 0) * weight_g / 100.0
+
+    if total_weight <= 0:
+        return {
+            "total_weight_g": 0.0, "state": ProductState.SOLID,
+            "calories_per_100g": 0.0, "protein_per_100g": 0.0, "fat_per_100g": 0.0, "carbs_per_100g": 0.0
+        }
+    return {
+        "total_weight_g": total_weight,
+        "state": ProductState.LIQUID if liquid_weight / total_weight > 0.5 else ProductState.SOLID,
+        "calories_per_100g": totals["calories"] * 100.0 / total_weight,
+        "protein_per_100g": totals["protein"] * 100.0 / total_weight,
+        "fat_per_100g": totals["fat"] * 100.0 / total_weight,
+        "carbs_per_100g": totals["carbs"] * 100.0 / total_weight,
+    }
+
+def refresh_dish_rollups(db: Session, dish_ids=None) -> int:
+    """
+    Przelicza podsumowania wielu dań (lub wszystkich, gdy dish_ids=None) dwoma zapytaniami.
+    Nie robi commita. Zwraca liczbę przeliczonych dań.
+    """
+    rows_query = db.query(
+        DishIngredient.dish_id, DishIngredient.weight_g, Product.nutrients, Product.state
+    ).join(Product, DishIngredient.product_id == Product.id)
+    dishes_query = db.query(Dish)
+    if dish_ids is not None:
+        if not dish_ids:
+            return 0
+        rows_query = rows_query.filter(DishIngredient.dish_id.in_(dish_ids))
+        dishes_query = dishes_query.filter(Dish.id.in_(dish_ids))
+
+    ingredients_by_dish = {}
+    for dish_id, weight_g, nutrients, state in rows_query:
+        ingredients_by_dish.setdefault(dish_id, []).append((weight_g, nutrients, state))
+
+    count = 0
+    for dish in dishes_query:
+        for key, value in compute_dish_rollup(ingredients_by_dish.get(dish.id, [])).items():
+            setattr(dish, key, value)
+        count += 1
+    return count
+
+# --- OPERACJE DLA LEKSYKONU ŻYWNOŚCI ---
+
+def get_all_products(db: Session):
+    """Pobiera wszystkie produkty podstawowe (do budowy leksykonu w pamięci)."""
+    return db.query(Product).all()
+
+def get_all_dishes(db: Session):
+    """Pobiera wszystkie dania bez ich składników."""
+    return db.query(Dish).all()
+
+def get_all_dish_ingredient_rows(db: Session):
+    """Pobiera wszystkie składniki wszystkich dań jednym zapytaniem (dish_id, nazwa, waga, nutrienty, stan)."""
+    return db.query(
+        DishIngredient.dish_id, Product.name, DishIngredient.weight_g, Product.nutrients, Product.state
+    ).join(Product, DishIngredient.product_id == Product.id).order_by(DishIngredient.id).all()
+
+def get_food_lexicon_version(db: Session) -> int:
+    """Zwraca współdzieloną (między workerami) wersję bazy żywności."""
+    row = db.query(FoodLexiconVersion).filter(FoodLexiconVersion.id == 1).first()
+    return row.version if row else 0
+
+def bump_food_lexicon_version(db: Session) -> int:
+    """Zwiększa współdzieloną wersję bazy żywności i zwraca nową wartość."""
+    row = db.query(FoodLexiconVersion).filter(FoodLexiconVersion.id == 1).first()
+    if row:
+        row.version = FoodLexiconVersion.version + 1
+    else:
+        db.add(FoodLexiconVersion(id=1, version=1))
+    db.commit()
+    return get_food_lexicon_version(db)
+
+# --- PAMIĘĆ PODRĘCZNA ODPOWIEDZI AI ---
+
+def get_ai_cache_entry(db: Session, key: str):
+    """Zwraca zapisaną odpowiedź AI dla klucza, jeśli jeszcze nie wygasła."""
+    return db.query(AIResponseCache).filter(
+        AIResponseCache.key == key, AIResponseCache.expires_at > datetime.utcnow()
+    ).first()
+
+def save_ai_cache_entry(db: Session, key: str, call_site: str, response: str, expires_at: datetime):
+    """Zapisuje (lub nadpisuje) odpowiedź AI w trwałej pamięci podręcznej."""
+    db.merge(AIResponseCache(
+        key=key, call_site=call_site, response=response,
+        created_at=datetime.utcnow(), expires_at=expires_at
+    ))
+    db.commit()
+
+def delete_expired_ai_cache_entries(db: Session) -> int:
+    """Usuwa wygasłe odpowiedzi AI i zwraca liczbę usuniętych wpisów."""
+    deleted = db.query(AIResponseCache).filter(AIResponseCache.expires_at <= datetime.utcnow()).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
 # --- NOWE OPERACJE DLA WIELOWĄTKOWEGO CZATU ---
 
-def get_user_conversations(db: Session, user_id: int):
-    """Pobiera wszystkie konwersacje użytkownika, najnowsze i przypięte na górze."""
-    return db.query(Conversation).filter(Conversation.user_id == user_id).order_by(Conversation.is_pinned.desc(), Conversation.created_at.desc()).all()
+def get_user_conversations(db: Session, user_id: int, limit: int = None, after=None):
+    """
+    Pobiera konwersacje użytkownika, najnowsze i przypięte na górze.
+    Przy stronicowaniu `after` to (is_pinned, created_at, id) ostatniej konwersacji poprzedniej strony.
+    """
+    query = db.query(Conversation).filter(Conversation.user_id == user_id)
+    if after is not None:
+        query = query.filter(tuple_(Conversation.is_pinned, Conversation.created_at, Conversation.id) < tuple_(*after))
+    query = query.order_by(Conversation.is_pinned.desc(), Conversation.created_at.desc(), Conversation.id.desc())
+    if limit is not None:
+        query = query.limit(limit)
+    return query.all()
 
 def get_conversation_by_id(db: Session, conversation_id: int, user_id: int):
     """Pobiera jedną konwersację, sprawdzając, czy należy do użytkownika."""
     return db.query(Conversation).filter(Conversation.id == conversation_id, Conversation.user_id == user_id).first()
 
+def get_conversation_messages(db: Session, conversation_id: int, limit: int, before=None):
+    """
+    Pobiera `limit` najnowszych wiadomości konwersacji (od najnowszej), a przy `before` = (created_at, id)
+    tylko starsze od wskazanej - kolejne strony historii bez OFFSET.
+    """
+    query = db.query(ChatMessage).filter(ChatMessage.conversation_id == conversation_id)
+    if before is not None:
+        query = query.filter(tuple_(ChatMessage.created_at, ChatMessage.id) < tuple_(*before))
+    return query.order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc()).limit(limit).all()
+
 def create_conversation(db: Session, user_id: int, title: str = "Nowy czat"):
     """Tworzy nową, pustą konwersację dla użytkownika."""
     db_conversation = Conversation(user_id=user_id, title=title)
@@ -167,9 +377,9 @@ def create_user_meal(db: Session, meal: MealCreate, user_id: int):
     db.refresh(db_meal)
     return db_meal
 
-def add_entry_to_meal(db: Session, entry: MealEntryCreate, meal_id: int):
-    """Dodaje wpis żywnościowy do określonego posiłku."""
-    db_entry = MealEntry(
+def _meal_entry_values(entry: MealEntryCreate, meal_id: int) -> dict:
+    """Kolumny nowego wpisu posiłku (wspólne dla pojedynczego i wsadowego dodawania)."""
+    return dict(
         product_name=entry.product_name,
         calories=entry.calories, protein=entry.protein, fat=entry.fat, carbs=entry.carbs,
         original_amount=entry.amount, original_unit=entry.unit,
@@ -179,7 +389,14 @@ def add_entry_to_meal(db: Session, entry: MealEntryCreate, meal_id: int):
         display_quantity_text=entry.display_quantity_text,
         is_default_quantity=entry.is_default_quantity
     )
+
+def add_entry_to_meal(db: Session, entry: MealEntryCreate, meal_id: int):
+    """Dodaje wpis żywnościowy do określonego posiłku."""
+    db_entry = MealEntry(**_meal_entry_values(entry, meal_id))
     db.add(db_entry)
+    db_meal = db.query(Meal).filter(Meal.id == meal_id).first()
+    if db_meal:
+        refresh_daily_totals(db, user_id=db_meal.owner_id, days=[db_meal.date])
     db.commit()
     db.refresh(db_entry)
     return db_entry
@@ -207,15 +424,68 @@ def update_meal_entry(db: Session, entry_id: int, entry_data: MealEntryCreate):
             # Dla wszystkich innych pól używamy standardowego setattr
             setattr(db_entry, key, value)
 
+    if db_entry.meal:
+        refresh_daily_totals(db, user_id=db_entry.meal.owner_id, days=[db_entry.meal.date])
     db.commit()
     db.refresh(db_entry)
     return db_entry
 
+def create_meals_batch(db: Session, batch: MealBatchCreate, user_id: int, idempotency_key: str = None, request_hash: str = None):
+    """
+    Zapisuje nowe posiłki z wpisami oraz wpisy do istniejących posiłków jedną transakcją (wsadowe INSERT-y,
+    jeden commit). Z kluczem idempotencji zapisuje też wynik, żeby ponowienie go zwróciło zamiast duplikować.
+    Zwraca słownik zgodny z MealBatchResult albo None, jeśli któryś z posiłków nie należy do użytkownika.
+    """
+    # Własność istniejących posiłków sprawdzamy jednym zapytaniem
+    meal_dates = {}
+    existing_ids = {entry.meal_id for entry in batch.entries}
+    if existing_ids:
+        meal_dates = dict(db.query(Meal.id, Meal.date).filter(Meal.id.in_(existing_ids), Meal.owner_id == user_id))
+        if len(meal_dates) != len(existing_ids):
+            return None
+
+    new_meal_ids = []
+    if batch.meals:
+        meal_rows = [{**meal.model_dump(exclude={"entries"}), "owner_id": user_id} for meal in batch.meals]
+        new_meal_ids = list(db.scalars(insert(Meal).returning(Meal.id, sort_by_parameter_order=True), meal_rows))
+
+    entry_rows = [
+        _meal_entry_values(entry, meal_id)
+        for meal_id, meal in zip(new_meal_ids, batch.meals) for entry in meal.entries
+    ] + [_meal_entry_values(entry, entry.meal_id) for entry in batch.entries]
+    entry_ids = []
+    if entry_rows:
+        entry_ids = list(db.scalars(insert(MealEntry).returning(MealEntry.id, sort_by_parameter_order=True), entry_rows))
+
+    # Id wpisów wracają w kolejności z żądania - dzielimy je z powrotem na posiłki
+    created_meals, position = [], 0
+    for meal_id, meal in zip(new_meal_ids, batch.meals):
+        created_meals.append({"id": meal_id, "entry_ids": entry_ids[position:position + len(meal.entries)]})
+        position += len(meal.entries)
+    result = {"meals": created_meals, "entry_ids": entry_ids[position:]}
+
+    if idempotency_key:
+        db.add(IdempotencyKey(user_id=user_id, key=idempotency_key, request_hash=request_hash, response=result))
+    refresh_daily_totals(db, user_id=user_id, days={meal.date for meal in batch.meals} | set(meal_dates.values()))
+    db.commit()
+    return result
+
+def get_idempotency_key(db: Session, user_id: int, key: str):
+    """Pobiera zapisany wynik żądania o danym kluczu idempotencji."""
+    return db.query(IdempotencyKey).filter(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key).first()
+
+def delete_expired_idempotency_keys(db: Session) -> int:
+    """Usuwa klucze idempotencji starsze niż IDEMPOTENCY_KEY_TTL_HOURS."""
+    cutoff = datetime.utcnow() - timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS)
+    deleted = db.query(IdempotencyKey).filter(IdempotencyKey.created_at <= cutoff).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
 def get_meals_by_date(db: Session, user_id: int, target_date: date):
-    """Pobiera posiłki użytkownika z określonej daty."""
-    return db.query(Meal).filter(
+    """Pobiera posiłki użytkownika z określonej daty (z wpisami, wczytanymi jednym dodatkowym zapytaniem)."""
+    return db.query(Meal).options(selectinload(Meal.entries)).filter(
         Meal.owner_id == user_id,
-        func.date(Meal.date) == target_date
+        Meal.date == target_date
     ).all()
 
 def get_meals_by_date_range(db: Session, user_id: int, start_date: date, end_date: date):
@@ -229,6 +499,7 @@ def delete_meal(db: Session, meal_id: int, user_id: int):
     db_meal = db.query(Meal).filter(Meal.id == meal_id, Meal.owner_id == user_id).first()
     if db_meal:
         db.delete(db_meal)
+        refresh_daily_totals(db, user_id=user_id, days=[db_meal.date])
         db.commit()
         return True
     return False
@@ -239,7 +510,9 @@ def delete_meal_entry(db: Session, entry_id: int, user_id: int):
         MealEntry.id == entry_id, Meal.owner_id == user_id
     ).first()
     if db_entry:
+        meal_date = db_entry.meal.date
         db.delete(db_entry)
+        refresh_daily_totals(db, user_id=user_id, days=[meal_date])
         db.commit()
         return True
     return False
@@ -250,6 +523,7 @@ def add_water_entry(db: Session, water_entry: WaterEntryCreate, user_id: int):
     """Dodaje wpis o spożyciu wody."""
     db_entry = WaterEntry(**water_entry.model_dump(), owner_id=user_id)
     db.add(db_entry)
+    refresh_daily_totals(db, user_id=user_id, days=[db_entry.date])
     db.commit()
     db.refresh(db_entry)
     return db_entry
@@ -258,7 +532,7 @@ def get_water_entries_by_date(db: Session, user_id: int, target_date: date):
     """Pobiera wpisy o wodzie z określonej daty."""
     return db.query(WaterEntry).filter(
         WaterEntry.owner_id == user_id,
-        func.date(WaterEntry.date) == target_date
+        WaterEntry.date == target_date
     ).all()
 
 def delete_water_entry(db: Session, water_entry_id: int, user_id: int):
@@ -266,14 +540,16 @@ def delete_water_entry(db: Session, water_entry_id: int, user_id: int):
     db_entry = db.query(WaterEntry).filter(WaterEntry.id == water_entry_id, WaterEntry.owner_id == user_id).first()
     if db_entry:
         db.delete(db_entry)
+        refresh_daily_totals(db, user_id=user_id, days=[db_entry.date])
         db.commit()
         return True
     return False
 
 def create_workout(db: Session, workout: WorkoutCreate, user_id: int):
     """Tworzy wpis o treningu."""
-    db_workout = Workout(**workout.model_dump(), owner_id=user_id)
+    db_workout = Workout(**workout.model_dump(exclude={"text", "manual_calories"}), owner_id=user_id)
     db.add(db_workout)
+    refresh_daily_totals(db, user_id=user_id, days=[db_workout.date])
     db.commit()
     db.refresh(db_workout)
     return db_workout
@@ -282,7 +558,7 @@ def get_workouts_by_date(db: Session, user_id: int, target_date: date):
     """Pobiera treningi z określonej daty."""
     return db.query(Workout).filter(
         Workout.owner_id == user_id,
-        func.date(Workout.date) == target_date
+        Workout.date == target_date
     ).all()
 
 def get_workouts_by_date_range(db: Session, user_id: int, start_date: date, end_date: date):
@@ -296,6 +572,7 @@ def delete_workout(db: Session, workout_id: int, user_id: int):
     db_workout = db.query(Workout).filter(Workout.id == workout_id, Workout.owner_id == user_id).first()
     if db_workout:
         db.delete(db_workout)
+        refresh_daily_totals(db, user_id=user_id, days=[db_workout.date])
         db.commit()
         return True
     return False
@@ -307,29 +584,185 @@ def get_weight_history_by_date_range(db: Session, user_id: int, start_date: date
         WeightEntry.date.between(start_date, end_date)
     ).order_by(WeightEntry.date).all()
 
+# --- Daily Totals (rollup dzienny) ---
+
+def refresh_daily_totals(db: Session, user_id: int = None, days=None) -> int:
+    """
+    Przelicza wiersze daily_totals z surowych wpisów (posiłki, woda, treningi) - dla wskazanych dni
+    użytkownika albo, gdy user_id/days to None, dla wszystkich. Najpierw robi flush, więc widzi
+    zmiany z bieżącej transakcji; commit należy do wywołującego. Zwraca liczbę dni z danymi.
+    """
+    if days is not None:
+        days = set(days)
+        if not days:
+            return 0
+    db.flush()
+
+    def scoped(query, model):
+        if user_id is not None:
+            query = query.filter(model.owner_id == user_id)
+        if days is not None:
+            query = query.filter(model.date.in_(days))
+        return query
+
+    totals = {}
+    def day_totals(owner_id, day):
+        return totals.setdefault((owner_id, day), {
+            "calories": 0.0, "protein": 0.0, "fat": 0.0, "carbs": 0.0, "water_ml": 0, "calories_burned": 0,
+            "meal_count": 0,
+        })
+
+    meal_rows = scoped(db.query(
+        Meal.owner_id, Meal.date,
+        func.sum(MealEntry.calories), func.sum(MealEntry.protein), func.sum(MealEntry.fat), func.sum(MealEntry.carbs),
+        func.count(func.distinct(Meal.id))
+    ).join(MealEntry, MealEntry.meal_id == Meal.id), Meal).group_by(Meal.owner_id, Meal.date)
+    for owner_id, day, calories, protein, fat, carbs, meal_count in meal_rows:
+        day_totals(owner_id, day).update(
+            calories=calories or 0.0, protein=protein or 0.0, fat=fat or 0.0, carbs=carbs or 0.0, meal_count=meal_count
+        )
+
+    water_rows = scoped(db.query(WaterEntry.owner_id, WaterEntry.date, func.sum(WaterEntry.amount)), WaterEntry)
+    for owner_id, day, amount in water_rows.group_by(WaterEntry.owner_id, WaterEntry.date):
+        day_totals(owner_id, day)["water_ml"] = amount or 0
+
+    workout_rows = scoped(db.query(Workout.owner_id, Workout.date, func.sum(Workout.calories_burned)), Workout)
+    for owner_id, day, burned in workout_rows.group_by(Workout.owner_id, Workout.date):
+        day_totals(owner_id, day)["calories_burned"] = burned or 0
+
+    count = len(totals)
+    # Istniejące wiersze aktualizujemy albo usuwamy (dzień bez wpisów), brakujące dodajemy
+    for row in scoped(db.query(DailyTotals), DailyTotals):
+        values = totals.pop((row.owner_id, row.date), None)
+        if values is None:
+            db.delete(row)
+        else:
+            for key, value in values.items():
+                setattr(row, key, value)
+    for (owner_id, day), values in totals.items():
+        db.add(DailyTotals(owner_id=owner_id, date=day, **values))
+    return count
+
+def get_daily_totals(db: Session, user_id: int, target_date: date):
+    """Pobiera sumy z jednego dnia (None, jeśli tego dnia nie ma żadnych wpisów)."""
+    return db.query(DailyTotals).filter(DailyTotals.owner_id == user_id, DailyTotals.date == target_date).first()
+
+def get_daily_totals_by_date_range(db: Session, user_id: int, start_date: date, end_date: date):
+    """Pobiera sumy dzienne z zadanego okresu (tylko dni z wpisami)."""
+    return db.query(DailyTotals).filter(
+        DailyTotals.owner_id == user_id,
+        DailyTotals.date.between(start_date, end_date)
+    ).order_by(DailyTotals.date).all()
+
 # --- Social Operations ---
 
-def search_users_by_email(db: Session, email_query: str, current_user_id: int, limit: int = 10):
-    """Wyszukuje użytkowników po emailu do celów społecznościowych."""
-    return db.query(User).filter(
-        User.email.ilike(f"%{email_query}%"),
-        User.id != current_user_id,
-        User.is_social_profile_active == True
-    ).limit(limit).all()
+# Indeks wyszukiwania użytkowników: tabela FTS5 z tokenizerem trigramowym (wyszukiwanie fragmentu e-maila
+# lub imienia bez pełnego skanu) utrzymywana triggerami oraz indeksy na lower(...) dla tanich zapytań prefiksowych.
+USER_SEARCH_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_search USING fts5("
+    "email, name, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_search(rowid, email, name) VALUES (new.id, new.email, new.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_search(users_search, rowid, email, name) VALUES ('delete', old.id, old.email, old.name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_search_au AFTER UPDATE OF email, name ON users BEGIN "
+    "INSERT INTO users_search(users_search, rowid, email, name) VALUES ('delete', old.id, old.email, old.name); "
+    "INSERT INTO users_search(rowid, email, name) VALUES (new.id, new.email, new.name); END",
+]
+
+def ensure_user_search_index(db: Session):
+    """Zakłada indeks wyszukiwania użytkowników (jeśli go brak) i wypełnia go istniejącymi kontami."""
+    exists = db.execute(text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users_search'")).first()
+    for statement in USER_SEARCH_DDL:
+        db.execute(text(statement))
+    if not exists:
+        db.execute(text("INSERT INTO users_search(users_search) VALUES ('rebuild')"))
+    db.commit()
+
+def _user_search_rank(row, query: str):
+    """Ranking wyniku: prefiks e-maila, potem początek imienia/nazwiska, potem dowolny fragment; krótsze wyżej."""
+    email = (row.email or "").lower()
+    name = (row.name or "").lower()
+    if email.startswith(query):
+        tier = 0
+    elif any(word.startswith(query) for word in name.split()) or name.startswith(query):
+        tier = 1
+    else:
+        tier = 2
+    position = email.find(query)
+    return (tier, position if position >= 0 else len(email), len(email), row.id)
+
+def search_user_ids(db: Session, query: str, current_user_id: int, candidates: int = None):
+    """
+    Id użytkowników pasujących do fragmentu e-maila lub imienia, od najlepiej dopasowanych.
+    Kandydatów zbieramy z indeksów (bez skanu tabeli): zakresem po search_email/search_name dla prefiksów
+    i z FTS5 (trigramy) dla dowolnego fragmentu - bez kosztownego bm25, szeregowanie robimy na małym zbiorze.
+    """
+    query = query.strip().lower()
+    candidates = candidates or settings.USER_SEARCH_CANDIDATES
+    visible = (User.id != current_user_id, User.is_social_profile_active == True)
+
+    rows = {}
+    for column in (User.search_email, User.search_name):
+        prefix_rows = db.query(User.id, User.email, User.name).filter(
+            column >= query, column < query + "\uffff", *visible
+        ).order_by(column).limit(candidates).all()
+        rows.update((row.id, row) for row in prefix_rows)
+
+    if len(query) >= 3:
+        # Fraza w cudzysłowie: trigramy wyszukują dowolny fragment, a znaki specjalne FTS5 tracą znaczenie
+        phrase = '"' + query.replace('"', '""') + '"'
+        fragment_rows = db.execute(
+            text(
+                "SELECT users.id, users.email, users.name FROM users_search "
+                "JOIN users ON users.id = users_search.rowid "
+                "WHERE users_search MATCH :phrase AND users.id != :current_user_id "
+                "AND users.is_social_profile_active = 1 LIMIT :candidates"
+            ),
+            {"phrase": phrase, "current_user_id": current_user_id, "candidates": candidates},
+        ).all()
+        rows.update((row.id, row) for row in fragment_rows)
+
+    ranked = sorted(rows.values(), key=lambda row: _user_search_rank(row, query))
+    return [row.id for row in ranked[:candidates]]
+
+def search_users_with_friendship(db: Session, query: str, current_user_id: int, limit: int = 10, offset: int = 0):
+    """
+    Wyszukuje użytkowników po fragmencie e-maila lub imienia (indeks users_search) do celów społecznościowych.
+    Zwraca krotki (użytkownik, status relacji z current_user lub None) - status dołączamy jednym zapytaniem (LEFT JOIN).
+    """
+    page_ids = search_user_ids(db, query, current_user_id)[offset:offset + limit]
+    if not page_ids:
+        return []
+    # Złączenie po uporządkowanej parze trafia w unikalny indeks ux_friendships_pair
+    rows = db.query(User, Friendship.status).outerjoin(
+        Friendship,
+        (Friendship.user_low_id == func.min(User.id, current_user_id))
+        & (Friendship.user_high_id == func.max(User.id, current_user_id))
+    ).filter(User.id.in_(page_ids)).all()
+    position = {user_id: index for index, user_id in enumerate(page_ids)}
+    return sorted(rows, key=lambda row: position[row[0].id])
 
 def get_friendship(db: Session, user_id: int, friend_id: int):
-    """Pobiera relację przyjaźni między dwoma użytkownikami."""
+    """Pobiera relację przyjaźni między dwoma użytkownikami (w dowolnym kierunku) - jedno wyszukanie w indeksie pary."""
     return db.query(Friendship).filter(
-        or_((Friendship.user_id == user_id) & (Friendship.friend_id == friend_id),
-            (Friendship.user_id == friend_id) & (Friendship.friend_id == user_id))
+        Friendship.user_low_id == min(user_id, friend_id),
+        Friendship.user_high_id == max(user_id, friend_id)
     ).first()
 
 def send_friend_request(db: Session, user_id: int, friend_id: int):
-    """Wysyła zaproszenie do znajomych."""
+    """Wysyła zaproszenie do znajomych. Zwraca None, jeśli relacja tej pary już istnieje (np. równoległe zaproszenia)."""
     # FriendshipStatus musi być zaimportowany, zakładam, że jest w schemas
-    db_friendship = Friendship(user_id=user_id, friend_id=friend_id, status=FriendshipStatus.PENDING)
+    db_friendship = Friendship(
+        user_id=user_id, friend_id=friend_id, status=FriendshipStatus.PENDING,
+        user_low_id=min(user_id, friend_id), user_high_id=max(user_id, friend_id)
+    )
     db.add(db_friendship)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return None
     db.refresh(db_friendship)
     return db_friendship
 
@@ -338,9 +771,9 @@ def get_friendship_by_id(db: Session, friendship_id: int):
     return db.query(Friendship).filter(Friendship.id == friendship_id).first()
 
 def get_friend_requests(db: Session, user_id: int):
-    """Pobiera zaproszenia do znajomych oczekujące na akceptację."""
+    """Pobiera zaproszenia do znajomych oczekujące na akceptację (razem z nadawcami)."""
     # FriendshipStatus musi być zaimportowany, zakładam, że jest w schemas
-    return db.query(Friendship).filter(
+    return db.query(Friendship).options(joinedload(Friendship.user)).filter(
         Friendship.friend_id == user_id,
         Friendship.status == FriendshipStatus.PENDING
     ).all()
@@ -352,16 +785,26 @@ def update_friendship_status(db: Session, db_friendship: Friendship, status: Fri
     db.refresh(db_friendship)
     return db_friendship
 
-def get_friends_list(db: Session, user_id: int):
-    """Pobiera listę znajomych użytkownika."""
-    # FriendshipStatus musi być zaimportowany, zakładam, że jest w schemas
-    accepted_friendships = db.query(Friendship).filter(
+def get_friend_ids(db: Session, user_id: int) -> frozenset:
+    """Zbiór id znajomych użytkownika (z pamięci podręcznej workera, unieważnianej przy każdej zmianie relacji)."""
+    cached = friend_cache.get(user_id)
+    if cached is not None:
+        return cached
+    # Znajomy to "druga strona" relacji - zależnie od tego, kto wysłał zaproszenie.
+    # Oba warunki OR trafiają w indeksy (user_id, status) i (friend_id, status).
+    other_side = case((Friendship.user_id == user_id, Friendship.friend_id), else_=Friendship.user_id)
+    rows = db.query(other_side).filter(
         or_(Friendship.user_id == user_id, Friendship.friend_id == user_id),
         Friendship.status == FriendshipStatus.ACCEPTED
     ).all()
-    friend_ids = {f.user_id if f.user_id != user_id else f.friend_id for f in accepted_friendships}
-    if not friend_ids: return []
-    return db.query(User).filter(User.id.in_(friend_ids)).all()
+    return friend_cache.put(user_id, (friend_id for (friend_id,) in rows))
+
+def get_friends_list(db: Session, user_id: int):
+    """Pobiera listę znajomych użytkownika (id z pamięci podręcznej, dane jednym zapytaniem IN)."""
+    friend_ids = get_friend_ids(db, user_id)
+    if not friend_ids:
+        return []
+    return db.query(User).filter(User.id.in_(friend_ids)).order_by(User.id).all()
 
 def delete_friendship(db: Session, db_friendship: Friendship):
     """Usuwa relację przyjaźni."""
@@ -396,15 +839,21 @@ def get_user_challenges(db: Session, user_id: int):
     """Pobiera wszystkie wyzwania użytkownika."""
     return db.query(UserChallenge).filter_by(user_id=user_id).order_by(UserChallenge.start_date.desc()).all()
 
-def get_recently_completed_challenges_for_user(db: Session, user_id: int):
-    """Pobiera niedawno ukończone wyzwania użytkownika."""
+def get_recently_completed_challenges_for_users(db: Session, user_ids) -> dict:
+    """Pobiera niedawno ukończone wyzwania wielu użytkowników jednym zapytaniem (IN), pogrupowane po user_id."""
+    by_user = {user_id: [] for user_id in user_ids}
+    if not by_user:
+        return by_user
     one_week_ago = date.today() - timedelta(days=7)
     # ChallengeStatus musi być zaimportowany, zakładam, że jest w schemas
-    return db.query(UserChallenge).filter(
-        UserChallenge.user_id == user_id,
+    completed = db.query(UserChallenge).filter(
+        UserChallenge.user_id.in_(by_user),
         UserChallenge.status == ChallengeStatus.COMPLETED,
         UserChallenge.end_date >= one_week_ago
-    ).all()
+    ).order_by(UserChallenge.user_id, UserChallenge.id).all()
+    for user_challenge in completed:
+        by_user[user_challenge.user_id].append(user_challenge)
+    return by_user
 
 def get_active_challenges_to_verify(db: Session):
     """Pobiera aktywne wyzwania, których termin minął, do weryfikacji."""
@@ -1,3 +1,5 @@
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
@@ -5,6 +7,11 @@ from fastapi.responses import FileResponse
 import os
 
 from app.core.config import settings
+from app.core.database import SessionLocal, engine, Base
+from app.crud import crud_base as crud
+from app.core.security import shutdown_hash_executor
+from app.services.food_lexicon import food_lexicon
+from app.services.challenge_verification import run_verification_schedule
 # IMPORTUJEMY WSZYSTKIE ROUTERY
 from app.api.v1.endpoints import (
     users, auth_actions, auth_google, 
@@ -32,6 +39,40 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.on_event("startup")
+def load_food_lexicon():
+    """
+    Tworzy brakujące tabele (i indeks wyszukiwania użytkowników), czyści wygasłe odpowiedzi AI i klucze idempotencji,
+    buduje leksykon żywności w pamięci (raz na worker).
+    """
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    try:
+        crud.ensure_user_search_index(db)
+        crud.delete_expired_ai_cache_entries(db)
+        crud.delete_expired_idempotency_keys(db)
+        food_lexicon.load(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+async def start_challenge_verification():
+    """Cykliczna weryfikacja zakończonych wyzwań w tle (0 w CHALLENGE_VERIFY_INTERVAL_SECONDS wyłącza)."""
+    if settings.CHALLENGE_VERIFY_INTERVAL_SECONDS > 0:
+        app.state.challenge_verification = asyncio.create_task(
+            run_verification_schedule(settings.CHALLENGE_VERIFY_INTERVAL_SECONDS)
+        )
+
+@app.on_event("shutdown")
+def stop_password_hashing_pool():
+    shutdown_hash_executor()
+
+@app.on_event("shutdown")
+async def stop_challenge_verification():
+    task = getattr(app.state, "challenge_verification", None)
+    if task:
+        task.cancel()
+
 # --- REJESTRACJA WSZYSTKICH ROUTERÓW ---
 app.include_router(users.router, prefix="/api/users", tags=["users"])
 app.include_router(auth_actions.router, prefix="/api/auth", tags=["auth"])
@@ -1,7 +1,7 @@
 from sqlalchemy import (
-    Column, Integer, String, Float, Date, Time, ForeignKey, JSON, Boolean, Text, DateTime, desc
+    Column, Integer, String, Float, Date, Time, ForeignKey, JSON, Boolean, Text, DateTime, Index, desc, event, select
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.types import Enum as SQLAlchemyEnum
 from datetime import date as date_type, datetime
 from typing import Optional
@@ -48,6 +48,14 @@ class Dish(Base):
     category = Column(String, nullable=True)
     # Przechowuje popularne, potoczne nazwy i błędy w pisowni
     aliases = Column(JSON, default=[])
+
+    # Zmaterializowane podsumowanie przepisu (przeliczane przy zmianie składników lub ich wartości odżywczych)
+    total_weight_g = Column(Float, nullable=True)
+    state = Column(SQLAlchemyEnum(ProductState), nullable=True)
+    calories_per_100g = Column(Float, nullable=True)
+    protein_per_100g = Column(Float, nullable=True)
+    fat_per_100g = Column(Float, nullable=True)
+    carbs_per_100g = Column(Float, nullable=True)
     
     # Relacja do tabeli z "przepisami"
     ingredients = relationship("DishIngredient", back_populates="dish", cascade="all, delete-orphan")
@@ -63,6 +71,31 @@ class DishIngredient(Base):
     dish = relationship("Dish", back_populates="ingredients")
     product = relationship("Product")
 
+class FoodLexiconVersion(Base):
+    """Licznik wersji bazy żywności - pozwala workerom wykryć, że ich leksykon w pamięci jest nieaktualny."""
+    __tablename__ = "food_lexicon_version"
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+class AIResponseCache(Base):
+    """Trwała pamięć podręczna odpowiedzi modelu AI (klucz: skrót nazwy modelu, promptu i obrazu)."""
+    __tablename__ = "ai_response_cache"
+    key = Column(String(64), primary_key=True)
+    call_site = Column(String, nullable=False)
+    response = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+class IdempotencyKey(Base):
+    """Klucze idempotencji zapisów wsadowych: ponowienie żądania z tym samym kluczem zwraca zapisany wynik."""
+    __tablename__ = "idempotency_keys"
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String(100), primary_key=True)
+    # Skrót treści żądania - ten sam klucz z inną treścią to błąd klienta
+    request_hash = Column(String(64), nullable=False)
+    response = Column(JSON, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
+
 
 # --- NOWE MODELE DLA WIELOWĄTKOWEGO CZATU ---
 
@@ -74,10 +107,16 @@ class Conversation(Base):
     title = Column(String, default="Nowy czat")
     created_at = Column(DateTime, default=datetime.utcnow)
     is_pinned = Column(Boolean, default=False)
+    # Narastające podsumowanie starszej części rozmowy (do kontekstu AI) i id ostatniej wiadomości, którą obejmuje
+    context_summary = Column(Text, nullable=True)
+    summarized_until_id = Column(Integer, nullable=True)
     
     user = relationship("User", back_populates="conversations")
     messages = relationship("ChatMessage", back_populates="conversation", cascade="all, delete-orphan", order_by="ChatMessage.created_at")
 
+    # Lista rozmów (przypięte, potem najnowsze) stronicowana po kluczu
+    __table_args__ = (Index("ix_conversations_user_id_pinned_created_at", "user_id", "is_pinned", "created_at", "id"),)
+
 class ChatMessage(Base):
     """Tabela przechowująca pojedyncze wiadomości w ramach konwersacji."""
     __tablename__ = "chat_messages"
@@ -89,6 +128,12 @@ class ChatMessage(Base):
     
     conversation = relationship("Conversation", back_populates="messages")
 
+    # Ostatnie N wiadomości wątku (kontekst czatu) i kolejne strony historii bez skanowania całej tabeli
+    __table_args__ = (
+        Index("ix_chat_messages_conversation_id_id", "conversation_id", "id"),
+        Index("ix_chat_messages_conversation_id_created_at", "conversation_id", "created_at", "id"),
+    )
+
 
 # --- ZAKTUALIZOWANY MODEL UŻYTKOWNIKA ---
 
@@ -98,6 +143,10 @@ class User(Base):
     email = Column(String, unique=True, index=True, nullable=False)
     hashed_password = Column(String, nullable=True) 
     name = Column(String, default="Użytkownik")
+    # E-mail i imię małymi literami wg Unicode (lower() w SQLite zmienia tylko ASCII: "Łukasz" zostaje "Łukasz") -
+    # do wyszukiwania po prefiksie; ustawiane przy każdym zapisie (_set_user_search_columns)
+    search_email = Column(String, nullable=True, index=True)
+    search_name = Column(String, nullable=True, index=True)
     is_verified = Column(Boolean, default=False) # Pole do weryfikacji e-mail
     password_reset_token = Column(String, nullable=True, index=True) # Dodane pole: token resetowania hasła
     password_reset_expires = Column(DateTime, nullable=True) # Dodane pole: data wygaśnięcia tokenu
@@ -139,12 +188,23 @@ class User(Base):
     workouts = relationship("Workout", back_populates="owner", cascade="all, delete-orphan")
     user_challenges = relationship("UserChallenge", back_populates="user", cascade="all, delete-orphan")
     conversations = relationship("Conversation", back_populates="user", cascade="all, delete-orphan") # Nowa relacja do rozmów
+    daily_totals = relationship("DailyTotals", cascade="all, delete-orphan")
+    idempotency_keys = relationship("IdempotencyKey", cascade="all, delete-orphan")
 
     @property
     def weight(self) -> Optional[float]:
-        if self.weights:
-            return self.weights[0].weight
-        return None
+        # Jeśli historia wag jest już wczytana (np. po dodaniu wpisu w tej sesji) - bierzemy z niej,
+        # w przeciwnym razie z latest_weight, wczytywanego tym samym zapytaniem co użytkownik
+        if "weights" in self.__dict__:
+            return self.weights[0].weight if self.weights else None
+        return self.latest_weight
+
+@event.listens_for(User, "before_insert")
+@event.listens_for(User, "before_update")
+def _set_user_search_columns(mapper, connection, target: User) -> None:
+    name = target.name if target.name is not None else User.__table__.c.name.default.arg
+    target.search_email = target.email.lower() if target.email else None
+    target.search_name = name.lower() if name else None
 
 # --- ISTNIEJĄCE MODELE (z drobnymi poprawkami) ---
 
@@ -165,9 +225,13 @@ class UserChallenge(Base):
     start_date = Column(Date, nullable=False, default=date_type.today)
     end_date = Column(Date, nullable=False)
     status = Column(SQLAlchemyEnum(ChallengeStatus), nullable=False, default=ChallengeStatus.ACTIVE)
+    # Kiedy worker weryfikacji przejął wiersz (dzierżawa); po werdykcie wraca do NULL
+    verification_claimed_at = Column(DateTime, nullable=True)
     
     user = relationship("User", back_populates="user_challenges")
 
+    __table_args__ = (Index("ix_user_challenges_status_end_date", "status", "end_date"),)
+
 class WeightEntry(Base):
     __tablename__ = "weight_entries"
     id = Column(Integer, primary_key=True, index=True)
@@ -176,6 +240,19 @@ class WeightEntry(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="weights")
 
+    # Odczyty "dzień/okres danego użytkownika" (tu i w posiłkach, wodzie, treningach) - indeks złożony zamiast skanu tabeli
+    __table_args__ = (Index("ix_weight_entries_owner_id_date", "owner_id", "date"),)
+
+# Najnowsza waga jako podzapytanie skorelowane - User.weight nie musi wczytywać całej historii wag
+User.latest_weight = column_property(
+    select(WeightEntry.weight)
+    .where(WeightEntry.owner_id == User.id)
+    .order_by(desc(WeightEntry.date), desc(WeightEntry.id))
+    .limit(1)
+    .correlate_except(WeightEntry)
+    .scalar_subquery()
+)
+
 class Friendship(Base):
     __tablename__ = "friendships"
     id = Column(Integer, primary_key=True, index=True)
@@ -183,10 +260,19 @@ class Friendship(Base):
     friend_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     status = Column(SQLAlchemyEnum(FriendshipStatus), nullable=False, default=FriendshipStatus.PENDING)
     created_at = Column(DateTime, default=datetime.utcnow)
+    # Uporządkowana para (mniejsze id, większe id): jedna relacja na parę, niezależnie od tego, kto zaprosił
+    user_low_id = Column(Integer, nullable=False)
+    user_high_id = Column(Integer, nullable=False)
 
     user = relationship("User", foreign_keys=[user_id])
     friend = relationship("User", foreign_keys=[friend_id])
 
+    __table_args__ = (
+        Index("ux_friendships_pair", "user_low_id", "user_high_id", unique=True),
+        Index("ix_friendships_user_id_status", "user_id", "status"),
+        Index("ix_friendships_friend_id_status", "friend_id", "status"),
+    )
+
 class Meal(Base):
     __tablename__ = "meals"
     id = Column(Integer, primary_key=True, index=True)
@@ -200,6 +286,8 @@ class Meal(Base):
     
     entries = relationship("MealEntry", back_populates="meal", cascade="all, delete-orphan")
 
+    __table_args__ = (Index("ix_meals_owner_id_date", "owner_id", "date"),)
+
 class MealEntry(Base):
     __tablename__ = "meal_entries"
     id = Column(Integer, primary_key=True, index=True)
@@ -220,7 +308,7 @@ class MealEntry(Base):
     deconstruction_details = Column(JSON, nullable=True)
     is_default_quantity = Column(Boolean, nullable=False, default=False) 
     
-    meal_id = Column(Integer, ForeignKey("meals.id"))
+    meal_id = Column(Integer, ForeignKey("meals.id"), index=True)
     meal = relationship("Meal", back_populates="entries") 
 
 class WaterEntry(Base):
@@ -232,6 +320,8 @@ class WaterEntry(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="water_entries")
 
+    __table_args__ = (Index("ix_water_entries_owner_id_date", "owner_id", "date"),)
+
 class Workout(Base):
     __tablename__ = "workouts"
     id = Column(Integer, primary_key=True, index=True)
@@ -241,6 +331,25 @@ class Workout(Base):
     owner_id = Column(Integer, ForeignKey("users.id"))
     owner = relationship("User", back_populates="workouts")
 
+    __table_args__ = (Index("ix_workouts_owner_id_date", "owner_id", "date"),)
+
+class DailyTotals(Base):
+    """
+    Zmaterializowane sumy dnia użytkownika (jedzenie, woda, treningi), przeliczane przez
+    crud.refresh_daily_totals przy każdej zmianie wpisów. Dni bez żadnych wpisów nie mają wiersza.
+    """
+    __tablename__ = "daily_totals"
+    owner_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    date = Column(Date, primary_key=True)
+    calories = Column(Float, nullable=False, default=0.0)
+    protein = Column(Float, nullable=False, default=0.0)
+    fat = Column(Float, nullable=False, default=0.0)
+    carbs = Column(Float, nullable=False, default=0.0)
+    water_ml = Column(Integer, nullable=False, default=0)
+    calories_burned = Column(Integer, nullable=False, default=0)
+    # Liczba posiłków z wpisami - dzień z samą wodą lub treningiem nie jest dniem z zapisanym jedzeniem
+    meal_count = Column(Integer, nullable=False, default=0, server_default="0")
+
 class CachedDish(Base):
     __tablename__ = "cached_dishes"
     query = Column(String, primary_key=True, index=True)
@@ -30,6 +30,7 @@ class ProductBase(BaseModel):
     aliases: Optional[List[str]] = []
     nutrients: Dict[str, float] 
     state: ProductState
+    average_weight_g: Optional[float] = None
 
 class ProductCreate(ProductBase):
     pass
@@ -90,6 +91,12 @@ class ConversationInfo(BaseModel):
 
 class Conversation(ConversationInfo):
     messages: List[ChatMessage] = []
+    # Kursor do starszych wiadomości (GET .../messages?before=...), None - to już cała historia
+    next_cursor: Optional[str] = None
+
+class ChatMessagePage(BaseModel):
+    messages: List[ChatMessage]
+    next_cursor: Optional[str] = None
 
 # --- ZAKTUALIZOWANE SCHEMATY UŻYTKOWNIKA ---
 
@@ -224,6 +231,26 @@ class Meal(MealBase):
 class MealResponse(Meal):
     pass
 
+# Zapis wsadowy: nowe posiłki z wpisami oraz wpisy do istniejących posiłków, w jednej transakcji
+class MealWithEntriesCreate(MealCreate):
+    entries: List[MealEntryCreate] = []
+
+class MealEntryBatchCreate(MealEntryCreate):
+    meal_id: int
+
+class MealBatchCreate(BaseModel):
+    meals: List[MealWithEntriesCreate] = Field(default=[], max_length=20)
+    entries: List[MealEntryBatchCreate] = Field(default=[], max_length=200)
+
+class MealBatchCreatedMeal(BaseModel):
+    id: int
+    entry_ids: List[int]
+
+class MealBatchResult(BaseModel):
+    meals: List[MealBatchCreatedMeal]
+    # Id wpisów dodanych do istniejących posiłków (w kolejności z żądania)
+    entry_ids: List[int]
+
 class Challenge(BaseModel):
     id: int
     title: str
@@ -279,6 +306,21 @@ class AnalysisResponse(BaseModel):
     aggregated_meal: Dict[str, Any]
     deconstruction_details: List[Dict[str, Any]]
 
+class MealItemsAnalysisRequest(BaseModel):
+    text: str = Field(..., min_length=1, description='Kilka pozycji w jednym zdaniu, np. "2 jajka, kromka chleba i kawa z mlekiem"')
+
+class MealItemAnalysis(BaseModel):
+    text: str
+    name: str
+    quantity: float
+    unit: str
+    result: Optional[AnalysisResponse] = None
+    error: Optional[str] = None
+
+class MealItemsAnalysisResponse(BaseModel):
+    items: List[MealItemAnalysis]
+    aggregated_meal: Dict[str, Any]
+
 # --- POZOSTAŁE SCHEMATY ---
 
 class UserPublic(BaseModel):
@@ -363,6 +405,29 @@ class WeeklyAnalysisResponse(BaseModel):
     analysis_start_date: date
     analysis_end_date: date
 
+class WeightTrend(BaseModel):
+    values: List[Optional[float]]
+    # Wygładzona waga (średnia wykładnicza) i tempo zmian z dopasowania liniowego
+    ewma: List[Optional[float]]
+    slope_kg_per_week: Optional[float] = None
+
+class TrendsResponse(BaseModel):
+    start_date: date
+    end_date: date
+    # Ile dni składa się na jeden punkt wykresu (dłuższe okresy są uśredniane)
+    bucket_days: int
+    labels: List[date]
+    calories: List[Optional[float]]
+    protein: List[Optional[float]]
+    fat: List[Optional[float]]
+    carbs: List[Optional[float]]
+    calories_burned: List[Optional[float]]
+    calories_rolling_avg: List[Optional[float]]
+    calorie_deficit: List[Optional[float]]
+    weight: WeightTrend
+    logged_days: int
+    avg_calorie_deficit: Optional[float] = None
+
 class AnalysisDataResponse(BaseModel):
     avg_macros: Dict[str, float]
     total_workouts: int
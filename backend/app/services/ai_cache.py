@@ -0,0 +1,109 @@
+"""
+Pamięć podręczna odpowiedzi modelu AI.
+
+Identyczny prompt (po ujednoliceniu białych znaków) wysłany do tego samego modelu daje ten sam klucz,
+więc np. "30 min bieganie" dla osoby ważącej 70 kg kosztuje jedno zapytanie do AI, a nie jedno na wpis.
+Dwa poziomy: LRU w pamięci procesu oraz tabela 'ai_response_cache' w bazie, współdzielona przez workery.
+Czas ważności (TTL) ustala każde miejsce wywołania osobno.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.crud import crud_base as crud
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Ujednolica prompt: wcięcia i podziały linii z f-stringów nie powinny zmieniać klucza."""
+    return " ".join(prompt.split())
+
+
+def cache_key(model_name: str, prompt: str, image: Optional[Image.Image] = None) -> str:
+    """Skrót SHA-256 z nazwy modelu, znormalizowanego promptu i (opcjonalnie) zawartości obrazu."""
+    digest = hashlib.sha256()
+    digest.update(model_name.encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(normalize_prompt(prompt).encode("utf-8"))
+    if image is not None:
+        digest.update(b"\0")
+        digest.update(f"{image.mode}:{image.size}".encode("utf-8"))
+        digest.update(hashlib.sha256(image.tobytes()).digest())
+    return digest.hexdigest()
+
+
+class AIResponseCache:
+    """Dwupoziomowa (pamięć + baza) pamięć podręczna odpowiedzi AI z licznikami trafień."""
+
+    def __init__(self, max_memory_entries: int):
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._max_memory_entries = max_memory_entries
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """Zwraca zapisaną odpowiedź lub None (wygasłe wpisy traktujemy jak brak)."""
+        with self._lock:
+            cached = self._memory.get(key)
+            if cached and cached[1] > time.time():
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return cached[0]
+            if cached:
+                del self._memory[key]
+
+        try:
+            with SessionLocal() as db:
+                row = crud.get_ai_cache_entry(db, key)
+                found = (row.response, row.expires_at) if row else None
+        except Exception as e:
+            # Pamięć podręczna nie może zablokować analizy - w razie problemu z bazą po prostu pytamy AI
+            print(f"BŁĄD: Odczyt pamięci podręcznej AI nie powiódł się: {e}")
+            found = None
+
+        if not found:
+            self.misses += 1
+            return None
+        response, expires_at = found
+        remaining = (expires_at - datetime.utcnow()).total_seconds()
+        self._remember(key, response, time.time() + remaining)
+        self.db_hits += 1
+        return response
+
+    def put(self, key: str, call_site: str, response: str, ttl_seconds: int) -> None:
+        """Zapisuje odpowiedź w obu poziomach na ttl_seconds."""
+        self._remember(key, response, time.time() + ttl_seconds)
+        try:
+            with SessionLocal() as db:
+                crud.save_ai_cache_entry(
+                    db, key=key, call_site=call_site, response=response,
+                    expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds)
+                )
+        except Exception as e:
+            print(f"BŁĄD: Zapis pamięci podręcznej AI nie powiódł się: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "memory_entries": len(self._memory),
+        }
+
+    def _remember(self, key: str, response: str, expires_at: float) -> None:
+        with self._lock:
+            self._memory[key] = (response, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self._max_memory_entries:
+                self._memory.popitem(last=False)
+
+
+ai_response_cache = AIResponseCache(settings.AI_CACHE_MAX_MEMORY_ENTRIES)
@@ -0,0 +1,147 @@
+"""
+Reguły wyzwań sprawdzalne na danych z bazy (bez AI).
+
+Wyzwanie w challenges_service może mieć klucz "rule": listę warunków na dziennych sumach posiłków
+(makroskładniki, opcjonalnie tylko z danej kategorii posiłku), wody lub treningów. Sumy dla całej partii
+wyzwań liczy SQL (GROUP BY użytkownik, dzień - jedno zapytanie na rodzaj sumy), a warunki sprawdzamy w Pythonie.
+
+Reguła rozstrzygająca (decisive=True) sama wydaje werdykt. Pozostałe to warunki konieczne: ich niespełnienie
+kończy wyzwanie porażką od razu, a spełnienie oddaje ocenę AI (np. "3 treningi siłowe" - liczbę treningów
+sprawdzamy sami, ich rodzaj ocenia model).
+"""
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.crud import crud_async
+from app.models.enums import MealCategory
+
+# Źródło danych -> kolumny, które można sumować (oprócz "count", czyli liczby posiłków/wpisów)
+SOURCE_METRICS = {
+    "meals": {"calories", "protein", "fat", "carbs"},
+    "water": {"amount"},
+    "workouts": {"calories_burned"},
+}
+# Cele z profilu użytkownika, do których może odwoływać się próg (np. maximum="calorie_goal")
+USER_GOALS = {"calorie_goal", "protein_goal", "fat_goal", "carb_goal", "water_goal"}
+
+Threshold = Union[float, str, None]
+
+
+@dataclass(frozen=True)
+class Condition:
+    """
+    Warunek na sumie `metric` ze źródła `source`: w każdym z dni (per_day) albo w całym okresie.
+    Próg to liczba albo nazwa celu użytkownika. min_days - ile dni musi spełnić warunek
+    (domyślnie tyle, ile trwa wyzwanie).
+    """
+    source: str
+    metric: str
+    minimum: Threshold = None
+    maximum: Threshold = None
+    meal_category: Optional[MealCategory] = None
+    per_day: bool = True
+    min_days: Optional[int] = None
+
+    def __post_init__(self):
+        if self.source not in SOURCE_METRICS:
+            raise ValueError(f"Nieznane źródło danych reguły: {self.source}")
+        if self.metric != "count" and self.metric not in SOURCE_METRICS[self.source]:
+            raise ValueError(f"Nieznana miara '{self.metric}' dla źródła {self.source}")
+        if self.meal_category and self.source != "meals":
+            raise ValueError("Kategorię posiłku można podać tylko dla źródła 'meals'")
+        for threshold in (self.minimum, self.maximum):
+            if isinstance(threshold, str) and threshold not in USER_GOALS:
+                raise ValueError(f"Nieznany cel użytkownika w progu reguły: {threshold}")
+
+    @property
+    def series(self) -> Tuple[str, str, Optional[MealCategory]]:
+        """Klucz dziennej sumy, której potrzebuje warunek (wspólny dla warunków liczonych tak samo)."""
+        return self.source, self.metric, self.meal_category
+
+    def goals(self) -> List[str]:
+        return [t for t in (self.minimum, self.maximum) if isinstance(t, str)]
+
+
+@dataclass(frozen=True)
+class Rule:
+    conditions: Tuple[Condition, ...]
+    decisive: bool = True
+
+
+def _days(start_date: date, end_date: date) -> List[date]:
+    return [start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1)]
+
+
+def _resolve(threshold: Threshold, goals: dict) -> Optional[float]:
+    return goals.get(threshold) if isinstance(threshold, str) else threshold
+
+
+def condition_holds(condition: Condition, daily: Dict[date, float], days: List[date], duration_days: int, goals: dict) -> bool:
+    """
+    Sprawdza warunek dla jednego wyzwania; dni bez wpisów mają sumę 0. Próg z celu, którego użytkownik
+    nie ustawił, nie jest spełniony (brak celu to nie brak ograniczenia).
+    """
+    if any(goals.get(goal) is None for goal in condition.goals()):
+        return False
+    minimum = _resolve(condition.minimum, goals)
+    maximum = _resolve(condition.maximum, goals)
+
+    def within(value: float) -> bool:
+        return (minimum is None or value >= minimum) and (maximum is None or value <= maximum)
+
+    if not condition.per_day:
+        return within(sum(daily.get(day, 0) for day in days))
+    good_days = sum(1 for day in days if within(daily.get(day, 0)))
+    return good_days >= (condition.min_days or duration_days)
+
+
+async def evaluate_rules(db, claimed, challenges: dict) -> Dict[int, bool]:
+    """
+    Werdykty lokalne dla partii wyzwań (krotki z crud_async.claim_challenges_to_verify): id wyzwania
+    użytkownika -> ukończone?. Wyzwań bez reguły i tych, które musi jeszcze ocenić AI, nie ma w wyniku.
+    """
+    ruled = [row for row in claimed if challenges.get(row.challenge_id) and challenges[row.challenge_id].get("rule")]
+    if not ruled:
+        return {}
+
+    # Jedno zapytanie na rodzaj dziennej sumy, dla wszystkich użytkowników i łącznego okresu
+    rows_by_series = {}
+    goal_names = set()
+    for row in ruled:
+        for condition in challenges[row.challenge_id]["rule"].conditions:
+            rows_by_series.setdefault(condition.series, []).append(row)
+            goal_names.update(condition.goals())
+
+    sums = {}
+    for (source, metric, meal_category), rows in rows_by_series.items():
+        fetched = await crud_async.get_daily_sums_for_users(
+            db, source=source, metric=metric, meal_category=meal_category,
+            user_ids={row.user_id for row in rows},
+            start_date=min(row.start_date for row in rows),
+            end_date=max(row.end_date for row in rows),
+        )
+        per_user = {}
+        for user_id, day, value in fetched:
+            per_user.setdefault(user_id, {})[day] = value or 0
+        sums[(source, metric, meal_category)] = per_user
+
+    goals = {}
+    if goal_names:
+        goals = await crud_async.get_user_goals(db, user_ids={row.user_id for row in ruled}, goals=goal_names)
+
+    verdicts = {}
+    for row in ruled:
+        challenge = challenges[row.challenge_id]
+        rule = challenge["rule"]
+        days = _days(row.start_date, row.end_date)
+        holds = all(
+            condition_holds(
+                condition, sums[condition.series].get(row.user_id, {}), days,
+                challenge["duration_days"], goals.get(row.user_id, {})
+            )
+            for condition in rule.conditions
+        )
+        if rule.decisive or not holds:
+            verdicts[row.id] = holds
+    return verdicts
@@ -0,0 +1,193 @@
+"""
+Weryfikacja zakończonych wyzwań (zadanie okresowe w każdym workerze + ręczny wyzwalacz).
+
+Przebieg dzieli pracę na partie: worker przejmuje (dzierżawi w bazie) do CHALLENGE_VERIFY_BATCH_SIZE
+wygasłych wyzwań, pobiera logi wszystkich użytkowników partii jednym zapytaniem na kategorię
+(posiłki, treningi), a werdykty AI zbiera równolegle - najwyżej CHALLENGE_VERIFY_CONCURRENCY naraz.
+Wyzwania z regułą (challenge_rules) rozstrzygamy najpierw lokalnie; do AI trafiają tylko te,
+których reguła nie przesądza.
+Każdy werdykt jest zapisywany i zatwierdzany od razu (punkt kontrolny): po awarii gotowe wiersze nie są
+już aktywne, a niedokończone wracają do puli po wygaśnięciu dzierżawy. Wiersze pominięte lub z błędem
+przebieg zwalnia sam na końcu (nie w trakcie - inaczej przejąłby je ponownie w tej samej pętli).
+"""
+import asyncio
+import logging
+import time
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, List, Tuple
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.crud import crud_async
+from app.models.enums import ChallengeStatus
+from app.services import challenge_rules, challenges_service
+from app.services import legacy_analyzer as ai_analyzer
+
+# Kategoria wyzwania -> zapytanie zwracające (owner_id, data, nazwa) dla wielu użytkowników naraz
+LOG_QUERIES = {
+    "dieta": crud_async.get_meal_logs_for_users,
+    "aktywność": crud_async.get_workout_logs_for_users,
+}
+
+# Jeden przebieg naraz w workerze (harmonogram i ręczny wyzwalacz); między workerami dzielą pracę dzierżawy
+verification_lock = asyncio.Lock()
+
+# user_id -> (posortowane daty, nazwy wpisów z tych dni)
+UserLogs = Dict[int, Tuple[List[date], List[str]]]
+
+
+async def _prefetch_logs(db, claimed, challenges: dict) -> Dict[str, UserLogs]:
+    """Logi całej partii: jedno zapytanie na kategorię, dla wszystkich jej użytkowników i łącznego okresu."""
+    rows_by_category = {}
+    for row in claimed:
+        info = challenges.get(row.challenge_id)
+        if info and info["category"] in LOG_QUERIES:
+            rows_by_category.setdefault(info["category"], []).append(row)
+
+    logs = {}
+    for category, rows in rows_by_category.items():
+        fetched = await LOG_QUERIES[category](
+            db,
+            user_ids={row.user_id for row in rows},
+            start_date=min(row.start_date for row in rows),
+            end_date=max(row.end_date for row in rows),
+        )
+        grouped: UserLogs = {}
+        for user_id, day, name in fetched:
+            dates, names = grouped.setdefault(user_id, ([], []))
+            dates.append(day)
+            names.append(name)
+        logs[category] = grouped
+    return logs
+
+
+def _logs_between(user_logs: UserLogs, user_id: int, start_date: date, end_date: date) -> List[str]:
+    dates, names = user_logs.get(user_id, ([], []))
+    return names[bisect_left(dates, start_date):bisect_right(dates, end_date)]
+
+
+async def _verdict(slots: asyncio.Semaphore, row, info: dict, logs: List[str]):
+    """Werdykt AI dla jednego wyzwania: (wiersz, ukończone?/None przy błędzie, czas odpowiedzi w s)."""
+    async with slots:
+        started = time.perf_counter()
+        try:
+            is_completed = await ai_analyzer.verify_challenge_completion(
+                challenge_title=info["title"], challenge_description=info["description"],
+                user_logs=logs, category=info["category"]
+            )
+        except Exception as e:
+            logging.error(f"Error verifying challenge {row.id}: {e}", exc_info=True)
+            is_completed = None
+        return row, is_completed, time.perf_counter() - started
+
+
+async def _release_unfinished(db, unfinished: set) -> None:
+    """Zwalnia dzierżawy wierszy bez werdyktu; błąd tylko logujemy - wtedy dzierżawa po prostu wygaśnie."""
+    if not unfinished:
+        return
+    try:
+        await crud_async.release_challenge_claims(db, user_challenge_ids=unfinished)
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Error releasing {len(unfinished)} challenge claims: {e}", exc_info=True)
+
+
+async def _save_verdict(db, row, is_completed: bool, stats: dict) -> bool:
+    """Zapisuje werdykt (punkt kontrolny) i aktualizuje liczniki; błąd zapisu liczy się jako błąd wiersza."""
+    new_status = ChallengeStatus.COMPLETED if is_completed else ChallengeStatus.FAILED
+    try:
+        await crud_async.finish_challenge_verification(db, user_challenge_id=row.id, status=new_status)
+    except Exception as e:
+        await db.rollback()
+        logging.error(f"Error saving verdict for challenge {row.id}: {e}", exc_info=True)
+        stats["errors"] += 1
+        return False
+    stats["completed" if is_completed else "failed"] += 1
+    return True
+
+
+async def verify_ended_challenges() -> dict:
+    """Weryfikuje wszystkie wygasłe, aktywne wyzwania (partiami) i zwraca metryki przebiegu."""
+    stats = {"batches": 0, "claimed": 0, "rule_verdicts": 0, "ai_verdicts": 0,
+             "completed": 0, "failed": 0, "skipped": 0, "errors": 0}
+    ai_calls, ai_seconds = 0, 0.0
+    started = time.perf_counter()
+    slots = asyncio.Semaphore(settings.CHALLENGE_VERIFY_CONCURRENCY)
+
+    # Przejęte wiersze bez zapisanego werdyktu - zwalniane na końcu przebiegu
+    unfinished = set()
+
+    async with verification_lock, AsyncSessionLocal() as db:
+        try:
+            while True:
+                claimed = await crud_async.claim_challenges_to_verify(
+                    db, limit=settings.CHALLENGE_VERIFY_BATCH_SIZE, lease_minutes=settings.CHALLENGE_VERIFY_LEASE_MINUTES
+                )
+                if not claimed:
+                    break
+                stats["batches"] += 1
+                stats["claimed"] += len(claimed)
+                unfinished.update(row.id for row in claimed)
+                challenges = {row.challenge_id: challenges_service.get_challenge_by_id(row.challenge_id) for row in claimed}
+
+                local_verdicts = await challenge_rules.evaluate_rules(db, claimed, challenges)
+                for row in claimed:
+                    if row.id in local_verdicts and await _save_verdict(db, row, local_verdicts[row.id], stats):
+                        stats["rule_verdicts"] += 1
+                        unfinished.discard(row.id)
+                claimed = [row for row in claimed if row.id not in local_verdicts]
+                logs = await _prefetch_logs(db, claimed, challenges)
+
+                pending = []
+                for row in claimed:
+                    info = challenges[row.challenge_id]
+                    if not info:
+                        # Dzierżawę zwolnimy na końcu przebiegu (unfinished)
+                        logging.warning(f"Could not find info for challenge_id: {row.challenge_id}. Skipping.")
+                        stats["skipped"] += 1
+                        continue
+                    user_logs = _logs_between(logs.get(info["category"], {}), row.user_id, row.start_date, row.end_date)
+                    pending.append(asyncio.create_task(_verdict(slots, row, info, user_logs)))
+
+                try:
+                    for next_done in asyncio.as_completed(pending):
+                        row, is_completed, seconds = await next_done
+                        ai_calls += 1
+                        ai_seconds += seconds
+                        if is_completed is None:
+                            stats["errors"] += 1
+                        elif await _save_verdict(db, row, is_completed, stats):
+                            stats["ai_verdicts"] += 1
+                            unfinished.discard(row.id)
+                finally:
+                    # Przerwany przebieg (np. zamknięcie aplikacji) nie zostawia osieroconych zapytań do AI
+                    for task in pending:
+                        task.cancel()
+                logging.info(f"Challenge verification batch {stats['batches']} done, totals so far: {stats}")
+        finally:
+            await _release_unfinished(db, unfinished)
+
+    verdicts = stats["completed"] + stats["failed"]
+    stats["seconds"] = round(time.perf_counter() - started, 3)
+    stats["verdicts_per_second"] = round(verdicts / stats["seconds"], 2) if stats["seconds"] else 0.0
+    stats["avg_verdict_seconds"] = round(ai_seconds / ai_calls, 3) if ai_calls else 0.0
+    logging.info(
+        f"Challenge verification finished: {verdicts} verdicts ({stats['completed']} completed, {stats['failed']} failed; "
+        f"{stats['rule_verdicts']} by rules, {stats['ai_verdicts']} by AI), "
+        f"{stats['errors']} errors, {stats['skipped']} skipped, {stats['batches']} batches in {stats['seconds']}s "
+        f"({stats['verdicts_per_second']} verdicts/s, avg AI verdict {stats['avg_verdict_seconds']}s)"
+    )
+    return stats
+
+
+async def run_verification_schedule(interval_seconds: int):
+    """Pętla harmonogramu (uruchamiana przy starcie aplikacji): przebieg, potem przerwa; błąd nie zatrzymuje pętli."""
+    while True:
+        try:
+            await verify_ended_challenges()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"A critical error occurred in the verification task: {e}", exc_info=True)
+        await asyncio.sleep(interval_seconds)
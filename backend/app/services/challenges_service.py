@@ -1,7 +1,25 @@
 import random
 from datetime import datetime
 
-# Duża, statyczna lista wszystkich możliwych wyzwań w aplikacji
+from app.models.enums import MealCategory
+from app.services.challenge_rules import Condition, Rule
+
+
+# Warunki konieczne (rodzaj aktywności czy posiłków i tak ocenia AI)
+def _workouts(at_least: int) -> Rule:
+    """Co najmniej tyle treningów w okresie wyzwania."""
+    return Rule((Condition("workouts", "count", minimum=at_least, per_day=False),), decisive=False)
+
+def _workout_days(days: int = None) -> Rule:
+    """Trening każdego dnia wyzwania (albo w co najmniej `days` dniach)."""
+    return Rule((Condition("workouts", "count", minimum=1, min_days=days),), decisive=False)
+
+def _meal_days(days: int = None) -> Rule:
+    """Zapisany posiłek każdego dnia wyzwania (albo w co najmniej `days` dniach)."""
+    return Rule((Condition("meals", "count", minimum=1, min_days=days),), decisive=False)
+
+# Duża, statyczna lista wszystkich możliwych wyzwań w aplikacji.
+# "rule" (opcjonalnie) - warunki sprawdzane na danych z bazy, zob. app/services/challenge_rules.py
 ALL_CHALLENGES = [
   {
     "id": 1,
@@ -22,7 +40,8 @@ ALL_CHALLENGES = [
     "title": "Białkowe śniadanie",
     "description": "Zadbaj o to, aby Twoje śniadanie każdego dnia zawierało co najmniej 20g białka.",
     "duration_days": 7,
-    "category": "dieta"
+    "category": "dieta",
+    "rule": Rule((Condition("meals", "protein", minimum=20, meal_category=MealCategory.SNIADANIE),))
   },
   {
     "id": 4,
@@ -57,7 +76,8 @@ ALL_CHALLENGES = [
     "title": "Domowy lunchbox",
     "description": "Przygotuj i zapisz w aplikacji posiłki do pracy lub szkoły na co najmniej 4 dni w tygodniu.",
     "duration_days": 7,
-    "category": "dieta"
+    "category": "dieta",
+    "rule": _meal_days(4)
   },
   {
     "id": 9,
@@ -85,7 +105,8 @@ ALL_CHALLENGES = [
     "title": "Mistrz planowania posiłków",
     "description": "Zaplanuj i zapisz w aplikacji jadłospis na cały nadchodzący tydzień z góry.",
     "duration_days": 7,
-    "category": "dieta"
+    "category": "dieta",
+    "rule": _meal_days()
   },
   {
     "id": 13,
@@ -211,228 +232,263 @@ ALL_CHALLENGES = [
     "title": "Pełna kontrola kalorii",
     "description": "Codziennie zapisuj wszystkie spożyte posiłki, starając się nie przekraczać swojego celu kalorycznego.",
     "duration_days": 7,
-    "category": "dieta"
+    "category": "dieta",
+    "rule": Rule((Condition("meals", "count", minimum=1), Condition("meals", "calories", maximum="calorie_goal")))
   },
   {
     "id": 31,
     "title": "Codzienny spacer 30 min",
     "description": "Zarejestruj w aplikacji co najmniej 30 minutowy spacer każdego dnia tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workout_days()
   },
   {
     "id": 32,
     "title": "3x trening siłowy",
     "description": "Wykonaj i zapisz trzy dowolne treningi siłowe w ciągu tego tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(3)
   },
   {
     "id": 33,
     "title": "Tydzień z jogą",
     "description": "Zarejestruj co najmniej 4 sesje jogi po minimum 15 minut każda.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(4)
   },
   {
     "id": 34,
     "title": "Aktywny poranek",
     "description": "Wykonaj i zapisz dowolną 15-minutową aktywność fizyczną przed godziną 9:00 rano.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 35,
     "title": "Rowerowy zawrót głowy",
     "description": "Zarejestruj w sumie co najmniej 60 minut jazdy na rowerze w ciągu tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 36,
     "title": "Wyzwanie cardio",
     "description": "Wykonaj i zapisz 3 treningi cardio (bieganie, orbitrek, rowerek stacjonarny) po 30 minut.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(3)
   },
   {
     "id": 37,
     "title": "Mocne plecy",
     "description": "Zarejestruj dwa treningi w tygodniu, które zawierają co najmniej jedno ćwiczenie na mięśnie pleców.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(2)
   },
   {
     "id": 38,
     "title": "Wieczorne rozciąganie",
     "description": "Zapisz 10-minutową sesję rozciągania każdego wieczoru przed snem.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workout_days()
   },
   {
     "id": 39,
     "title": "Aktywny weekend",
     "description": "Zarejestruj co najmniej 60 minut dowolnej aktywności fizycznej w sobotę i niedzielę.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 40,
     "title": "Nowa forma ruchu",
     "description": "Spróbuj i zapisz jedną nową dla siebie formę aktywności fizycznej (np. taniec, pływanie, wspinaczka).",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 41,
     "title": "Trening interwałowy",
     "description": "Wykonaj i zapisz dwa 20-minutowe treningi interwałowe (HIIT) w ciągu tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(2)
   },
   {
     "id": 42,
     "title": "Wyzwanie na schodach",
     "description": "Zarejestruj co najmniej 3 razy w tygodniu 10-minutową aktywność 'wchodzenie po schodach'.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(3)
   },
   {
     "id": 43,
     "title": "Core stability",
     "description": "Wykonaj i zapisz 4 razy w tygodniu trening zawierający ćwiczenie 'plank' (deska).",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(4)
   },
   {
     "id": 44,
     "title": "Biegacz na 5 km",
     "description": "Zarejestruj w sumie 5 kilometrów biegu, rozłożone na dowolną liczbę treningów w tygodniu.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 45,
     "title": "Aktywna przerwa w pracy",
     "description": "Zapisz codziennie 15-minutowy spacer lub proste ćwiczenia w trakcie dnia pracy.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workout_days(5)
   },
   {
     "id": 46,
     "title": "Pływacki tydzień",
     "description": "Zarejestruj dwie wizyty na basenie, każda trwająca co najmniej 30 minut.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(2)
   },
   {
     "id": 47,
     "title": "Trening całego ciała (FBW)",
     "description": "Wykonaj i zapisz dwa treningi typu Full Body Workout w ciągu tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(2)
   },
   {
     "id": 48,
     "title": "Mocne nogi",
     "description": "Zarejestruj dwa treningi w tygodniu zawierające co najmniej jedno ćwiczenie na nogi (np. przysiady).",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(2)
   },
   {
     "id": 49,
     "title": "10 000 kroków dziennie",
     "description": "Zarejestruj w aplikacji osiągnięcie celu 10 000 kroków przez 5 dni w tygodniu.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workout_days(5)
   },
   {
     "id": 50,
     "title": "Tydzień z pilatesem",
     "description": "Zapisz trzy sesje pilatesu, każda trwająca co najmniej 20 minut.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(3)
   },
   {
     "id": 51,
     "title": "Wyzwanie na skakance",
     "description": "Zarejestruj w sumie 30 minut skakania na skakance w ciągu całego tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 52,
     "title": "Trening z gumami oporowymi",
     "description": "Wykonaj i zapisz 3 treningi z użyciem gum oporowych w ciągu tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(3)
   },
   {
     "id": 53,
     "title": "Rodzinna aktywność",
     "description": "Zapisz jedną co najmniej 45-minutową aktywność wykonaną z rodziną lub przyjaciółmi (np. gra w piłkę, wycieczka).",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 54,
     "title": "Wędrówka w terenie",
     "description": "Zarejestruj co najmniej jedną 60-minutową wędrówkę lub trekking w ciągu tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 55,
     "title": "Trening z masą własnego ciała",
     "description": "Wykonaj i zapisz 4 treningi w tygodniu, używając wyłącznie ciężaru własnego ciała.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(4)
   },
   {
     "id": 56,
     "title": "Taneczny tydzień",
     "description": "Zarejestruj łącznie 60 minut tańca (np. zumba, zajęcia taneczne, taniec w domu) w ciągu tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 57,
     "title": "Aktywny dojazd",
     "description": "Zarejestruj dojazd do pracy lub szkoły rowerem lub pieszo co najmniej 3 razy.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(3)
   },
   {
     "id": 58,
     "title": "Poranna gimnastyka",
     "description": "Zarejestruj codziennie 10-minutową poranną gimnastykę zaraz po przebudzeniu.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workout_days()
   },
   {
     "id": 59,
     "title": "Wyzwanie pompki",
     "description": "Zarejestruj treningi, w których łącznie wykonasz 50 pompek w ciągu tygodnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workouts(1)
   },
   {
     "id": 60,
     "title": "Mistrz regularności",
     "description": "Zarejestruj dowolną formę aktywności fizycznej trwającą min. 20 minut każdego dnia.",
     "duration_days": 7,
-    "category": "aktywność"
+    "category": "aktywność",
+    "rule": _workout_days()
   }
 ]
 
+# Indeks wyzwań po ID (zamiast przeszukiwania całej listy przy każdym wywołaniu)
+CHALLENGES_BY_ID = {challenge['id']: challenge for challenge in ALL_CHALLENGES}
+
 def get_challenge_by_id(challenge_id: int):
     """
-    Wyszukuje i zwraca jedno wyzwanie z listy na podstawie jego ID.
+    Zwraca jedno wyzwanie na podstawie jego ID (lub None).
     """
-    for challenge in ALL_CHALLENGES:
-        if challenge['id'] == challenge_id:
-            return challenge
-    return None
+    return CHALLENGES_BY_ID.get(challenge_id)
+
+def public_challenge(challenge: dict) -> dict:
+    """Wyzwanie bez reguły weryfikacji (do odpowiedzi API)."""
+    return {key: value for key, value in challenge.items() if key != "rule"}
 
 def get_all_challenges():
     """
@@ -448,7 +504,7 @@ def get_all_challenges():
     
     # Jeśli z jakiegoś powodu mamy mniej niż 3 wyzwania, zwróćmy wszystkie.
     if len(ALL_CHALLENGES) < 3:
-        return ALL_CHALLENGES
+        return [public_challenge(c) for c in ALL_CHALLENGES]
         
-    # Losujemy 3 unikalne wyzwania z całej puli
-    return random.sample(ALL_CHALLENGES, 3)
\ No newline at end of file
+    # Losujemy 3 unikalne wyzwania z całej puli (reguły weryfikacji zostają po stronie serwera)
+    return [public_challenge(c) for c in random.sample(ALL_CHALLENGES, 3)]
\ No newline at end of file
@@ -0,0 +1,322 @@
+"""
+Leksykon żywności trzymany w pamięci procesu.
+
+Zamiast pytać bazę (func.lower(name) == ..., czyli pełny skan tabeli) przy każdej analizie,
+budujemy raz przy starcie indeks: znormalizowana nazwa/alias -> migawka produktu lub dania.
+Nazwę szukamy najpierw dokładnie (bez diakrytyków), a dopiero potem po kluczu ze stemmingiem.
+Po nauczeniu się nowego produktu/dania indeks jest uzupełniany w miejscu, a współdzielony
+licznik wersji w bazie pozwala pozostałym workerom (gunicorn) wykryć, że ich kopia jest nieaktualna.
+"""
+import math
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Generic, Iterable, List, Optional, Tuple, TypeVar, Union
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.morphology import exact_key, name_key
+from app.crud import crud_base as crud
+from app.models import sql_models as models
+from app.models.enums import ProductState
+from app.services.food_matcher import NgramIndex
+
+
+@dataclass(frozen=True)
+class ProductEntry:
+    """Migawka produktu podstawowego - wszystko, czego potrzeba do przeliczenia porcji."""
+    id: int
+    name: str
+    nutrients: Dict[str, float]
+    state: ProductState
+    average_weight_g: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class DishIngredientEntry:
+    """Migawka jednego składnika dania (z wartościami odżywczymi produktu)."""
+    product_name: str
+    weight_g: float
+    nutrients: Optional[Dict[str, float]]
+    state: Optional[ProductState]
+
+
+@dataclass(frozen=True)
+class DishEntry:
+    """Migawka dania złożonego wraz z przepisem i jego podsumowaniem (waga, stan, makro na 100g)."""
+    id: int
+    name: str
+    ingredients: Tuple[DishIngredientEntry, ...]
+    total_weight_g: float
+    state: ProductState
+    nutrients_per_100g: Dict[str, float]
+
+
+@dataclass(frozen=True)
+class LexiconMatch:
+    """Wynik wyszukiwania: danie lub produkt oraz pewność dopasowania (1.0 = dokładne)."""
+    entry: Union[DishEntry, ProductEntry]
+    score: float
+
+    @property
+    def is_dish(self) -> bool:
+        return isinstance(self.entry, DishEntry)
+
+
+def lexicon_key(name: str) -> str:
+    """
+    Klucz wyszukiwania: bez polskich znaków, słów funkcyjnych i końcówek fleksyjnych ("jajek" -> "jajk").
+    Synonimy to aliasy z bazy - każdy alias dostaje w indeksie własny klucz wskazujący na ten sam rekord.
+    """
+    return name_key(name)
+
+
+def _valid_aliases(aliases: Optional[Iterable[str]]) -> List[str]:
+    return [raw for raw in aliases or [] if isinstance(raw, str) and raw.strip()]
+
+
+E = TypeVar("E", ProductEntry, DishEntry)
+
+# Różnica makroskładników (na 100g), do której dwa rekordy to ta sama żywność zapisana inaczej ("ogórek"/"ogórki")
+SAME_FOOD_REL_TOLERANCE = 0.05
+SAME_FOOD_ABS_TOLERANCE = 1.0
+
+
+def _same_food(a: E, b: E) -> bool:
+    """Czy rekordy są wymienne przy przeliczaniu porcji: ten sam stan i (prawie) te same makroskładniki na 100g."""
+    nutrients_a = a.nutrients if isinstance(a, ProductEntry) else a.nutrients_per_100g
+    nutrients_b = b.nutrients if isinstance(b, ProductEntry) else b.nutrients_per_100g
+    return a.state == b.state and all(
+        math.isclose(
+            nutrients_a.get(key) or 0.0, nutrients_b.get(key) or 0.0,
+            rel_tol=SAME_FOOD_REL_TOLERANCE, abs_tol=SAME_FOOD_ABS_TOLERANCE
+        )
+        for key in ("calories", "protein", "fat", "carbs")
+    )
+
+
+class _NameIndex(Generic[E]):
+    """
+    Nazwy i aliasy jednego rodzaju rekordów (produkty albo dania) w dwóch słownikach: dokładna nazwa
+    (exact_key) i klucz ze stemmingiem (lexicon_key), sprawdzany dopiero, gdy dokładnej nazwy nie ma.
+    Nazwa rekordu wygrywa z aliasem innego rekordu. Klucz ze stemmingiem wspólny dla dwóch różnych rekordów
+    tej samej rangi ("mąka" i "mak" -> "mak") nie wskazuje na żaden z nich - oba znajdziemy tylko dokładnie.
+    Wyjątek to ta sama żywność zapisana dwa razy ("jajko"/"jajka", _same_food) - wtedy zostaje pierwszy rekord.
+    """
+
+    def __init__(self):
+        self.exact: Dict[str, E] = {}
+        # klucz ze stemmingiem -> (rekord albo None przy kolizji, czy pochodzi z nazwy rekordu)
+        self._stems: Dict[str, Tuple[Optional[E], bool]] = {}
+        # Wykryte kolizje (klucz, nazwa pierwszego rekordu, nazwa drugiego) - do logu
+        self.clashes: List[Tuple[str, str, str]] = []
+
+    def add(self, text: str, entry: E, is_name: bool) -> Optional[str]:
+        """Dopisuje nazwę lub alias rekordu; zwraca jej dokładny klucz (None dla pustej nazwy)."""
+        key = exact_key(text)
+        if not key:
+            return None
+        if is_name:
+            self.exact[key] = entry
+        else:
+            self.exact.setdefault(key, entry)
+
+        stem = lexicon_key(text)
+        held, held_is_name = self._stems.get(stem, (None, False))
+        if stem not in self._stems or (held is not None and held.id == entry.id):
+            self._stems[stem] = (entry, is_name or held_is_name)
+        elif is_name and not held_is_name:
+            self._stems[stem] = (entry, True)
+        elif is_name == held_is_name and (held is None or not _same_food(held, entry)):
+            if held is not None:
+                self.clashes.append((stem, held.name, entry.name))
+            self._stems[stem] = (None, is_name)
+        return key
+
+    def add_record(self, name: str, aliases: Optional[Iterable[str]], entry: E) -> List[str]:
+        """Dopisuje rekord (najpierw aliasy, potem nazwa); zwraca dokładne klucze do indeksu trigramów."""
+        keys = [self.add(alias, entry, is_name=False) for alias in _valid_aliases(aliases)]
+        keys.append(self.add(name, entry, is_name=True))
+        return [key for key in keys if key]
+
+    def get_exact(self, name: str) -> Optional[E]:
+        return self.exact.get(exact_key(name))
+
+    def get_stemmed(self, name: str) -> Optional[E]:
+        return self._stems.get(lexicon_key(name), (None, False))[0]
+
+    def get(self, name: str) -> Optional[E]:
+        return self.get_exact(name) or self.get_stemmed(name)
+
+
+def _dish_entry(dish: models.Dish, ingredients: List[DishIngredientEntry]) -> DishEntry:
+    """Buduje migawkę dania; dla baz bez przeliczonych podsumowań liczy je w locie ze składników."""
+    if dish.total_weight_g is None:
+        rollup = crud.compute_dish_rollup((ing.weight_g, ing.nutrients, ing.state) for ing in ingredients)
+    else:
+        rollup = {
+            "total_weight_g": dish.total_weight_g, "state": dish.state or ProductState.SOLID,
+            "calories_per_100g": dish.calories_per_100g or 0.0, "protein_per_100g": dish.protein_per_100g or 0.0,
+            "fat_per_100g": dish.fat_per_100g or 0.0, "carbs_per_100g": dish.carbs_per_100g or 0.0,
+        }
+    return DishEntry(
+        id=dish.id,
+        name=dish.name,
+        ingredients=tuple(ingredients),
+        total_weight_g=rollup["total_weight_g"],
+        state=rollup["state"],
+        nutrients_per_100g={
+            "calories": rollup["calories_per_100g"], "protein": rollup["protein_per_100g"],
+            "fat": rollup["fat_per_100g"], "carbs": rollup["carbs_per_100g"],
+        },
+    )
+
+
+def _log_clashes(clashes: List[Tuple[str, str, str]]) -> None:
+    for stem, first, second in clashes:
+        print(f"DEBUG: Leksykon: '{first}' i '{second}' mają wspólny klucz '{stem}' - szukamy ich tylko dokładnie.")
+
+
+def _product_entry(product: models.Product) -> ProductEntry:
+    return ProductEntry(
+        id=product.id,
+        name=product.name,
+        nutrients=product.nutrients or {},
+        state=product.state or ProductState.SOLID,
+        average_weight_g=product.average_weight_g,
+    )
+
+
+class FoodLexicon:
+    """Indeks nazw i aliasów produktów oraz dań, współdzielony w obrębie procesu."""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._products: _NameIndex[ProductEntry] = _NameIndex()
+        self._dishes: _NameIndex[DishEntry] = _NameIndex()
+        self._ngrams: NgramIndex[str] = NgramIndex()
+        self.version = 0
+        self.loaded = False
+        self._last_version_check = 0.0
+
+    def load(self, db: Session) -> None:
+        """Buduje indeks od zera (3 zapytania niezależnie od liczby produktów)."""
+        version = crud.get_food_lexicon_version(db)
+
+        products: _NameIndex[ProductEntry] = _NameIndex()
+        product_rows = crud.get_all_products(db)
+        for product in product_rows:
+            products.add_record(product.name, product.aliases, _product_entry(product))
+
+        ingredients_by_dish: Dict[int, List[DishIngredientEntry]] = {}
+        for dish_id, product_name, weight_g, nutrients, state in crud.get_all_dish_ingredient_rows(db):
+            ingredients_by_dish.setdefault(dish_id, []).append(
+                DishIngredientEntry(product_name=product_name, weight_g=weight_g, nutrients=nutrients, state=state)
+            )
+
+        dishes: _NameIndex[DishEntry] = _NameIndex()
+        dish_rows = crud.get_all_dishes(db)
+        for dish in dish_rows:
+            dishes.add_record(dish.name, dish.aliases, _dish_entry(dish, ingredients_by_dish.get(dish.id, [])))
+
+        ngrams: NgramIndex[str] = NgramIndex()
+        for key in (*dishes.exact, *products.exact):
+            ngrams.add(key, key)
+
+        with self._lock:
+            self._products = products
+            self._dishes = dishes
+            self._ngrams = ngrams
+            self.version = version
+            self.loaded = True
+            self._last_version_check = time.monotonic()
+        print(f"DEBUG: Leksykon żywności załadowany (wersja {version}): {len(product_rows)} produktów, {len(dish_rows)} dań.")
+        clashes = products.clashes + dishes.clashes
+        if clashes:
+            examples = ", ".join(f"'{first}'/'{second}'" for _, first, second in clashes[:3])
+            print(f"DEBUG: Leksykon: {len(clashes)} kluczy ze stemmingiem wspólnych dla różnych rekordów (np. {examples}) - te nazwy szukamy tylko dokładnie.")
+
+    def ensure_fresh(self, db: Session, force: bool = False) -> None:
+        """
+        Przeładowuje indeks, jeśli inny worker zmienił bazę żywności.
+        Wersję sprawdza co FOOD_LEXICON_REFRESH_SECONDS, a przy force=True - od razu.
+        """
+        recently_checked = time.monotonic() - self._last_version_check < settings.FOOD_LEXICON_REFRESH_SECONDS
+        if self.loaded and recently_checked and not force:
+            return
+        if not self.loaded or crud.get_food_lexicon_version(db) != self.version:
+            self.load(db)
+        else:
+            self._last_version_check = time.monotonic()
+
+    def lookup_dish(self, name: str) -> Optional[DishEntry]:
+        return self._dishes.get(name)
+
+    def lookup_product(self, name: str) -> Optional[ProductEntry]:
+        return self._products.get(name)
+
+    def match(self, name: str, min_score: Optional[float] = None) -> Optional[LexiconMatch]:
+        """
+        Szuka dania lub produktu: najpierw dokładnie (po nazwie i aliasach), potem po kluczu ze stemmingiem,
+        a na końcu rozmyto po trigramach. Zwraca None, jeśli najlepsze dopasowanie jest poniżej progu.
+        """
+        found = (
+            self._dishes.get_exact(name) or self._products.get_exact(name)
+            or self._dishes.get_stemmed(name) or self._products.get_stemmed(name)
+        )
+        if found:
+            return LexiconMatch(entry=found, score=1.0)
+
+        threshold = settings.FOOD_MATCH_THRESHOLD if min_score is None else min_score
+        # Indeks może być właśnie uzupełniany przez zapis nauki wykonywany w puli wątków
+        with self._lock:
+            best = self._ngrams.best(exact_key(name), min_score=threshold)
+        if not best:
+            return None
+        entry = self._dishes.exact.get(best.value) or self._products.exact.get(best.value)
+        return LexiconMatch(entry=entry, score=round(best.score, 3)) if entry else None
+
+    def add_product(self, product: models.Product) -> ProductEntry:
+        """Dopisuje (lub nadpisuje) produkt w indeksie bez przeładowania całości."""
+        entry = _product_entry(product)
+        with self._lock:
+            known_clashes = len(self._products.clashes)
+            for key in self._products.add_record(product.name, product.aliases, entry):
+                self._ngrams.add(key, key)
+            _log_clashes(self._products.clashes[known_clashes:])
+        return entry
+
+    def add_dish(self, dish: models.Dish) -> DishEntry:
+        """Dopisuje danie (i jego składniki jako produkty) do indeksu."""
+        ingredients = []
+        for ing in dish.ingredients:
+            if ing.product is None:
+                continue
+            ingredients.append(DishIngredientEntry(
+                product_name=ing.product.name, weight_g=ing.weight_g,
+                nutrients=ing.product.nutrients, state=ing.product.state
+            ))
+            if self._products.get_exact(ing.product.name) is None:
+                self.add_product(ing.product)
+        entry = _dish_entry(dish, ingredients)
+        with self._lock:
+            known_clashes = len(self._dishes.clashes)
+            for key in self._dishes.add_record(dish.name, dish.aliases, entry):
+                self._ngrams.add(key, key)
+            _log_clashes(self._dishes.clashes[known_clashes:])
+        return entry
+
+    def publish(self, db: Session) -> None:
+        """Ogłasza zmianę pozostałym workerom, zwiększając współdzielony licznik wersji."""
+        new_version = crud.bump_food_lexicon_version(db)
+        with self._lock:
+            if new_version == self.version + 1:
+                # Nikt inny nie zmienił bazy w międzyczasie - nasza kopia jest aktualna
+                self.version = new_version
+            else:
+                # Ktoś inny też coś dopisał - przeładujemy się przy najbliższym sprawdzeniu
+                self._last_version_check = 0.0
+
+
+food_lexicon = FoodLexicon()
@@ -0,0 +1,97 @@
+"""
+Rozmyte dopasowywanie nazw produktów i dań na podstawie indeksu trigramów.
+
+Nazwy i aliasy są sprowadzane do postaci bez polskich znaków, dzielone na trigramy
+i trzymane w indeksie odwróconym (trigram -> klucze). Zapytanie porównujemy tylko z kluczami,
+które mają z nim wspólny choć jeden trigram, a podobieństwo liczymy współczynnikiem Dice'a.
+"""
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Generic, List, Optional, Set, TypeVar
+
+from app.core import units
+
+T = TypeVar("T")
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+# Trigramy występujące w więcej niż tylu kluczach (np. " z ") nie niosą informacji - pomijamy je przy wyborze kandydatów
+MAX_POSTING_SHARE = 0.2
+# Ilu najlepszych kandydatów (wg liczby wspólnych trigramów) oceniamy dokładnie
+MAX_CANDIDATES = 50
+
+
+def fold_for_matching(text: str) -> str:
+    """Małe litery, bez diakrytyków i znaków przestankowych, pojedyncze spacje."""
+    folded = units.fold_diacritics(text.lower())
+    return _NON_ALNUM.sub(" ", folded).strip()
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """Zbiór trigramów tekstu (z dopełnieniem spacjami, jak w pg_trgm)."""
+    folded = fold_for_matching(text)
+    if not folded:
+        return frozenset()
+    padded = f"  {folded} "
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+@dataclass(frozen=True)
+class NgramMatch(Generic[T]):
+    key: str
+    value: T
+    score: float
+
+
+class NgramIndex(Generic[T]):
+    """Indeks odwrócony trigramów z wyszukiwaniem najbardziej podobnych kluczy."""
+
+    def __init__(self):
+        self._grams: Dict[str, FrozenSet[str]] = {}
+        self._values: Dict[str, T] = {}
+        self._postings: Dict[str, Set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def add(self, key: str, value: T) -> None:
+        """Dodaje (lub podmienia) klucz w indeksie."""
+        if key in self._grams:
+            self._values[key] = value
+            return
+        grams = trigrams(key)
+        if not grams:
+            return
+        self._grams[key] = grams
+        self._values[key] = value
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(key)
+
+    def search(self, query: str, limit: int = 5, min_score: float = 0.0) -> List[NgramMatch[T]]:
+        """Zwraca do `limit` najbardziej podobnych kluczy (podobieństwo Dice'a, 0..1)."""
+        query_grams = trigrams(query)
+        if not query_grams or not self._grams:
+            return []
+
+        max_posting = max(1, int(len(self._grams) * MAX_POSTING_SHARE))
+        overlap: Counter = Counter()
+        for gram in query_grams:
+            posting = self._postings.get(gram)
+            if posting and len(posting) <= max_posting:
+                overlap.update(posting)
+
+        matches = []
+        # Dokładny wynik liczymy tylko dla kandydatów z największą liczbą wspólnych (rzadkich) trigramów
+        for key, _ in overlap.most_common(MAX_CANDIDATES):
+            key_grams = self._grams[key]
+            score = 2.0 * len(query_grams & key_grams) / (len(query_grams) + len(key_grams))
+            if score >= min_score:
+                matches.append(NgramMatch(key=key, value=self._values[key], score=score))
+        matches.sort(key=lambda m: (-m.score, len(m.key)))
+        return matches[:limit]
+
+    def best(self, query: str, min_score: float = 0.0) -> Optional[NgramMatch[T]]:
+        """Najlepsze dopasowanie powyżej progu lub None."""
+        found = self.search(query, limit=1, min_score=min_score)
+        return found[0] if found else None
@@ -1,23 +1,30 @@
 import google.generativeai as genai
+import asyncio
 import os
 import json
 import re
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 from PIL import Image
 import io
 import base64
 from datetime import date
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 
 # Importy zaktualizowane na strukturę app.*
 from app.core.config import settings
 from app.crud import crud_base as crud
+from app.crud import crud_async
 from app.models import sql_models as models
 from app.schemas import all_schemas as schemas
 from app.core import units
 from app.core.database import SessionLocal
-from app.models.enums import MealCategory, ProductState
+from app.models.enums import MealCategory
+from app.core.singleflight import SingleFlight
+from app.core.morphology import exact_key
+from app.services.food_lexicon import food_lexicon, DishEntry, LexiconMatch, ProductEntry
+from app.services.ai_cache import ai_response_cache, cache_key
 
 # --- Konfiguracja ---
 # Użycie klucza z settings
@@ -25,7 +32,25 @@ GEMINI_API_KEY = settings.GOOGLE_API_KEY
 if not GEMINI_API_KEY:
     raise ValueError("GOOGLE_API_KEY nie został ustawiony w konfiguracji (settings).")
 genai.configure(api_key=GEMINI_API_KEY)
-model = genai.GenerativeModel('models/gemini-2.0-flash')
+MODEL_NAME = 'models/gemini-2.0-flash'
+model = genai.GenerativeModel(MODEL_NAME)
+
+# Czas ważności odpowiedzi AI w pamięci podręcznej (w sekundach), osobno dla każdego miejsca wywołania.
+# Miejsca spoza tej listy (np. plan diety, podsumowanie tygodnia) zawsze pytają model od nowa.
+DAY = 24 * 60 * 60
+AI_CACHE_TTL = {
+    "meal_image": 7 * DAY,
+    "dish_analysis": 30 * DAY,
+    "dish_recipe": 30 * DAY,
+    "product_facts": 30 * DAY,
+    "workout": 30 * DAY,
+    "challenge_verdict": DAY,
+}
+
+# Nauka nowych dań/produktów przez AI: jedno zadanie na nazwę, bez względu na liczbę równoległych żądań
+learning_flights = SingleFlight()
+# Limit równoległych zapytań do AI przy douczaniu pojedynczych składników
+ingredient_learning_slots = asyncio.Semaphore(settings.INGREDIENT_LEARNING_CONCURRENCY)
 
 # --- Funkcje Pomocnicze ---
 
@@ -36,18 +61,38 @@ def _clean_json_response(text: str) -> str:
         return match.group(1).strip()
     return text.strip()
 
-async def _get_ai_response(prompt: str, image: Optional[Image.Image] = None) -> str:
-    """Wysyła zapytanie (tekst i/lub obraz) do modelu Gemini i zwraca odpowiedź tekstową."""
+async def _get_ai_response(
+    prompt: str, image: Optional[Image.Image] = None, call_site: Optional[str] = None, bypass_cache: bool = False
+) -> str:
+    """
+    Wysyła zapytanie (tekst i/lub obraz) do modelu Gemini i zwraca odpowiedź tekstową.
+    Odpowiedzi dla miejsc wywołania z AI_CACHE_TTL są zapamiętywane; bypass_cache=True wymusza
+    nowe zapytanie do modelu (wynik i tak trafia do pamięci podręcznej).
+    """
+    ttl_seconds = AI_CACHE_TTL.get(call_site)
+    key = cache_key(MODEL_NAME, prompt, image) if ttl_seconds else None
+    if key and not bypass_cache:
+        # Odczyt/zapis poziomu bazodanowego to synchroniczny SQLite - poza pętlą zdarzeń
+        cached = await run_in_threadpool(ai_response_cache.get, key)
+        if cached is not None:
+            print(f"DEBUG: Odpowiedź AI z pamięci podręcznej ({call_site}).")
+            return cached
+
     try:
         content_to_send = [prompt, image] if image else [prompt]
         print(f"DEBUG: Wysyłanie zapytania do Gemini. Prompt: {prompt[:100]}...")
         response = await model.generate_content_async(content_to_send)
         print("DEBUG: Otrzymano odpowiedź z Gemini.")
-        return response.text if response.text else ""
+        text = response.text if response.text else ""
     except Exception as e:
         print(f"BŁĄD KRYTYCZNY podczas komunikacji z API Gemini: {e}")
         return ""
 
+    # Pustych odpowiedzi (błędów) nie zapamiętujemy
+    if key and text:
+        await run_in_threadpool(ai_response_cache.put, key, call_site, text, ttl_seconds)
+    return text
+
 # --- NOWA, GŁÓWNA LOGIKA ANALIZY POSIŁKÓW ---
 
 async def analyze_meal_text(text: Optional[str] = None, image_base64: Optional[str] = None) -> Optional[Dict[str, Any]]:
@@ -57,7 +102,6 @@ async def analyze_meal_text(text: Optional[str] = None, image_base64: Optional[s
     if not text and not image_base64:
         raise ValueError("Musisz podać tekst lub obraz do analizy.")
 
-    db = SessionLocal()
     try:
         # KROK 1: Inteligentne parsowanie zapytania
         parsed_query = await _parse_user_query(text, image_base64)
@@ -68,29 +112,83 @@ async def analyze_meal_text(text: Optional[str] = None, image_base64: Optional[s
         quantity = parsed_query["quantity"]
         unit = parsed_query["unit"]
 
-        # KROK 2: Wyszukiwanie w lokalnej bazie (Cache-First)
-        # Najpierw szukamy dania złożonego
-        db_dish = crud.get_dish_by_name(db, name=product_name)
-        if db_dish:
-            print(f"DEBUG: Cache HIT (Dish)! Znaleziono '{product_name}' w bazie dań.")
-            return await _calculate_nutrients_for_dish(db, db_dish, quantity, unit)
-        
-        # Jeśli nie ma dania, szukamy produktu podstawowego
-        db_product = crud.get_product_by_name(db, name=product_name)
-        if db_product:
-            print(f"DEBUG: Cache HIT (Product)! Znaleziono '{product_name}' w bazie produktów.")
-            return _calculate_nutrients_for_product(db_product, quantity, unit)
-
-        # KROK 3: Jeśli nie ma w cache (Cache Miss) - uruchom mechanizm "uczenia się"
+        # KROK 2: Wyszukiwanie w leksykonie w pamięci (Cache-First, bez zapytań SQL)
+        # Najpierw dokładnie (dania mają pierwszeństwo przed produktami), potem rozmyto po trigramach
+        await run_in_threadpool(_refresh_lexicon)
+        match = food_lexicon.match(product_name)
+        if match:
+            kind = "Dish" if match.is_dish else "Product"
+            print(f"DEBUG: Cache HIT ({kind})! '{product_name}' -> '{match.entry.name}' (pewność {match.score}).")
+            return _calculate_nutrients_for_match(match, quantity, unit)
+
+        # KROK 3: Jeśli nie ma w cache (Cache Miss) - uruchom mechanizm "uczenia się".
+        # Równoległe żądania o tę samą nazwę czekają na jedno wspólne zadanie nauki.
         print(f"DEBUG: Cache MISS! Uruchamiam mechanizm uczenia dla '{product_name}'.")
-        return await _learn_new_dish(db, product_name, quantity, unit)
+        learned = await learning_flights.do(f"dish:{exact_key(product_name)}", lambda: _learn_food(product_name))
+        if learned is None:
+            return None
+        if isinstance(learned, LexiconMatch):
+            return _calculate_nutrients_for_match(learned, quantity, unit)
+        return _calculate_nutrients_for_learned(learned, quantity, unit)
     except Exception as e:
         # Dodajemy szczegółowy wydruk błędu do logów serwera
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"Błąd podczas analizy posiłku: {e}")
-    finally:
-        db.close()
+
+async def analyze_meal_items(text: str) -> Dict[str, Any]:
+    """
+    Analiza kilku pozycji z jednego zdania ("2 jajka, kromka chleba i kawa z mlekiem").
+    Wszystkie pozycje dopasowujemy do leksykonu naraz, a nieznane nazwy douczamy jednym wspólnym zapytaniem do AI.
+    Zwraca wynik dla każdej pozycji (lub błąd tej pozycji) oraz sumę całego posiłku.
+    """
+    parsed_items = [{**_parse_text_item(part), "text": part} for part in split_meal_text(text)]
+    parsed_items = [item for item in parsed_items if item["name"]]
+    if not parsed_items:
+        raise ValueError("Nie rozpoznano żadnej pozycji w opisie posiłku.")
+
+    await run_in_threadpool(_refresh_lexicon)
+    matches = {item["name"]: food_lexicon.match(item["name"]) for item in parsed_items}
+
+    unresolved = [name for name, match in matches.items() if match is None]
+    if unresolved:
+        print(f"DEBUG: Cache MISS dla {len(unresolved)} z {len(matches)} pozycji. Douczam je zbiorczo.")
+        await _learn_missing_ingredients(unresolved)
+        for name in unresolved:
+            matches[name] = food_lexicon.match(name)
+
+    items = []
+    for item in parsed_items:
+        match = matches[item["name"]]
+        result, error = None, None
+        if match is None:
+            error = "Nie udało się rozpoznać produktu."
+        else:
+            try:
+                result = _calculate_nutrients_for_match(match, item["quantity"], item["unit"])
+            except ValueError as e:
+                error = str(e)
+            if result is None and error is None:
+                error = "Brak danych o wadze porcji."
+        items.append({
+            "text": item["text"],
+            "name": item["name"],
+            "quantity": item["quantity"],
+            "unit": item["unit"],
+            "result": result,
+            "error": error,
+        })
+
+    resolved = [item["result"]["aggregated_meal"] for item in items if item["result"]]
+    aggregated_meal = {
+        "name": ", ".join(meal["name"] for meal in resolved),
+        "quantity_grams": round(sum(meal["quantity_grams"] for meal in resolved)),
+        "calories": round(sum(meal["calories"] for meal in resolved)),
+        "protein": round(sum(meal["protein"] for meal in resolved), 1),
+        "fat": round(sum(meal["fat"] for meal in resolved), 1),
+        "carbs": round(sum(meal["carbs"] for meal in resolved), 1),
+    }
+    return {"items": items, "aggregated_meal": aggregated_meal}
 
 async def _parse_user_query(text: Optional[str], image_base64: Optional[str]) -> Dict[str, Any]:
     """Przetwarza zapytanie użytkownika (tekst lub obraz) na ustrukturyzowane dane."""
@@ -108,7 +206,7 @@ async def _parse_user_query(text: Optional[str], image_base64: Optional[str]) ->
         try:
             image_data = base64.b64decode(image_base64.split(',')[1])
             image = Image.open(io.BytesIO(image_data))
-            response_text = await _get_ai_response(image_prompt, image)
+            response_text = await _get_ai_response(image_prompt, image, call_site="meal_image")
             parsed_image = json.loads(_clean_json_response(response_text))
             
             product_name = parsed_image.get("name", "Produkt ze zdjęcia")
@@ -128,62 +226,96 @@ async def _parse_user_query(text: Optional[str], image_base64: Optional[str]) ->
     
     # Dalsze parsowanie tekstu (jeśli nie było obrazu lub był podany tekst)
     if not image_base64 or text:
-        match = re.match(r"^\s*(\d+[\.,]?\d*)\s*([a-zA-ZżźćńółęąśŻŹĆŃÓŁĘĄŚ\.]+)\s*(.*)", product_name)
-        if match:
-            try:
-                quantity = float(match.group(1).replace(',', '.'))
-                unit = match.group(2)
-                product_name = match.group(3).strip() if match.group(3) else unit
-            except (ValueError, IndexError):
-                pass
-    
+        return _parse_text_item(product_name)
+
+    normalized_name = units.normalize_name(product_name)
+    return {"quantity": quantity, "unit": unit, "name": normalized_name, "original_text": product_name}
+
+def _parse_text_item(text: str) -> Dict[str, Any]:
+    """Rozbija jedną pozycję "<ilość> <jednostka> <nazwa>" (np. "2 kromki chleba") na ilość, jednostkę i nazwę."""
+    quantity = 1.0
+    unit = "szt."
+    product_name = text.strip()
+    match = re.match(r"^\s*(\d+[\.,]?\d*)\s*([a-zA-ZżźćńółęąśŻŹĆŃÓŁĘĄŚ\.]+)\s*(.*)", product_name)
+    if match:
+        try:
+            quantity = float(match.group(1).replace(',', '.'))
+            unit = match.group(2)
+            rest = match.group(3).strip() if match.group(3) else ""
+            if unit.lower() in units.KNOWN_UNITS:
+                product_name = rest or unit
+            else:
+                # "2 jajka na twardo" - słowo po liczbie to już część nazwy, a nie jednostka
+                product_name = f"{unit} {rest}".strip()
+                unit = "szt."
+        except (ValueError, IndexError):
+            pass
+    else:
+        # "kromka chleba" - jednostka bez liczby oznacza jedną sztukę tej miary
+        unit_word, _, rest = product_name.partition(" ")
+        if rest.strip() and unit_word.lower() in units.KNOWN_UNITS:
+            unit = unit_word
+            product_name = rest.strip()
+
     normalized_name = units.normalize_name(product_name)
     return {"quantity": quantity, "unit": unit, "name": normalized_name, "original_text": product_name}
 
-async def _calculate_nutrients_for_dish(db: Session, dish: models.Dish, quantity: float, unit: str):
-    """Oblicza wartości odżywcze dla istniejącego dania na podstawie jego przepisu."""
-    base_recipe_weight = sum(ing.weight_g for ing in dish.ingredients if ing.weight_g is not None)
-    if base_recipe_weight == 0:
+# Separatory pozycji w jednym zdaniu: przecinki, średniki, nowe linie, "+" i spójniki.
+# "z"/"ze"/"w" celowo nie dzielą - "kawa z mlekiem" to jedna pozycja.
+_ITEM_SEPARATOR = re.compile(r"\s*[,;+\n]\s*|\s+(?:i|oraz|plus|a także)\s+", re.IGNORECASE)
+
+def split_meal_text(text: str) -> List[str]:
+    """Dzieli opis posiłku na pozycje: "2 jajka, kromka chleba i kawa z mlekiem" -> ["2 jajka", "kromka chleba", "kawa z mlekiem"]."""
+    if not text:
+        return []
+    return [part.strip() for part in _ITEM_SEPARATOR.split(text) if part and part.strip()]
+
+def _calculate_nutrients_for_match(match: LexiconMatch, quantity: float, unit: str):
+    """Oblicza porcję dla dania lub produktu znalezionego w leksykonie i dołącza pewność dopasowania."""
+    if match.is_dish:
+        result = _calculate_nutrients_for_dish(match.entry, quantity, unit)
+    else:
+        result = _calculate_nutrients_for_product(match.entry, quantity, unit)
+    if result:
+        result["aggregated_meal"]["match_confidence"] = match.score
+    return result
+
+def _calculate_nutrients_for_dish(dish: DishEntry, quantity: float, unit: str):
+    """
+    Oblicza wartości odżywcze dla istniejącego dania.
+    Suma makro pochodzi z zmaterializowanego podsumowania (na 100g), więc nie przechodzimy po przepisie.
+    """
+    base_recipe_weight = dish.total_weight_g
+    if not base_recipe_weight:
         return None
 
     user_portion_grams = 0
     unit_lower = unit.lower().strip()
 
-    if unit_lower in ["szt", "szt.", "sztuka", "sztuki"] or unit_lower == dish.name.lower():
+    if units.is_piece_unit(unit_lower) or unit_lower == dish.name.lower():
         user_portion_grams = base_recipe_weight * quantity
     else:
-        liquid_weight = sum(ing.weight_g for ing in dish.ingredients if ing.product and ing.product.state == ProductState.LIQUID)
-        dish_state = ProductState.LIQUID if (liquid_weight / base_recipe_weight) > 0.5 else ProductState.SOLID
-        user_portion_grams, _ = units.standardize_unit(quantity, unit, dish_state)
+        user_portion_grams, _ = units.standardize_unit(quantity, unit, dish.state)
 
     scaling_factor = user_portion_grams / base_recipe_weight if base_recipe_weight > 0 else 0
 
-    total_nutrients = {"calories": 0.0, "protein": 0.0, "fat": 0.0, "carbs": 0.0}
-    deconstruction_details = []
-
-    for ingredient in dish.ingredients:
-        if ingredient.product and ingredient.product.nutrients:
-            # Obliczanie sumy nutrientów dla całego dania
-            factor_for_total = ingredient.weight_g / 100.0
-            total_nutrients["calories"] += ingredient.product.nutrients.get("calories", 0) * factor_for_total
-            total_nutrients["protein"] += ingredient.product.nutrients.get("protein", 0) * factor_for_total
-            total_nutrients["fat"] += ingredient.product.nutrients.get("fat", 0) * factor_for_total
-            total_nutrients["carbs"] += ingredient.product.nutrients.get("carbs", 0) * factor_for_total
-            
-            # Tworzenie dekonstrukcji dla frontendu (już przeskalowanej)
-            scaled_weight = ingredient.weight_g * scaling_factor
-            deconstruction_details.append({
-                "name": ingredient.product.name,
-                "quantity_grams": scaled_weight, # Zapisz dokładną wagę
-                "nutrients_per_100g": ingredient.product.nutrients
-            })
+    # Tworzenie dekonstrukcji dla frontendu (już przeskalowanej)
+    deconstruction_details = [
+        {
+            "name": ingredient.product_name,
+            "quantity_grams": ingredient.weight_g * scaling_factor, # Zapisz dokładną wagę
+            "nutrients_per_100g": ingredient.nutrients
+        }
+        for ingredient in dish.ingredients if ingredient.nutrients
+    ]
 
     # --- KLUCZOWA POPRAWKA W ZAOKRĄGLANIU ---
+    portion_factor = user_portion_grams / 100.0
     final_nutrients = {
-        "calories": round(total_nutrients["calories"] * scaling_factor),
-        "protein": round(total_nutrients["protein"] * scaling_factor, 1),
-        "fat": round(total_nutrients["fat"] * scaling_factor, 1),
-        "carbs": round(total_nutrients["carbs"] * scaling_factor, 1)
+        "calories": round(dish.nutrients_per_100g["calories"] * portion_factor),
+        "protein": round(dish.nutrients_per_100g["protein"] * portion_factor, 1),
+        "fat": round(dish.nutrients_per_100g["fat"] * portion_factor, 1),
+        "carbs": round(dish.nutrients_per_100g["carbs"] * portion_factor, 1)
     }
 
     aggregated_meal = {
@@ -207,7 +339,7 @@ async def _calculate_nutrients_for_dish(db: Session, dish: models.Dish, quantity
     return {"aggregated_meal": aggregated_meal, "deconstruction_details": deconstruction_details}
 
 
-def _calculate_nutrients_for_product(product: models.Product, quantity: float, unit: str):
+def _calculate_nutrients_for_product(product: ProductEntry, quantity: float, unit: str):
     """Oblicza wartości dla produktu podstawowego na podstawie porcji użytkownika."""
     standardized_grams, _ = units.standardize_unit(quantity, unit, product.state, product.average_weight_g)
     factor = standardized_grams / 100.0
@@ -228,11 +360,56 @@ def _calculate_nutrients_for_product(product: models.Product, quantity: float, u
     return {"aggregated_meal": aggregated_meal, "deconstruction_details": []}
 
 
-async def _learn_new_dish(db: Session, dish_name: str, quantity: float, unit: str) -> Optional[Dict[str, Any]]:
+def _calculate_nutrients_for_learned(learned: Dict[str, Any], quantity: float, unit: str):
+    """Skaluje świeżo nauczony produkt (wartości z AI na 100g) do porcji użytkownika."""
+    product: ProductEntry = learned["product"]
+    final_quantity_grams, _ = units.standardize_unit(quantity, unit, product.state, product.average_weight_g)
+    factor = final_quantity_grams / 100.0
+
+    final_nutrients = {
+        "calories": round(product.nutrients.get("calories", 0) * factor),
+        "protein": round(product.nutrients.get("protein", 0) * factor, 1),
+        "fat": round(product.nutrients.get("fat", 0) * factor, 1),
+        "carbs": round(product.nutrients.get("carbs", 0) * factor, 1)
+    }
+
+    aggregated_meal = {
+        "name": f"{product.name}",
+        "quantity_grams": round(final_quantity_grams),
+        "display_quantity_text": f"{quantity} {unit}",
+        **final_nutrients
+    }
+    # Kopia - ten sam wynik nauki trafia do wszystkich żądań czekających na zadanie
+    deconstruction_details = [dict(detail) for detail in learned["deconstruction_details"]]
+    return {"aggregated_meal": aggregated_meal, "deconstruction_details": deconstruction_details}
+
+
+def _refresh_lexicon(force: bool = False) -> None:
+    """Sprawdza wersję leksykonu na krótkiej, własnej sesji (synchronicznie - wywoływać w puli wątków)."""
+    with SessionLocal() as db:
+        food_lexicon.ensure_fresh(db, force=force)
+
+
+async def _learn_food(name: str):
+    """
+    Zadanie nauki uruchamiane raz na nazwę (single-flight), niezależne od sesji żądania,
+    bo może przeżyć żądanie, które je rozpoczęło.
+    Zwraca LexiconMatch (jeśli inny worker zdążył już nauczyć się tej nazwy) lub wynik _learn_new_dish.
+    """
+    await run_in_threadpool(_refresh_lexicon, True)
+    match = food_lexicon.match(name)
+    if match:
+        print(f"DEBUG: '{name}' został już nauczony przez inny proces.")
+        return match
+    return await _learn_new_dish(name)
+
+
+async def _learn_new_dish(dish_name: str) -> Optional[Dict[str, Any]]:
     """
     Uruchamia proces uczenia się nowego dania.
     NOWA LOGIKA: Najpierw prosi o zagregowane dane. Jeśli AI uzna, że to danie złożone,
     dopiero wtedy prosi o dekonstrukcję.
+    Zwraca zapisany produkt (wartości na 100g) i surową dekonstrukcję - skalowanie do porcji robi wywołujący.
     """
     # Krok 1: Poproś AI o dane zagregowane i o informację, czy to danie złożone.
     first_pass_prompt = f"""
@@ -240,17 +417,18 @@ async def _learn_new_dish(db: Session, dish_name: str, quantity: float, unit: st
     Odpowiedz ZAWSZE w formacie JSON z kluczami: "is_complex" (boolean: true, jeśli to danie wieloskładnikowe; false, jeśli to produkt prosty),
     "name" (poprawna nazwa), "base_quantity_g" (typowa waga w gramach dla całej porcji, np. dla przepisu), "nutrients_per_100g" (obiekt z "calories", "protein", "fat", "carbs" dla 100g produktu).
     """
-    response_text = await _get_ai_response(first_pass_prompt)
+    response_text = await _get_ai_response(first_pass_prompt, call_site="dish_analysis")
     try:
         parsed = json.loads(_clean_json_response(response_text))
         if not all(k in parsed for k in ["name", "nutrients_per_100g", "is_complex"]):
             return None # Odpowiedź AI jest niekompletna
+        if not isinstance(parsed["name"], str) or not parsed["name"].strip():
+            return None
     except (json.JSONDecodeError, TypeError):
         return None
 
     is_complex_dish = parsed.get("is_complex", False)
     deconstruction_details = []
-    nutrients_data = parsed.get("nutrients_per_100g", {})
 
     # Krok 2: Jeśli AI oznaczyło to jako danie złożone, poproś o dekonstrukcję.
     if is_complex_dish:
@@ -259,61 +437,146 @@ async def _learn_new_dish(db: Session, dish_name: str, quantity: float, unit: st
         Podaj przepis dla potrawy "{parsed['name']}" jako listę składników i ich wag w gramach dla porcji {base_weight}g.
         Odpowiedz TYLKO w formacie tablicy JSON `[]` z obiektami o kluczach "ingredient_name" i "weight_g".
         """
-        decon_response_text = await _get_ai_response(decon_prompt)
+        decon_response_text = await _get_ai_response(decon_prompt, call_site="dish_recipe")
         try:
-            deconstruction_details = json.loads(_clean_json_response(decon_response_text))
+            deconstruction_details = _valid_recipe_items(json.loads(_clean_json_response(decon_response_text)))
             # Sprawdź i doucz się brakujących składników
-            for ingredient in deconstruction_details:
-                product_name = ingredient.get("ingredient_name")
-                if product_name and not crud.get_product_by_name(db, name=product_name):
-                    await _learn_new_product(db, product_name) # Douczanie się składników
-        except (json.JSONDecodeError, TypeError):
+            await _learn_missing_ingredients([ingredient.get("ingredient_name") for ingredient in deconstruction_details])
+        except (json.JSONDecodeError, TypeError, AttributeError):
             deconstruction_details = [] # W razie błędu, zapisz bez dekonstrukcji
 
-    # Krok 3: Zapisz nowe danie/produkt w bazie.
+    # Krok 3: Zapisz nowe danie/produkt w bazie (zapis synchroniczny - poza pętlą zdarzeń).
+    product_entry = await run_in_threadpool(_save_learned_dish, dish_name, parsed, is_complex_dish, deconstruction_details)
+    return {"product": product_entry, "deconstruction_details": deconstruction_details}
+
+
+def _valid_recipe_items(items: Any) -> List[Dict[str, Any]]:
+    """Składniki przepisu od AI z nazwą i dodatnią wagą; błędne pozycje pomijamy (z wpisem w logu), zamiast przerywać naukę."""
+    if not isinstance(items, list):
+        raise TypeError("Przepis od AI nie jest listą składników.")
+    valid = []
+    for item in items:
+        name = item.get("ingredient_name") if isinstance(item, dict) else None
+        try:
+            weight_g = float(item.get("weight_g")) if isinstance(item, dict) else None
+        except (TypeError, ValueError):
+            weight_g = None
+        if not isinstance(name, str) or not name.strip() or weight_g is None or weight_g <= 0:
+            print(f"BŁĄD: Pomijam niepoprawny składnik przepisu od AI: {item!r}")
+            continue
+        valid.append({**item, "ingredient_name": name.strip(), "weight_g": weight_g})
+    return valid
+
+
+def _known_product_name(name: str) -> str:
+    """Nazwa produktu z leksykonu (także po aliasie), żeby przepis wskazywał nauczony produkt, a nie nowy symbol zastępczy."""
+    entry = food_lexicon.lookup_product(name)
+    return entry.name if entry else name
+
+
+def _save_learned_dish(
+    dish_name: str, parsed: Dict[str, Any], is_complex_dish: bool, deconstruction_details: List[Dict[str, Any]]
+) -> ProductEntry:
+    """Zapisuje danie nauczone przez AI (produkt na 100g i ewentualnie przepis) na własnej sesji."""
     product_state = schemas.ProductState.LIQUID if "zupa" in parsed['name'].lower() else schemas.ProductState.SOLID
     
+    # Zapytanie użytkownika zapisujemy jako alias, żeby następnym razem trafić w leksykon
+    query_aliases = [dish_name] if exact_key(dish_name) != exact_key(parsed['name']) else []
+
     # Zapisujemy produkt, który przechowuje wartości odżywcze per 100g
     product_schema = schemas.ProductCreate(
         name=parsed['name'],
-        nutrients=nutrients_data,
+        aliases=query_aliases,
+        nutrients=parsed.get("nutrients_per_100g", {}),
         state=product_state,
         average_weight_g=parsed.get("base_quantity_g") if not is_complex_dish else 0
     )
-    new_db_product = crud.create_product(db, product=product_schema)
+    with SessionLocal() as db:
+        new_db_product = crud.create_product(db, product=product_schema)
+        product_entry = food_lexicon.add_product(new_db_product)
+
+        if is_complex_dish and deconstruction_details:
+            # Jeśli to danie złożone, zapisz przepis w tabeli Dishes
+            dish_schema = schemas.DishCreate(
+                name=parsed['name'],
+                aliases=[parsed['name'], *query_aliases],
+                ingredients=[
+                    schemas.DishIngredientCreate(product_name=_known_product_name(ing["ingredient_name"]), weight_g=ing["weight_g"])
+                    for ing in deconstruction_details
+                ]
+            )
+            new_db_dish = crud.create_dish_with_ingredients(db, dish=dish_schema)
+            food_lexicon.add_dish(new_db_dish)
+
+        # Dajemy znać pozostałym workerom, że baza żywności się zmieniła
+        food_lexicon.publish(db)
+    return product_entry
+
+
+async def _learn_missing_ingredients(ingredient_names: List[Optional[str]]) -> None:
+    """
+    Douczanie brakujących produktów (składników dania lub pozycji posiłku z analyze_meal_items).
+    Brakujące produkty wyznacza leksykon (najpierw dokładna nazwa lub alias, potem klucz po stemmingu),
+    a wszystkie nieznane uczymy jednym zapytaniem do AI.
+    Składniki, które AI pominęło lub zwróciło z błędem, douczamy pojedynczo i równolegle (z limitem).
+    """
+    names = list(dict.fromkeys(name.strip() for name in ingredient_names if isinstance(name, str) and name.strip()))
+    missing = [name for name in names if food_lexicon.lookup_product(name) is None]
+    if not missing:
+        return
 
-    if is_complex_dish and deconstruction_details:
-        # Jeśli to danie złożone, zapisz przepis w tabeli Dishes
-        dish_schema = schemas.DishCreate(
-            name=parsed['name'],
-            aliases=[parsed['name']],
-            ingredients=[schemas.DishIngredientCreate(product_name=ing["ingredient_name"], weight_g=ing["weight_g"]) for ing in deconstruction_details]
-        )
-        # Powiąż nowo utworzony produkt z daniem
-        crud.create_dish_with_ingredients(db, dish=dish_schema, base_product_id=new_db_product.id)
+    # Składnik może być właśnie douczany dla innego dania - wtedy tylko dołączamy do tamtego zadania
+    batch_names = [name for name in missing if f"product:{exact_key(name)}" not in learning_flights]
+    batch = asyncio.ensure_future(_learn_new_products(batch_names)) if batch_names else None
 
+    async def learn_ingredient(name: str):
+        learned_keys = await asyncio.shield(batch) if batch else set()
+        if exact_key(name) in learned_keys:
+            return
+        async with ingredient_learning_slots:
+            await _learn_new_product(name)
 
-    # Krok 4: Zwróć wynik przeskalowany do porcji użytkownika.
-    final_quantity_grams, _ = units.standardize_unit(quantity, unit, new_db_product.state, new_db_product.average_weight_g)
-    factor = final_quantity_grams / 100.0
+    await asyncio.gather(*(
+        learning_flights.do(f"product:{exact_key(name)}", lambda name=name: learn_ingredient(name))
+        for name in missing
+    ))
 
-    final_nutrients = {
-        "calories": round(nutrients_data.get("calories", 0) * factor),
-        "protein": round(nutrients_data.get("protein", 0) * factor, 1),
-        "fat": round(nutrients_data.get("fat", 0) * factor, 1),
-        "carbs": round(nutrients_data.get("carbs", 0) * factor, 1)
-    }
 
-    aggregated_meal = {
-        "name": f"{parsed['name']}",
-        "quantity_grams": round(final_quantity_grams),
-        "display_quantity_text": f"{quantity} {unit}",
-        **final_nutrients
-    }
-    return {"aggregated_meal": aggregated_meal, "deconstruction_details": deconstruction_details}
+async def _learn_new_products(product_names: List[str]) -> set:
+    """
+    Pyta AI jednym zapytaniem o dane wielu produktów podstawowych i zapisuje poprawne rekordy.
+    Zwraca dokładne klucze (exact_key) nazw, których udało się nauczyć (reszta wymaga osobnego zapytania).
+    """
+    names_list = "\n".join(f"- {name}" for name in product_names)
+    products_prompt = f"""
+    Jesteś encyklopedią żywienia. Podaj kompletne dane dla produktów:
+    {names_list}
+    Odpowiedz ZAWSZE i TYLKO w formacie tablicy JSON `[]`, po jednym obiekcie na produkt, z kluczami:
+    - "query": nazwa produktu dokładnie tak, jak podano ją na liście powyżej,
+    - "name": poprawna, ujednolicona nazwa produktu.
+    - "state": "solid" lub "liquid",
+    - "average_weight_g": typowa waga jednej sztuki w gramach (lub 0, jeśli produkt nie jest sprzedawany na sztuki),
+    - "nutrients": obiekt z kluczami "calories", "protein", "fat", "carbs" dla 100g lub 100ml.
+    """
+    response_text = await _get_ai_response(products_prompt, call_site="product_facts")
+    try:
+        records = json.loads(_clean_json_response(response_text))
+    except (json.JSONDecodeError, TypeError):
+        records = None
+    if not isinstance(records, list):
+        print(f"BŁĄD: Nie udało się nauczyć składników zbiorczo ({len(product_names)}). Douczam pojedynczo.")
+        return set()
 
+    requested = {exact_key(name): name for name in product_names}
+    learned = {}
+    for data in records:
+        query_key = exact_key(data.get("query", "")) if isinstance(data, dict) else ""
+        if query_key in requested and query_key not in learned:
+            learned[query_key] = (requested[query_key], data)
+    return await run_in_threadpool(_save_learned_products, list(learned.values()))
 
-async def _learn_new_product(db: Session, product_name: str):
+
+async def _learn_new_product(product_name: str):
     """Pyta AI o dane dla nowego produktu podstawowego i zapisuje go w bazie."""
     product_prompt = f"""
     Jesteś encyklopedią żywienia. Podaj kompletne dane dla produktu: '{product_name}'.
@@ -323,38 +586,126 @@ async def _learn_new_product(db: Session, product_name: str):
     - "average_weight_g": typowa waga jednej sztuki w gramach (lub 0, jeśli produkt nie jest sprzedawany na sztuki),
     - "nutrients": obiekt z kluczami "calories", "protein", "fat", "carbs" dla 100g lub 100ml.
     """
-    response_text = await _get_ai_response(product_prompt)
+    response_text = await _get_ai_response(product_prompt, call_site="product_facts")
     try:
         data = json.loads(_clean_json_response(response_text))
-        product_schema = schemas.ProductCreate(
-            name=data.get("name", product_name),
-            nutrients=data.get("nutrients", {}),
-            state=data.get("state", "solid"),
-            average_weight_g=data.get("average_weight_g", 0)
-        )
-        crud.create_product(db, product=product_schema)
-        print(f"DEBUG: Cache WRITE! Nauczono się nowego produktu: '{data.get('name', product_name)}'.")
     except (json.JSONDecodeError, TypeError) as e:
         print(f"BŁĄD: Nie udało się nauczyć nowego produktu '{product_name}'. {e}")
+        return
+    await run_in_threadpool(_save_learned_products, [(product_name, data)])
+
+
+def _save_learned_products(learned: List[Tuple[str, Dict[str, Any]]]) -> set:
+    """
+    Zapisuje produkty nauczone przez AI (nazwa z zapytania trafia do aliasów) i dopisuje je do leksykonu.
+    Symbol zastępczy składnika o tej samej nazwie jest uzupełniany zamiast dublowany - razem z podsumowaniami
+    dań, w których występuje. Niepoprawne rekordy są pomijane. Zwraca dokładne klucze zapisanych nazw z zapytań.
+    """
+    saved_keys = set()
+    filled_placeholders = False
+    with SessionLocal() as db:
+        for product_name, data in learned:
+            try:
+                learned_name = data.get("name", product_name)
+                product_schema = schemas.ProductCreate(
+                    name=learned_name,
+                    aliases=[product_name] if exact_key(product_name) != exact_key(learned_name) else [],
+                    nutrients=data.get("nutrients", {}),
+                    state=data.get("state", "solid"),
+                    average_weight_g=data.get("average_weight_g", 0)
+                )
+            except (TypeError, ValueError, AttributeError) as e:
+                print(f"BŁĄD: Nie udało się nauczyć nowego produktu '{product_name}'. {e}")
+                continue
+            db_product = crud.fill_placeholder_product(db, product_schema, names=[learned_name, product_name])
+            if db_product is not None:
+                filled_placeholders = True
+            else:
+                db_product = crud.create_product(db, product=product_schema)
+            food_lexicon.add_product(db_product)
+            saved_keys.add(exact_key(product_name))
+            print(f"DEBUG: Cache WRITE! Nauczono się nowego produktu: '{learned_name}'.")
+        if saved_keys:
+            food_lexicon.publish(db)
+        if filled_placeholders:
+            # Migawki dań w leksykonie mają stare wartości składników - przeładowujemy je od razu
+            food_lexicon.load(db)
+    return saved_keys
 
 # --- POZOSTAŁE FUNKCJE (z drobnymi adaptacjami) ---
 
-async def get_chat_response(db: Session, user: models.User, conversation: models.Conversation, new_message: str) -> str:
+CHAT_FALLBACK_RESPONSE = "Przepraszam, mam problem z odpowiedzią."
+
+async def _load_chat_context(db: AsyncSession, conversation: models.Conversation) -> List[models.ChatMessage]:
+    """
+    Zwraca wiadomości, które trafią do modelu dosłownie, a starsze dopisuje do podsumowania rozmowy.
+    Jedno zapytanie z LIMIT o wiadomości spoza podsumowania (najwyżej CHAT_CONTEXT_MESSAGES + CHAT_SUMMARY_BATCH),
+    a podsumowanie odświeżane jest co CHAT_SUMMARY_BATCH wiadomości - koszt tury nie rośnie z długością wątku.
+    Do podsumowania trafia zawsze najstarsza niestreszczona partia; zaległości długich wątków (sprzed podsumowań)
+    są dopisywane po jednej partii na turę, więc żadna wiadomość nie jest pomijana.
+    """
+    window, batch = settings.CHAT_CONTEXT_MESSAGES, settings.CHAT_SUMMARY_BATCH
+    pending = await crud_async.get_recent_messages(
+        db, conversation.id, limit=window + batch, after_id=conversation.summarized_until_id
+    )
+    if len(pending) - window < batch:
+        return pending
+    # Przy zaległościach `pending` to tylko najnowsze wiadomości - streszczamy od najstarszej niestreszczonej
+    overflow = await crud_async.get_oldest_messages(
+        db, conversation.id, limit=batch, after_id=conversation.summarized_until_id
+    )
+
+    transcript = "\n".join(f"{'AI' if msg.role == 'ai' else 'Użytkownik'}: {msg.content}" for msg in overflow)
+    prompt = f"""Streszczasz rozmowę użytkownika z AI Trenerem na potrzeby dalszej rozmowy.
+    Dotychczasowe streszczenie: {conversation.context_summary or "(brak)"}
+    Kolejne wiadomości:
+    {transcript}
+    Napisz zaktualizowane streszczenie po polsku (maksymalnie 150 słów): fakty o użytkowniku, jego cele, ustalenia i otwarte wątki."""
+    new_summary = await _get_ai_response(prompt)
+    if not new_summary:
+        # Bez streszczenia wysyłamy wszystkie pobrane wiadomości; spróbujemy przy następnej turze
+        return pending
+
+    conversation.context_summary = new_summary.strip()
+    conversation.summarized_until_id = overflow[-1].id
+    await db.commit()
+    return pending[-window:]
+
+async def build_chat_history(db: AsyncSession, user: models.User, conversation: models.Conversation) -> List[Dict[str, Any]]:
+    """Buduje historię dla modelu: prompt systemowy z kontekstem dnia i streszczeniem rozmowy + ostatnie wiadomości."""
     # W przyszłości tutaj zaimplementujemy Tool Calling
-    
+
     # Na razie prosty kontekst z dzisiejszego dnia
-    summary = crud.get_meals_by_date(db, user.id, date.today())
+    summary = await crud_async.get_meals_by_date(db, user.id, date.today())
     summary_text = f"Dzisiejsze posiłki użytkownika: {', '.join([e.product_name for m in summary for e in m.entries])}."
     
-    system_prompt = f"Jesteś AIKcal, osobistym trenerem AI. Rozmawiasz z {user.name}. Jego cel kaloryczny to {user.calorie_goal} kcal. {summary_text} Bądź przyjazny i odpowiadaj po polsku."
+    messages = await _load_chat_context(db, conversation)
+    earlier_text = f" Streszczenie wcześniejszej części rozmowy: {conversation.context_summary}" if conversation.context_summary else ""
+
+    system_prompt = f"Jesteś AIKcal, osobistym trenerem AI. Rozmawiasz z {user.name}. Jego cel kaloryczny to {user.calorie_goal} kcal. {summary_text}{earlier_text} Bądź przyjazny i odpowiadaj po polsku."
     
     history_for_model = [{"role": "user", "parts": [{"text": system_prompt}]}]
-    for msg in conversation.messages[-15:]: # Ograniczamy kontekst do ostatnich 15 wiadomości
+    for msg in messages:
         role = 'model' if msg.role == 'ai' else 'user'
         history_for_model.append({"role": role, "parts": [{"text": msg.content}]})
+    return history_for_model
 
+async def get_chat_response(db: AsyncSession, user: models.User, conversation: models.Conversation, new_message: str) -> str:
+    history_for_model = await build_chat_history(db, user, conversation)
     response = await model.generate_content_async(history_for_model)
-    return response.text if response.text else "Przepraszam, mam problem z odpowiedzią."
+    return response.text if response.text else CHAT_FALLBACK_RESPONSE
+
+async def stream_chat_response(history_for_model: List[Dict[str, Any]]) -> AsyncIterator[str]:
+    """Przekazuje kolejne fragmenty odpowiedzi czatu w miarę, jak generuje je model."""
+    response = await model.generate_content_async(history_for_model, stream=True)
+    async for chunk in response:
+        try:
+            text = chunk.text
+        except ValueError:
+            # Fragment bez tekstu (np. same metadane lub zablokowana treść)
+            continue
+        if text:
+            yield text
 
 
 async def analyze_workout(text: str, weight: float) -> Dict[str, Any]:
@@ -367,7 +718,7 @@ async def analyze_workout(text: str, weight: float) -> Dict[str, Any]:
     
     Przeanalizuj: "{text}"
     """
-    response_text = await _get_ai_response(prompt)
+    response_text = await _get_ai_response(prompt, call_site="workout")
     try:
         return json.loads(_clean_json_response(response_text))
     except (json.JSONDecodeError, TypeError):
@@ -380,11 +731,11 @@ async def verify_challenge_completion(challenge_title: str, challenge_descriptio
     prompt = ""
     if category == 'dieta':
         prompt = f"""Jesteś sędzią w wyzwaniu dietetycznym: "{challenge_title}" (Zasady: {challenge_description}). Dziennik użytkownika:\n- {logs_str}\nCzy użytkownik ZŁAMAŁ zasady? Odpowiedz TYLKO "TAK" lub "NIE"."""
-        response_text = await _get_ai_response(prompt)
+        response_text = await _get_ai_response(prompt, call_site="challenge_verdict")
         return "NIE" in response_text.upper()
     elif category == 'aktywność':
         prompt = f"""Jesteś trenerem sprawdzającym wykonanie zadania: "{challenge_title}" (Zasady: {challenge_description}). Dziennik aktywności:\n- {logs_str}\nCzy użytkownik WYKONAŁ zadanie? Odpowiedz TYLKO "TAK" lub "NIE"."""
-        response_text = await _get_ai_response(prompt)
+        response_text = await _get_ai_response(prompt, call_site="challenge_verdict")
         return "TAK" in response_text.upper()
     return False
 
@@ -0,0 +1,143 @@
+"""
+Trendy długookresowe (np. 90 lub 365 dni) dla wykresów analizy.
+
+Dane wejściowe to gotowe sumy dzienne (daily_totals) i średnia waga z każdego dnia (GROUP BY w SQL),
+czyli co najwyżej jeden wiersz na dzień. Wszystkie dalsze obliczenia - średnie kroczące, deficyt,
+wygładzanie wagi i uśrednianie do rozmiaru wykresu - to operacje na tablicach NumPy.
+Dni bez żadnych wpisów są traktowane jako brak danych (NaN), a nie jako zero kalorii - tak samo dni
+z samą wodą lub treningiem (bez posiłków), jeśli chodzi o kalorie i makroskładniki.
+"""
+import math
+from datetime import date, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Kolejność kolumn w wierszach z crud_async.get_daily_totals_columns (po dacie; ostatnia to liczba posiłków)
+TOTALS_COLUMNS = ("calories", "protein", "fat", "carbs", "calories_burned")
+# Serie, które mają sens tylko w dniach z zapisanymi posiłkami
+FOOD_COLUMNS = ("calories", "protein", "fat", "carbs")
+
+# Wygładzanie wagi: każdy kolejny dzień zmniejsza wpływ starszego pomiaru o 10%
+WEIGHT_EWMA_ALPHA = 0.1
+
+
+def _day_offsets(dates: Sequence[date], start_date: date) -> np.ndarray:
+    return (np.array(dates, dtype="datetime64[D]") - np.datetime64(start_date, "D")).astype(np.int64)
+
+
+def _dense(offsets: np.ndarray, values: np.ndarray, n_days: int) -> np.ndarray:
+    """Rozkłada wartości na kolejne dni okresu; dni bez wiersza dostają NaN."""
+    out = np.full((n_days,) + values.shape[1:], np.nan)
+    out[offsets] = values
+    return out
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """Średnia krocząca z ostatnich `window` dni, pomijająca dni bez danych."""
+    valid = ~np.isnan(values)
+    sums = np.concatenate(([0.0], np.cumsum(np.where(valid, values, 0.0))))
+    counts = np.concatenate(([0], np.cumsum(valid)))
+    upper = np.arange(1, len(values) + 1)
+    lower = np.maximum(upper - window, 0)
+    window_sums = sums[upper] - sums[lower]
+    window_counts = counts[upper] - counts[lower]
+    return np.divide(window_sums, window_counts, out=np.full(len(values), np.nan), where=window_counts > 0)
+
+
+def bucket_mean(values: np.ndarray, size: int) -> np.ndarray:
+    """Uśrednia kolejne grupy po `size` dni (pomijając NaN), żeby wykres miał rozsądną liczbę punktów."""
+    if size <= 1:
+        return values
+    padded = np.concatenate((values, np.full((-len(values)) % size, np.nan))).reshape(-1, size)
+    valid = ~np.isnan(padded)
+    sums = np.where(valid, padded, 0.0).sum(axis=1)
+    counts = valid.sum(axis=1)
+    return np.divide(sums, counts, out=np.full(len(sums), np.nan), where=counts > 0)
+
+
+def weight_ewma(offsets: np.ndarray, weights: np.ndarray, alpha: float = WEIGHT_EWMA_ALPHA) -> np.ndarray:
+    """
+    Średnia wykładnicza pomiarów wagi z uwzględnieniem odstępów między nimi (w dniach):
+    pomiar sprzed d dni ma wagę (1 - alpha) ** d. Liczona skumulowanymi sumami, bez pętli.
+    """
+    growth = np.power(1.0 - alpha, -(offsets - offsets[0]).astype(float))
+    return np.cumsum(weights * growth) / np.cumsum(growth)
+
+
+def weight_slope_per_week(offsets: np.ndarray, weights: np.ndarray) -> Optional[float]:
+    """Nachylenie prostej dopasowanej do pomiarów (kg/tydzień); None przy mniej niż dwóch dniach z pomiarem."""
+    if len(offsets) < 2:
+        return None
+    slope, _ = np.polyfit(offsets.astype(float), weights, 1)
+    return float(slope) * 7
+
+
+def _to_list(values: np.ndarray, digits: int = 1) -> List[Optional[float]]:
+    return [None if math.isnan(v) else round(v, digits) for v in values.tolist()]
+
+
+def compute_trends(
+    totals_rows: Sequence[Sequence[Any]],
+    weight_rows: Sequence[Sequence[Any]],
+    start_date: date,
+    end_date: date,
+    calorie_goal: int,
+    add_workout_calories_to_goal: bool = False,
+    window: int = 7,
+    max_points: int = 120,
+) -> Dict[str, Any]:
+    """
+    Liczy dane dla TrendsResponse.
+    totals_rows: (data, calories, protein, fat, carbs, calories_burned, meal_count) - po jednym wierszu na dzień,
+    weight_rows: (data, średnia waga z dnia).
+    """
+    n_days = (end_date - start_date).days + 1
+    bucket_days = max(1, math.ceil(n_days / max_points))
+
+    if totals_rows:
+        offsets = _day_offsets([row[0] for row in totals_rows], start_date)
+        values = np.array([row[1:] for row in totals_rows], dtype=float)
+        totals = _dense(offsets, values[:, :len(TOTALS_COLUMNS)], n_days)
+        meal_counts = _dense(offsets, values[:, len(TOTALS_COLUMNS)], n_days)
+    else:
+        totals = np.full((n_days, len(TOTALS_COLUMNS)), np.nan)
+        meal_counts = np.full(n_days, np.nan)
+    series = dict(zip(TOTALS_COLUMNS, totals.T))
+    # Dzień z samą wodą/treningiem ma w daily_totals 0 kcal - to brak danych o jedzeniu, a nie głodówka
+    logged = np.nan_to_num(meal_counts) > 0
+    for name in FOOD_COLUMNS:
+        series[name] = np.where(logged, series[name], np.nan)
+
+    goal = np.full(n_days, float(calorie_goal or 0))
+    if add_workout_calories_to_goal:
+        goal += np.nan_to_num(series["calories_burned"])
+    deficit = goal - series["calories"]
+
+    weights = np.full(n_days, np.nan)
+    ewma = np.full(n_days, np.nan)
+    slope = None
+    if weight_rows:
+        weight_offsets = _day_offsets([row[0] for row in weight_rows], start_date)
+        weight_values = np.array([row[1] for row in weight_rows], dtype=float)
+        weights[weight_offsets] = weight_values
+        ewma[weight_offsets] = weight_ewma(weight_offsets, weight_values)
+        slope = weight_slope_per_week(weight_offsets, weight_values)
+
+    labels = [start_date + timedelta(days=int(offset)) for offset in range(0, n_days, bucket_days)]
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "bucket_days": bucket_days,
+        "labels": labels,
+        **{name: _to_list(bucket_mean(column, bucket_days)) for name, column in series.items()},
+        "calories_rolling_avg": _to_list(bucket_mean(rolling_mean(series["calories"], window), bucket_days)),
+        "calorie_deficit": _to_list(bucket_mean(deficit, bucket_days)),
+        "weight": {
+            "values": _to_list(bucket_mean(weights, bucket_days), 2),
+            "ewma": _to_list(bucket_mean(ewma, bucket_days), 2),
+            "slope_kg_per_week": round(slope, 3) if slope is not None else None,
+        },
+        "logged_days": int(logged.sum()),
+        "avg_calorie_deficit": round(float(deficit[logged].mean()), 1) if logged.any() else None,
+    }
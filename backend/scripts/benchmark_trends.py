@@ -0,0 +1,110 @@
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# 1. Ustawienie ścieżek
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.crud import crud_base as crud
+from app.crud import crud_async
+from app.models.sql_models import User, Meal, MealEntry, WaterEntry, Workout, WeightEntry
+from app.models.enums import MealCategory
+from app.services import trends
+
+# Syntetyczny użytkownik: kilka lat codziennych wpisów (4 posiłki po 3 składniki, woda, treningi, ważenie)
+YEARS = 3
+MEALS_PER_DAY = 4
+ENTRIES_PER_MEAL = 3
+RUNS = 20
+
+def generate_user(engine, end_date: date) -> int:
+    rng = random.Random(42)
+    days = [end_date - timedelta(days=offset) for offset in range(365 * YEARS)]
+    with Session(engine) as db:
+        user = User(email="benchmark@aikcal.local", calorie_goal=2200)
+        db.add(user)
+        db.flush()
+
+        meals = [
+            {"owner_id": user.id, "name": f"Posiłek {n}", "date": day, "category": MealCategory.OBIAD}
+            for day in days for n in range(MEALS_PER_DAY)
+        ]
+        db.execute(insert(Meal), meals)
+        meal_ids = [meal_id for (meal_id,) in db.query(Meal.id).filter(Meal.owner_id == user.id)]
+        db.execute(insert(MealEntry), [
+            {
+                "meal_id": meal_id, "product_name": "Produkt", "calories": rng.uniform(100, 300),
+                "protein": rng.uniform(5, 30), "fat": rng.uniform(2, 20), "carbs": rng.uniform(10, 60),
+                "original_amount": 100, "original_unit": "g", "standardized_grams": 100,
+            }
+            for meal_id in meal_ids for _ in range(ENTRIES_PER_MEAL)
+        ])
+        db.execute(insert(WaterEntry), [{"owner_id": user.id, "date": day, "amount": 2000} for day in days])
+        db.execute(insert(Workout), [
+            {"owner_id": user.id, "date": day, "name": "Bieg", "calories_burned": rng.randint(200, 600)}
+            for day in days if rng.random() < 0.4
+        ])
+        db.execute(insert(WeightEntry), [
+            {"owner_id": user.id, "date": day, "weight": 90 - offset * 0.005 + rng.uniform(-0.5, 0.5)}
+            for offset, day in enumerate(reversed(days)) if rng.random() < 0.8
+        ])
+        crud.refresh_daily_totals(db, user_id=user.id)
+        db.commit()
+        print(f"👤 Wygenerowano {len(days)} dni, {len(meal_ids)} posiłków, {len(meal_ids) * ENTRIES_PER_MEAL} wpisów.")
+        return user.id
+
+async def trends_request(db: AsyncSession, user_id: int, start_date: date, end_date: date):
+    totals_rows = await crud_async.get_daily_totals_columns(db, user_id, start_date, end_date)
+    weight_rows = await crud_async.get_daily_weights(db, user_id, start_date, end_date)
+    return trends.compute_trends(totals_rows, weight_rows, start_date, end_date, calorie_goal=2200)
+
+async def orm_sums(db: AsyncSession, user_id: int, start_date: date, end_date: date):
+    """Dotychczasowe podejście z analizy tygodniowej - dla porównania."""
+    meals = await crud_async.get_meals_by_date_range(db, user_id, start_date, end_date)
+    return sum(e.calories for m in meals for e in m.entries)
+
+async def timed(factory, runs: int) -> float:
+    started = time.perf_counter()
+    for _ in range(runs):
+        await factory()
+    return (time.perf_counter() - started) / runs * 1000
+
+async def run_benchmark(path: str, user_id: int, end_date: date):
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    try:
+        async with AsyncSession(async_engine) as db:
+            for days in (90, 365, 730):
+                start_date = end_date - timedelta(days=days - 1)
+                result = await trends_request(db, user_id, start_date, end_date)
+                vectorized = await timed(lambda: trends_request(db, user_id, start_date, end_date), RUNS)
+                orm = await timed(lambda: orm_sums(db, user_id, start_date, end_date), RUNS)
+                print(
+                    f"📈 {days:>3} dni: trendy {vectorized:7.1f} ms ({len(result['labels'])} punktów, "
+                    f"{result['bucket_days']} dni/punkt) | ORM {orm:7.1f} ms"
+                )
+    finally:
+        await async_engine.dispose()
+
+def benchmark_trends():
+    print("⏱️ Benchmark trendów długookresowych (tymczasowa baza SQLite)...")
+    end_date = date.today()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "benchmark.db")
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(bind=engine)
+        user_id = generate_user(engine, end_date)
+        engine.dispose()
+        asyncio.run(run_benchmark(path, user_id, end_date))
+    print("🚀 Gotowe.")
+
+if __name__ == "__main__":
+    benchmark_trends()
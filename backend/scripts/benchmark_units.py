@@ -0,0 +1,97 @@
+import os
+import random
+import sys
+import timeit
+
+# 1. Ustawienie ścieżek
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core import units
+from app.models.enums import ProductState
+
+# Poprzednia implementacja (lista KNOWN_UNITS + łańcuch warunków) - punkt odniesienia dla pomiaru czasu.
+# Zgodność zachowania ze standardize_unit/standardize_many sprawdzają testy (tests/test_units.py).
+LEGACY_KNOWN_UNITS = [
+    "g", "gram", "gramy",
+    "dag", "dkg", "dekagram",
+    "kg", "kilogram", "kilogramy",
+    "ml", "mililitr", "mililitry",
+    "l", "litr", "litry",
+    "szklanka", "szklanki",
+    "łyżka", "łyżki",
+    "łyżeczka", "łyżeczki",
+    "talerz", "miska", "plaster", "kromka", "garść",
+    "sztuka", "sztuki", "szt.", "szt"
+]
+
+def legacy_standardize_unit(amount, unit, state, average_weight_g=None):
+    unit_lower = str(unit).lower().strip()
+    is_standard_unit = unit_lower in LEGACY_KNOWN_UNITS
+    is_piece_unit = unit_lower in ["sztuka", "sztuki", "szt.", "szt"]
+    if (not is_standard_unit or is_piece_unit) and average_weight_g is not None and average_weight_g > 0:
+        return amount * average_weight_g, "g"
+    if state == ProductState.SOLID:
+        if unit_lower in ["g", "gram", "gramy"]: return amount, "g"
+        if unit_lower in ["dag", "dkg", "dekagram"]: return amount * 10, "g"
+        if unit_lower in ["kg", "kilogram", "kilogramy"]: return amount * 1000, "g"
+        if unit_lower in ["szklanka", "szklanki"]: return amount * 150.0, "g"
+        if unit_lower in ["łyżka", "łyżki"]: return amount * 15.0, "g"
+        if unit_lower in ["łyżeczka", "łyżeczki"]: return amount * 5.0, "g"
+        if unit_lower == "talerz": return amount * 200.0, "g"
+        if unit_lower == "miska": return amount * 180.0, "g"
+        if unit_lower == "plaster": return amount * 20.0, "g"
+        if unit_lower == "kromka": return amount * 35.0, "g"
+        if unit_lower == "garść": return amount * 30.0, "g"
+    elif state == ProductState.LIQUID:
+        if unit_lower in ["ml", "mililitr", "mililitry"]: return amount, "ml"
+        if unit_lower in ["l", "litr", "litry"]: return amount * 1000, "ml"
+        if unit_lower in ["szklanka", "szklanki"]: return amount * 250.0, "ml"
+        if unit_lower in ["łyżka", "łyżki"]: return amount * 15.0, "ml"
+        if unit_lower in ["łyżeczka", "łyżeczki"]: return amount * 5.0, "ml"
+        if unit_lower == "talerz": return amount * 300.0, "ml"
+        if unit_lower == "miska": return amount * 400.0, "ml"
+    raise ValueError(unit)
+
+STATES = [ProductState.SOLID, ProductState.LIQUID, "solid", "liquid"]
+UNKNOWN_UNITS = ["jabłko", "jajka", "porcja", "opakowanie", ""]
+AVERAGE_WEIGHTS = [None, 0, -5, 55.5, 120]
+RUNS = 10_000
+
+def outcome(func, *args):
+    try:
+        return func(*args)
+    except ValueError:
+        return ValueError
+
+def generate_cases(rng: random.Random, count: int):
+    unit_pool = LEGACY_KNOWN_UNITS + UNKNOWN_UNITS
+    cases = []
+    for _ in range(count):
+        unit = rng.choice(unit_pool)
+        unit = rng.choice([unit, unit.upper(), f"  {unit} "])
+        cases.append((round(rng.uniform(0, 500), 2), unit, rng.choice(STATES), rng.choice(AVERAGE_WEIGHTS)))
+    return cases
+
+def benchmark(cases):
+    def run_legacy():
+        for case in cases:
+            outcome(legacy_standardize_unit, *case)
+
+    def run_registry():
+        for case in cases:
+            outcome(units.standardize_unit, *case)
+
+    amounts, unit_names, states, average_weights = zip(*cases)
+
+    def run_batch():
+        units.standardize_many(amounts, unit_names, states, average_weights)
+
+    for label, func in (("poprzednia", run_legacy), ("tablica", run_registry), ("standardize_many", run_batch)):
+        seconds = min(timeit.repeat(func, number=1, repeat=5))
+        print(f"⏱️ {label:>16}: {seconds / len(cases) * 1e6:6.2f} µs/pozycję")
+
+if __name__ == "__main__":
+    rng = random.Random(42)
+    cases = generate_cases(rng, RUNS)
+    benchmark(cases)
+    print("🚀 Gotowe.")
@@ -0,0 +1,66 @@
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 1. Ustawienie ścieżek
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from app.core.database import Base
+from app.crud import crud_base as crud
+from app.models.sql_models import User
+
+# Syntetyczna baza: milion aktywnych profili społecznościowych
+USERS = 1_000_000
+RUNS = 20
+FIRST_NAMES = ["anna", "jan", "piotr", "kasia", "tomasz", "ola", "marek", "ewa", "adam", "magda"]
+LAST_NAMES = ["kowalski", "nowak", "wiśniewski", "wójcik", "kamiński", "lewandowski", "zieliński"]
+DOMAINS = ["gmail.com", "wp.pl", "onet.pl", "o2.pl", "interia.pl"]
+QUERIES = ["ann", "anna.now", "kowal", "nowak12345", "gmail", "wiśniewski", "Zieliń", "brak-takiego"]
+
+def generate_users(engine):
+    rng = random.Random(42)
+    with Session(engine) as db:
+        for start in range(0, USERS, 100_000):
+            rows = [
+                {
+                    "email": f"{rng.choice(FIRST_NAMES)}.{rng.choice(LAST_NAMES)}{n}@{rng.choice(DOMAINS)}",
+                    "name": f"{rng.choice(FIRST_NAMES).title()} {rng.choice(LAST_NAMES).title()}",
+                    "is_social_profile_active": True,
+                }
+                for n in range(start, start + 100_000)
+            ]
+            # Wstawianie przez Core omija zdarzenia ORM - kolumny wyszukiwania uzupełniamy sami
+            for row in rows:
+                row.update(search_email=row["email"].lower(), search_name=row["name"].lower())
+            db.execute(insert(User), rows)
+        db.commit()
+    print(f"👤 Wygenerowano {USERS} użytkowników.")
+
+def benchmark_user_search():
+    print("⏱️ Benchmark wyszukiwarki użytkowników (tymczasowa baza SQLite)...")
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'benchmark.db')}")
+        Base.metadata.create_all(bind=engine)
+        with Session(engine) as db:
+            crud.ensure_user_search_index(db)
+        generate_users(engine)
+
+        with Session(engine) as db:
+            for query in QUERIES:
+                found = crud.search_users_with_friendship(db, query=query, current_user_id=1)
+                started = time.perf_counter()
+                for _ in range(RUNS):
+                    crud.search_users_with_friendship(db, query=query, current_user_id=1)
+                elapsed = (time.perf_counter() - started) / RUNS * 1000
+                first = found[0][0].email if found else "-"
+                print(f"🔎 {query!r:>16}: {elapsed:6.2f} ms ({len(found)} wyników, pierwszy: {first})")
+        engine.dispose()
+    print("🚀 Gotowe.")
+
+if __name__ == "__main__":
+    benchmark_user_search()
@@ -0,0 +1,26 @@
+import os
+import sys
+
+# 1. Ustawienie ścieżek
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.database import SessionLocal, engine
+from app.crud import crud_base as crud
+from app.models.sql_models import DailyTotals
+
+def rebuild_daily_totals():
+    print("🧮 Przeliczanie sum dziennych (kalorie, makro, woda, treningi) z surowych wpisów...")
+
+    # Starsze bazy mogą jeszcze nie mieć tabeli
+    DailyTotals.__table__.create(engine, checkfirst=True)
+
+    db = SessionLocal()
+    try:
+        count = crud.refresh_daily_totals(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"🚀 Sukces! Zapisano sumy dla {count} dni.")
+
+if __name__ == "__main__":
+    rebuild_daily_totals()
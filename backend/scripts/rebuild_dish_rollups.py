@@ -0,0 +1,23 @@
+import os
+import sys
+
+# 1. Ustawienie ścieżek
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.database import SessionLocal
+from app.crud import crud_base as crud
+
+def rebuild_dish_rollups():
+    # Kolumny podsumowań dodaje migracja 0010 (alembic upgrade head) - tu tylko je wypełniamy
+    print("🧮 Przeliczanie podsumowań dań (waga przepisu, stan, makro na 100g)...")
+
+    db = SessionLocal()
+    try:
+        count = crud.refresh_dish_rollups(db)
+        db.commit()
+    finally:
+        db.close()
+    print(f"🚀 Sukces! Przeliczono {count} dań.")
+
+if __name__ == "__main__":
+    rebuild_dish_rollups()
@@ -12,6 +12,7 @@ from app.core.database import SessionLocal, engine, Base
 from app.models.sql_models import Product, Dish, DishIngredient
 # Musimy zaimportować Enum, bo model Product go używa
 from app.models.enums import ProductState
+from app.crud import crud_base as crud
 
 DATA_FILENAME = "enriched_master_data.json"
 
@@ -127,6 +128,11 @@ def seed_database():
         count_dishes += 1
 
     db.commit()
+
+    # --- FAZA 3: PODSUMOWANIA DAŃ (waga przepisu, stan, makro na 100g) ---
+    print("🧮 Przeliczanie podsumowań dań...")
+    crud.refresh_dish_rollups(db)
+    db.commit()
     db.close()
     print(f"🚀 Sukces! Baza zasilona: {len(products_cache)} produktów, {count_dishes} dań.")
 
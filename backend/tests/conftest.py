@@ -0,0 +1,78 @@
+"""
+Wspólne fikstury testów: baza SQLite w pamięci ze schematem z modeli (zamiast pliku /app/app/sql_app.db),
+a dla kodu asynchronicznego (aiosqlite otwiera własne połączenia) - baza w pliku tymczasowym.
+"""
+import os
+from types import SimpleNamespace
+
+# Ustawienia wymagane przez app.core.config - testy nie łączą się z Gemini
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("SECRET_KEY", "test")
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
+
+from app.core.database import Base
+from app.models import sql_models as models
+
+
+@pytest.fixture
+def engine():
+    # StaticPool - jedno połączenie, więc wszystkie sesje testu widzą tę samą bazę w pamięci
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(autocommit=False, autoflush=False, bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def statements(engine):
+    """Lista zapytań SQL wykonanych na bazie testu (licznik do testów liczby zapytań)."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(engine, "before_cursor_execute", record)
+
+
+@pytest.fixture
+def make_user(db):
+    def make(email: str = "jan@example.com", **fields) -> models.User:
+        user = models.User(email=email, hashed_password="x", **fields)
+        db.add(user)
+        db.commit()
+        return user
+    return make
+
+
+@pytest.fixture
+def file_sessions(tmp_path):
+    """
+    Fabryki sesji na wspólnym pliku bazy, nazwane jak w app.core.database (do podmiany przez monkeypatch):
+    SessionLocal do przygotowania danych i sprawdzeń, AsyncSessionLocal dla testowanego kodu.
+    """
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    # NullPool - żadne połączenie nie przeżywa pętli zdarzeń testu (każdy test ma własne asyncio.run)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    yield SimpleNamespace(
+        SessionLocal=sessionmaker(autocommit=False, autoflush=False, bind=engine),
+        AsyncSessionLocal=async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False),
+    )
+    engine.dispose()
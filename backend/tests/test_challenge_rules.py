@@ -0,0 +1,164 @@
+import asyncio
+from datetime import date, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.crud import crud_async
+from app.models import sql_models as models
+from app.models.enums import MealCategory
+from app.services.challenge_rules import Condition, Rule, condition_holds, evaluate_rules
+
+START = date(2026, 10, 1)
+DAYS = [START + timedelta(days=n) for n in range(7)]
+
+
+@pytest.fixture
+def log_meals(file_sessions):
+    """Zapisuje posiłki użytkownika: {dzień: [kalorie wpisów]} - pusta lista to posiłek bez wpisów."""
+    def log(user_id: int, meals_by_day: dict) -> None:
+        with file_sessions.SessionLocal() as db:
+            for day, entries in meals_by_day.items():
+                meal = models.Meal(name="posiłek", date=day, category=MealCategory.OBIAD, owner_id=user_id)
+                for calories in entries:
+                    meal.entries.append(models.MealEntry(
+                        product_name="danie", calories=calories, protein=10, fat=5, carbs=20,
+                        original_amount=1, original_unit="porcja", standardized_grams=200,
+                    ))
+                db.add(meal)
+            db.commit()
+    return log
+
+
+@pytest.fixture
+def add_user(file_sessions):
+    def add(email: str = "jan@example.com", **fields) -> int:
+        with file_sessions.SessionLocal() as db:
+            user = models.User(email=email, hashed_password="x")
+            db.add(user)
+            db.flush()
+            # Po wstawieniu - None w konstruktorze zastąpiłaby domyślna wartość kolumny (np. calorie_goal=2000)
+            for name, value in fields.items():
+                setattr(user, name, value)
+            db.commit()
+            return user.id
+    return add
+
+
+def _daily_sums(file_sessions, metric: str, user_ids) -> list:
+    async def fetch():
+        async with file_sessions.AsyncSessionLocal() as db:
+            return await crud_async.get_daily_sums_for_users(
+                db, source="meals", metric=metric, user_ids=user_ids, start_date=DAYS[0], end_date=DAYS[-1]
+            )
+    return sorted(asyncio.run(fetch()))
+
+
+def test_meal_count_skips_meals_without_entries(file_sessions, add_user, log_meals):
+    user_id = add_user()
+    log_meals(user_id, {DAYS[0]: [300, 200]})
+    log_meals(user_id, {DAYS[0]: [], DAYS[1]: []})
+
+    # Tak samo jak daily_totals.meal_count - pusty posiłek to nie zapisany posiłek
+    assert _daily_sums(file_sessions, "count", {user_id}) == [(user_id, DAYS[0], 1)]
+    assert _daily_sums(file_sessions, "calories", {user_id}) == [(user_id, DAYS[0], 500)]
+
+
+@pytest.mark.parametrize("condition, daily, expected", [
+    # Każdy dzień w przedziale; dzień bez wpisów ma sumę 0
+    (Condition("meals", "protein", minimum=20), {day: 25 for day in DAYS}, True),
+    (Condition("meals", "protein", minimum=20), {day: 25 for day in DAYS[1:]}, False),
+    (Condition("meals", "calories", maximum=2000), {day: 2100 if day == DAYS[3] else 1800 for day in DAYS}, False),
+    (Condition("meals", "calories", minimum=1, maximum=2000), {day: 1800 for day in DAYS}, True),
+    # min_days - wystarczy tyle dni spełniających warunek
+    (Condition("workouts", "count", minimum=1, min_days=3), {DAYS[0]: 1, DAYS[2]: 2, DAYS[6]: 1}, True),
+    (Condition("workouts", "count", minimum=1, min_days=3), {DAYS[0]: 1, DAYS[2]: 2}, False),
+    # Suma z całego okresu
+    (Condition("workouts", "count", minimum=3, per_day=False), {DAYS[0]: 1, DAYS[4]: 2}, True),
+    (Condition("water", "amount", maximum=10000, per_day=False), {day: 1500 for day in DAYS}, False),
+])
+def test_condition_holds(condition, daily, expected):
+    assert condition_holds(condition, daily, DAYS, duration_days=len(DAYS), goals={}) is expected
+
+
+@pytest.mark.parametrize("goals, expected", [
+    ({"calorie_goal": 2000}, True),
+    ({"calorie_goal": 1500}, False),
+    ({"calorie_goal": None}, False),
+    ({}, False),
+])
+def test_condition_holds_with_profile_goal(goals, expected):
+    condition = Condition("meals", "calories", maximum="calorie_goal")
+    assert condition_holds(condition, {day: 1800 for day in DAYS}, DAYS, duration_days=len(DAYS), goals=goals) is expected
+
+
+def test_missing_goal_fails_total_condition():
+    condition = Condition("water", "amount", minimum="water_goal", per_day=False)
+    assert not condition_holds(condition, {DAYS[0]: 99999}, DAYS, duration_days=len(DAYS), goals={"water_goal": None})
+
+
+def _claimed(row_id: int, user_id: int, challenge_id: int = 1) -> SimpleNamespace:
+    """Wiersz w kształcie wyniku crud_async.claim_challenges_to_verify."""
+    return SimpleNamespace(id=row_id, user_id=user_id, challenge_id=challenge_id, start_date=DAYS[0], end_date=DAYS[-1])
+
+
+def _evaluate(file_sessions, claimed, challenges) -> dict:
+    async def evaluate():
+        async with file_sessions.AsyncSessionLocal() as db:
+            return await evaluate_rules(db, claimed, challenges)
+    return asyncio.run(evaluate())
+
+
+def _challenge(rule: Rule) -> dict:
+    return {"title": "test", "description": "", "category": "dieta", "duration_days": len(DAYS), "rule": rule}
+
+
+def test_evaluate_rules_per_day_with_goal(file_sessions, add_user, log_meals):
+    on_target = add_user("a@example.com", calorie_goal=2000)
+    over_goal = add_user("b@example.com", calorie_goal=2000)
+    no_goal = add_user("c@example.com", calorie_goal=None)
+    skipped_day = add_user("d@example.com", calorie_goal=2000)
+    for user_id in (on_target, no_goal):
+        log_meals(user_id, {day: [1500] for day in DAYS})
+    log_meals(over_goal, {day: [2500 if day == DAYS[2] else 1500] for day in DAYS})
+    # Jeden dzień tylko z pustym posiłkiem - nie liczy się jako zapisany
+    log_meals(skipped_day, {day: [1500] for day in DAYS if day != DAYS[4]})
+    log_meals(skipped_day, {DAYS[4]: []})
+    rule = Rule((Condition("meals", "count", minimum=1), Condition("meals", "calories", maximum="calorie_goal")))
+
+    verdicts = _evaluate(
+        file_sessions, [_claimed(n, user_id) for n, user_id in enumerate((on_target, over_goal, no_goal, skipped_day))],
+        {1: _challenge(rule)},
+    )
+
+    assert verdicts == {0: True, 1: False, 2: False, 3: False}
+
+
+def test_evaluate_rules_total_and_min_days(file_sessions, add_user, log_meals):
+    user_id = add_user()
+    log_meals(user_id, {DAYS[0]: [800, 400], DAYS[3]: [900], DAYS[5]: [1000]})
+    challenges = {
+        1: _challenge(Rule((Condition("meals", "calories", minimum=3000, per_day=False),))),
+        2: _challenge(Rule((Condition("meals", "calories", minimum=3500, per_day=False),))),
+        3: _challenge(Rule((Condition("meals", "calories", minimum=900, min_days=3),))),
+        4: _challenge(Rule((Condition("meals", "calories", minimum=1000, min_days=3),))),
+    }
+
+    verdicts = _evaluate(file_sessions, [_claimed(n, user_id, n) for n in challenges], challenges)
+
+    assert verdicts == {1: True, 2: False, 3: True, 4: False}
+
+
+def test_evaluate_rules_leaves_non_decisive_passes_to_ai(file_sessions, add_user, log_meals):
+    user_id = add_user()
+    log_meals(user_id, {DAYS[0]: [500]})
+    challenges = {
+        1: _challenge(Rule((Condition("meals", "count", minimum=1, per_day=False),), decisive=False)),
+        2: _challenge(Rule((Condition("meals", "count", minimum=2, per_day=False),), decisive=False)),
+        3: _challenge(None),
+    }
+
+    verdicts = _evaluate(file_sessions, [_claimed(n, user_id, n) for n in challenges], challenges)
+
+    # Spełniony warunek konieczny i wyzwanie bez reguły - ocenia AI; niespełniony - porażka od razu
+    assert verdicts == {2: False}
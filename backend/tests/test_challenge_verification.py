@@ -0,0 +1,103 @@
+import asyncio
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from app.crud import crud_async
+from app.models import sql_models as models
+from app.models.enums import ChallengeStatus
+from app.services import challenge_verification, challenges_service
+
+LEASE_MINUTES = 30
+UNKNOWN_CHALLENGE_ID = 99999
+
+
+@pytest.fixture
+def add_challenges(file_sessions):
+    """Dodaje zakończone, aktywne wyzwania użytkownika i zwraca ich id (w kolejności argumentów)."""
+    with file_sessions.SessionLocal() as db:
+        user = models.User(email="jan@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+        user_id = user.id
+
+    def add(*specs) -> list:
+        """specs: (challenge_id, verification_claimed_at)."""
+        with file_sessions.SessionLocal() as db:
+            rows = [
+                models.UserChallenge(
+                    user_id=user_id, challenge_id=challenge_id, start_date=date.today() - timedelta(days=8),
+                    end_date=date.today() - timedelta(days=1), verification_claimed_at=claimed_at,
+                )
+                for challenge_id, claimed_at in specs
+            ]
+            db.add_all(rows)
+            db.commit()
+            return [row.id for row in rows]
+    return add
+
+
+def _rows(file_sessions) -> dict:
+    with file_sessions.SessionLocal() as db:
+        return {row.id: row for row in db.query(models.UserChallenge).all()}
+
+
+def test_concurrent_claimers_never_get_the_same_row(file_sessions, add_challenges):
+    ids = add_challenges(*[(1, None)] * 10)
+
+    async def claim():
+        async with file_sessions.AsyncSessionLocal() as db:
+            return await crud_async.claim_challenges_to_verify(db, limit=6, lease_minutes=LEASE_MINUTES)
+
+    async def claim_twice():
+        return await asyncio.gather(claim(), claim())
+
+    first, second = asyncio.run(claim_twice())
+    first_ids, second_ids = {row.id for row in first}, {row.id for row in second}
+
+    assert not first_ids & second_ids
+    assert first_ids | second_ids == set(ids)
+    assert all(row.verification_claimed_at is not None for row in _rows(file_sessions).values())
+
+
+def test_only_expired_leases_are_claimed_again(file_sessions, add_challenges):
+    now = datetime.utcnow()
+    fresh, expired, free = add_challenges(
+        (1, now - timedelta(minutes=LEASE_MINUTES - 5)),
+        (1, now - timedelta(minutes=LEASE_MINUTES + 1)),
+        (1, None),
+    )
+
+    async def claim():
+        async with file_sessions.AsyncSessionLocal() as db:
+            return await crud_async.claim_challenges_to_verify(db, limit=10, lease_minutes=LEASE_MINUTES)
+
+    assert {row.id for row in asyncio.run(claim())} == {expired, free}
+    # Świeżo przejęte wiersze mają już ważną dzierżawę
+    assert asyncio.run(claim()) == []
+    assert _rows(file_sessions)[expired].verification_claimed_at > now - timedelta(minutes=1)
+
+
+def test_rows_without_verdict_release_their_lease(file_sessions, add_challenges, monkeypatch):
+    failing_title = challenges_service.get_challenge_by_id(1)["title"]
+    skipped, errored, verified = add_challenges((UNKNOWN_CHALLENGE_ID, None), (1, None), (2, None))
+
+    async def fake_verdict(challenge_title, **kwargs):
+        if challenge_title == failing_title:
+            raise RuntimeError("AI niedostępne")
+        return True
+
+    monkeypatch.setattr(challenge_verification, "AsyncSessionLocal", file_sessions.AsyncSessionLocal)
+    monkeypatch.setattr(challenge_verification.ai_analyzer, "verify_challenge_completion", fake_verdict)
+
+    stats = asyncio.run(challenge_verification.verify_ended_challenges())
+
+    # Zwolnione dopiero na końcu przebiegu - ta sama pętla nie przejmuje ich ponownie
+    assert stats["batches"] == 1
+    assert (stats["skipped"], stats["errors"], stats["completed"]) == (1, 1, 1)
+    rows = _rows(file_sessions)
+    for row_id in (skipped, errored):
+        assert rows[row_id].status == ChallengeStatus.ACTIVE
+        assert rows[row_id].verification_claimed_at is None
+    assert rows[verified].status == ChallengeStatus.COMPLETED
+    assert rows[verified].verification_claimed_at is None
@@ -0,0 +1,136 @@
+import asyncio
+import json
+
+import pytest
+from sqlalchemy import select
+
+from app.api.v1.endpoints import chat
+from app.models import sql_models as models
+
+
+class SessionSpy:
+    """Opakowuje fabrykę sesji asynchronicznych i liczy sesje otwarte oraz jeszcze niezamknięte."""
+
+    def __init__(self, factory):
+        self.factory = factory
+        self.opened = 0
+        self.open_now = 0
+
+    def __call__(self):
+        spy = self
+        session = self.factory()
+
+        class Tracked:
+            async def __aenter__(self):
+                spy.opened += 1
+                spy.open_now += 1
+                return await session.__aenter__()
+
+            async def __aexit__(self, *exc):
+                spy.open_now -= 1
+                return await session.__aexit__(*exc)
+
+        return Tracked()
+
+
+@pytest.fixture
+def conversation(file_sessions):
+    with file_sessions.SessionLocal() as db:
+        user = models.User(email="jan@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        conversation = models.Conversation(user_id=user.id, title="Czat")
+        db.add(conversation)
+        db.commit()
+        return conversation.id, user.id
+
+
+@pytest.fixture
+def sessions(monkeypatch, file_sessions):
+    spy = SessionSpy(file_sessions.AsyncSessionLocal)
+    monkeypatch.setattr(chat, "AsyncSessionLocal", spy)
+    return spy
+
+
+def fake_stream(monkeypatch, parts, error=None):
+    """Podmienia strumień odpowiedzi AI; zwraca stan (czy strumień został domknięty)."""
+    state = {"closed": False}
+
+    async def stream(history):
+        try:
+            for part in parts:
+                await asyncio.sleep(0)
+                yield part
+            if error:
+                raise error
+        finally:
+            state["closed"] = True
+
+    monkeypatch.setattr(chat.ai_analyzer, "stream_chat_response", stream)
+    return state
+
+
+def parse(events):
+    parsed = []
+    for raw in events:
+        lines = raw.strip().split("\n")
+        name = lines[0][len("event: "):] if lines[0].startswith("event: ") else None
+        parsed.append((name, json.loads(lines[-1][len("data: "):])))
+    return parsed
+
+
+def ai_messages(file_sessions, conversation_id):
+    with file_sessions.SessionLocal() as db:
+        return db.scalars(select(models.ChatMessage.content).filter(
+            models.ChatMessage.conversation_id == conversation_id, models.ChatMessage.role == "ai"
+        )).all()
+
+
+async def collect(stream):
+    return [event async for event in stream]
+
+
+def test_reply_is_saved_once_after_the_stream_ends(monkeypatch, file_sessions, sessions, conversation):
+    conversation_id, user_id = conversation
+    fake_stream(monkeypatch, ["Cześć", ", jak ", "mogę pomóc?"])
+
+    events = parse(asyncio.run(collect(chat._relay_chat_stream([], conversation_id, user_id))))
+
+    assert [data["delta"] for name, data in events[:-1]] == ["Cześć", ", jak ", "mogę pomóc?"]
+    name, done = events[-1]
+    assert name == "done" and done["content"] == "Cześć, jak mogę pomóc?" and done["role"] == "ai"
+    assert ai_messages(file_sessions, conversation_id) == ["Cześć, jak mogę pomóc?"]
+    assert sessions.opened == 1 and sessions.open_now == 0
+
+
+def test_ai_error_mid_stream_sends_error_event_and_saves_nothing(monkeypatch, file_sessions, sessions, conversation):
+    conversation_id, user_id = conversation
+    fake_stream(monkeypatch, ["Zaczynam"], error=RuntimeError("przerwane połączenie z modelem"))
+
+    events = parse(asyncio.run(collect(chat._relay_chat_stream([], conversation_id, user_id))))
+
+    assert events[0] == (None, {"delta": "Zaczynam"})
+    assert events[-1][0] == "error"
+    assert not [name for name, _ in events if name == "done"]
+    assert ai_messages(file_sessions, conversation_id) == []
+    assert sessions.opened == 0
+
+
+def test_client_disconnect_saves_no_partial_reply(monkeypatch, file_sessions, sessions, conversation):
+    conversation_id, user_id = conversation
+    state = fake_stream(monkeypatch, ["Pierwszy fragment", "drugi", "trzeci"])
+
+    async def disconnect_after_first_event():
+        stream = chat._relay_chat_stream([], conversation_id, user_id)
+        first = await stream.__anext__()
+        # Tak Starlette kończy odpowiedź po rozłączeniu klienta - generator jest zamykany w miejscu yield
+        await stream.aclose()
+        return first, state["closed"]
+
+    first, upstream_closed = asyncio.run(disconnect_after_first_event())
+
+    assert parse([first]) == [(None, {"delta": "Pierwszy fragment"})]
+    assert ai_messages(file_sessions, conversation_id) == []
+    assert sessions.opened == 0 and sessions.open_now == 0
+    # Strumień od modelu jest zamykany od razu, a nie dopiero przy sprzątaniu pętli zdarzeń
+    assert upstream_closed
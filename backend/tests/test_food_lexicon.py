@@ -0,0 +1,93 @@
+import pytest
+
+from app.core.morphology import exact_key, name_key
+from app.models import sql_models as models
+from app.models.enums import ProductState
+from app.services import legacy_analyzer
+from app.services.food_lexicon import FoodLexicon
+
+
+def nutrients(calories):
+    return {"calories": calories, "protein": 1.0, "fat": 1.0, "carbs": 1.0}
+
+
+@pytest.fixture
+def lexicon(db):
+    db.add_all([
+        models.Product(name="mak", nutrients=nutrients(525), aliases=["mak niebieski"]),
+        models.Product(name="mąka", nutrients=nutrients(364), aliases=["mąka pszenna"]),
+        models.Product(name="sól", nutrients=nutrients(0)),
+        models.Product(name="sola", nutrients=nutrients(91), aliases=["sola filet"]),
+        models.Product(name="jajko", nutrients=nutrients(155), average_weight_g=50, aliases=["jajo"]),
+        models.Product(name="mleko", nutrients=nutrients(64), state=ProductState.LIQUID, aliases=["jogurt naturalny"]),
+        models.Product(name="jogurt", nutrients=nutrients(61)),
+        # Ta sama żywność zapisana dwa razy (jak w danych startowych)
+        models.Product(name="ogórek kiszony", nutrients=nutrients(11)),
+        models.Product(name="ogórki kiszone", nutrients=nutrients(11)),
+    ])
+    db.commit()
+    lexicon = FoodLexicon()
+    lexicon.load(db)
+    return lexicon
+
+
+def test_stemming_alone_cannot_tell_these_products_apart():
+    assert name_key("mąka") == name_key("mak")
+    assert name_key("sól") == name_key("sola")
+    assert exact_key("mąka") != exact_key("mak")
+
+
+@pytest.mark.parametrize("query, product", [
+    ("mak", "mak"), ("Mąka", "mąka"), ("MAKA", "mąka"), ("sól", "sól"), ("sol", "sól"), ("sola", "sola"),
+])
+def test_exact_name_wins_over_shared_stem(lexicon, query, product):
+    assert lexicon.lookup_product(query).name == product
+    assert lexicon.match(query).entry.name == product
+
+
+def test_mak_and_maka_resolve_to_different_products(lexicon):
+    mak, maka = lexicon.lookup_product("mak"), lexicon.lookup_product("mąka")
+    assert mak.id != maka.id
+    assert (mak.nutrients["calories"], maka.nutrients["calories"]) == (525, 364)
+
+
+def test_shared_stem_is_not_resolved_to_either_product(lexicon):
+    # "mąki" to po stemmingu "mak" - tak samo jak "mak"; nie zgadujemy, który to produkt
+    assert lexicon.lookup_product("mąki") is None
+    assert lexicon.lookup_product("soli") is None
+
+
+def test_unambiguous_stem_still_matches_inflected_forms(lexicon):
+    assert lexicon.lookup_product("jajka").name == "jajko"
+    assert lexicon.lookup_product("jajek").name == "jajko"
+    assert lexicon.match("mleka").entry.name == "mleko"
+
+
+def test_shared_stem_of_the_same_food_still_resolves(lexicon):
+    assert lexicon.lookup_product("ogórki kiszone").name == "ogórki kiszone"
+    assert lexicon.lookup_product("ogórków kiszonych").name == "ogórek kiszony"
+
+
+def test_aliases_resolve_exactly_and_names_win_over_other_aliases(lexicon):
+    assert lexicon.lookup_product("mąka pszenna").name == "mąka"
+    assert lexicon.lookup_product("jajo").name == "jajko"
+    assert lexicon.lookup_product("jogurt").name == "jogurt"
+    assert lexicon.lookup_product("jogurt naturalny").name == "mleko"
+
+
+def test_product_added_later_with_a_shared_stem_keeps_both_exact(lexicon):
+    lexicon.add_product(models.Product(id=100, name="jajka", nutrients=nutrients(143), aliases=[]))
+    assert lexicon.lookup_product("jajko").nutrients["calories"] == 155
+    assert lexicon.lookup_product("jajka").nutrients["calories"] == 143
+    assert lexicon.lookup_product("jajek") is None
+    # Ponowne dopisanie tego samego produktu (np. po nauce) nie jest kolizją
+    lexicon.add_product(models.Product(id=100, name="jajka", nutrients=nutrients(143), aliases=["jajka kurze"]))
+    assert lexicon.lookup_product("jajka kurze").id == 100
+
+
+def test_recipe_ingredients_link_to_the_exact_product(lexicon, monkeypatch):
+    monkeypatch.setattr(legacy_analyzer, "food_lexicon", lexicon)
+    assert legacy_analyzer._known_product_name("Mąka") == "mąka"
+    assert legacy_analyzer._known_product_name("mak") == "mak"
+    # Niejednoznaczna odmiana zostaje nazwą składnika (symbol zastępczy), zamiast wskazać zły produkt
+    assert legacy_analyzer._known_product_name("mąki") == "mąki"
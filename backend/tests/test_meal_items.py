@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from app.models import sql_models as models
+from app.models.enums import ProductState
+from app.services import legacy_analyzer
+from app.services.food_lexicon import FoodLexicon
+
+
+@pytest.mark.parametrize("text, parts", [
+    ("2 jajka, kromka chleba i kawa z mlekiem", ["2 jajka", "kromka chleba", "kawa z mlekiem"]),
+    ("owsianka; banan + 200 ml mleka oraz łyżka miodu", ["owsianka", "banan", "200 ml mleka", "łyżka miodu"]),
+    ("ryż\nkurczak plus surówka a także woda", ["ryż", "kurczak", "surówka", "woda"]),
+    ("kawa z mlekiem", ["kawa z mlekiem"]),
+    ("makaron ze szpinakiem, , ", ["makaron ze szpinakiem"]),
+    ("", []),
+])
+def test_split_meal_text(text, parts):
+    assert legacy_analyzer.split_meal_text(text) == parts
+
+
+@pytest.mark.parametrize("text, quantity, unit, name", [
+    ("2 jajka", 2.0, "szt.", "jajka"),
+    ("2 jajka na twardo", 2.0, "szt.", "jajka na twardo"),
+    ("kromka chleba", 1.0, "kromka", "chleba"),
+    ("200 ml mleka", 200.0, "ml", "mleka"),
+    ("150g ryżu", 150.0, "g", "ryżu"),
+    ("1,5 szklanki Kawy z  mlekiem", 1.5, "szklanki", "kawy z mlekiem"),
+    ("kawa z mlekiem", 1.0, "szt.", "kawa z mlekiem"),
+    ("3 szt. pomidora", 3.0, "szt.", "pomidora"),
+])
+def test_parse_text_item(text, quantity, unit, name):
+    parsed = legacy_analyzer._parse_text_item(text)
+    assert (parsed["quantity"], parsed["unit"], parsed["name"]) == (quantity, unit, name)
+
+
+PRODUCTS = [
+    # nazwa, kcal/100g, stan, średnia waga sztuki
+    ("jajko", 155, ProductState.SOLID, 50),
+    ("chleb", 250, ProductState.SOLID, None),
+    ("kawa z mlekiem", 40, ProductState.LIQUID, 250),
+    ("pomidor", 18, ProductState.SOLID, None),
+]
+
+
+@pytest.fixture
+def lexicon(monkeypatch):
+    """Leksykon z kilkoma produktami; nauka nowych produktów jest wyłączona (rejestrujemy tylko, o co by pytała)."""
+    lexicon = FoodLexicon()
+    for product_id, (name, calories, state, weight) in enumerate(PRODUCTS, start=1):
+        lexicon.add_product(models.Product(
+            id=product_id, name=name, aliases=[], state=state, average_weight_g=weight,
+            nutrients={"calories": calories, "protein": 1.0, "fat": 1.0, "carbs": 1.0},
+        ))
+    learning_requests = []
+
+    async def learn_nothing(names):
+        learning_requests.append(list(names))
+
+    monkeypatch.setattr(legacy_analyzer, "food_lexicon", lexicon)
+    monkeypatch.setattr(legacy_analyzer, "_refresh_lexicon", lambda force=False: None)
+    monkeypatch.setattr(legacy_analyzer, "_learn_missing_ingredients", learn_nothing)
+    return learning_requests
+
+
+def test_analyze_meal_items_scales_each_item_and_sums_the_meal(lexicon):
+    result = asyncio.run(legacy_analyzer.analyze_meal_items("2 jajka, kromka chleba i kawa z mlekiem"))
+
+    items = {item["text"]: item for item in result["items"]}
+    assert [item["error"] for item in result["items"]] == [None, None, None]
+    assert items["2 jajka"]["result"]["aggregated_meal"]["quantity_grams"] == 100
+    assert items["2 jajka"]["result"]["aggregated_meal"]["calories"] == 155
+    assert items["kromka chleba"]["result"]["aggregated_meal"]["quantity_grams"] == 35
+    assert items["kawa z mlekiem"]["result"]["aggregated_meal"]["quantity_grams"] == 250
+    assert result["aggregated_meal"]["quantity_grams"] == 385
+    assert result["aggregated_meal"]["calories"] == 155 + round(250 * 0.35) + 100
+    assert lexicon == []
+
+
+def test_failed_item_does_not_abort_the_meal(lexicon):
+    # Pomidor nie ma średniej wagi sztuki (ValueError przy przeliczaniu), a kwiatów lotosu nie zna leksykon
+    result = asyncio.run(legacy_analyzer.analyze_meal_items("2 jajka, 3 pomidory i garść kwiatów lotosu"))
+
+    errors = {item["text"]: item["error"] for item in result["items"]}
+    assert errors["2 jajka"] is None
+    assert "average_weight_g" in errors["3 pomidory"]
+    assert errors["garść kwiatów lotosu"] == "Nie udało się rozpoznać produktu."
+    assert lexicon == [["kwiatów lotosu"]]
+    assert result["aggregated_meal"]["name"] == "jajko"
+    assert result["aggregated_meal"]["calories"] == 155
+
+
+def test_meal_without_any_item_is_rejected(lexicon):
+    with pytest.raises(ValueError):
+        asyncio.run(legacy_analyzer.analyze_meal_items(" , ; "))
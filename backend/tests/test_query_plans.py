@@ -0,0 +1,76 @@
+"""
+Gorące zapytania mają trafiać w indeksy: EXPLAIN QUERY PLAN dla zapytań, które faktycznie wysyła crud,
+nie może zawierać pełnego przeszukania tabeli (SCAN).
+"""
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+
+from app.crud import crud_base as crud
+from app.models import sql_models as models
+from app.models.enums import MealCategory
+
+DAY = date(2026, 10, 17)
+
+
+@pytest.fixture
+def plans(engine):
+    """Wywołuje funkcję crud i zwraca plany (listy opisów kroków) wszystkich wysłanych przez nią zapytań."""
+    def explain(call):
+        captured = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            captured.append((statement, parameters))
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            call()
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+        with engine.connect() as conn:
+            return [
+                [row[-1] for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()]
+                for statement, parameters in captured
+            ]
+    return explain
+
+
+def assert_indexed(plans):
+    assert plans
+    for plan in plans:
+        assert not [step for step in plan if step.startswith("SCAN")], plan
+        assert [step for step in plan if "USING INDEX" in step or "USING COVERING INDEX" in step
+                or "USING INTEGER PRIMARY KEY" in step], plan
+
+
+@pytest.mark.parametrize("read_day", [crud.get_meals_by_date, crud.get_water_entries_by_date, crud.get_workouts_by_date])
+def test_per_day_reads_use_owner_date_index(db, plans, read_day):
+    found = plans(lambda: read_day(db, user_id=1, target_date=DAY))
+    assert_indexed(found)
+    assert "ix_" in found[0][0] and "_owner_id_date" in found[0][0]
+
+
+def test_meal_entries_are_loaded_by_meal_id_index(db, make_user, plans):
+    user = make_user()
+    meal = models.Meal(name="obiad", date=DAY, category=list(MealCategory)[0], owner_id=user.id)
+    meal.entries.append(models.MealEntry(product_name="zupa", original_amount=1, original_unit="porcja", standardized_grams=300))
+    db.add(meal)
+    db.commit()
+    user_id = user.id
+    db.expire_all()
+
+    found = plans(lambda: crud.get_meals_by_date(db, user_id=user_id, target_date=DAY))
+    assert len(found) == 2
+    assert_indexed(found)
+    assert any("ix_meal_entries_meal_id" in step for step in found[1])
+
+
+def test_friendship_reads_use_pair_and_side_indexes(db, plans):
+    assert_indexed(plans(lambda: crud.get_friendship(db, user_id=7, friend_id=3)))
+    assert_indexed(plans(lambda: crud.get_friend_requests(db, user_id=7)))
+    # Użytkownik spoza pamięci podręcznej znajomych - zapytanie musi faktycznie trafić do bazy
+    found = plans(lambda: crud.get_friend_ids(db, user_id=987654))
+    assert_indexed(found)
+    steps = " ".join(found[0])
+    assert "ix_friendships_user_id_status" in steps and "ix_friendships_friend_id_status" in steps
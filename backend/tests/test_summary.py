@@ -0,0 +1,53 @@
+from datetime import date
+
+from app.api.v1.endpoints.summary import get_daily_summary
+from app.crud import crud_base as crud
+from app.models import sql_models as models
+from app.models.enums import MealCategory
+
+DAY = date(2026, 10, 17)
+MEALS = 5
+ENTRIES_PER_MEAL = 4
+INGREDIENTS_PER_ENTRY = 3
+# Odświeżenie użytkownika, posiłki, wpisy (selectinload), treningi, woda, produkty składników (jednym IN), daily_totals
+SUMMARY_QUERY_CEILING = 7
+
+
+def _log_day(db, user):
+    for n in range(MEALS * ENTRIES_PER_MEAL * INGREDIENTS_PER_ENTRY):
+        db.add(models.Product(name=f"składnik {n}", nutrients={"calories": n, "protein": 1, "fat": 1, "carbs": 1}))
+    ingredient = 0
+    for m, category in zip(range(MEALS), list(MealCategory) * MEALS):
+        meal = models.Meal(name=f"posiłek {m}", date=DAY, category=category, owner_id=user.id)
+        for e in range(ENTRIES_PER_MEAL):
+            details = []
+            for _ in range(INGREDIENTS_PER_ENTRY):
+                details.append({"name": f"Składnik {ingredient}", "quantity_grams": 10})
+                ingredient += 1
+            meal.entries.append(models.MealEntry(
+                product_name=f"danie {m}.{e}", calories=100, protein=5, fat=3, carbs=12,
+                original_amount=1, original_unit="porcja", standardized_grams=200, deconstruction_details=details,
+            ))
+        db.add(meal)
+    db.add(models.Workout(name="bieg", date=DAY, calories_burned=300, owner_id=user.id))
+    db.add(models.WaterEntry(amount=500, date=DAY, owner_id=user.id))
+    db.commit()
+    crud.refresh_daily_totals(db, user_id=user.id, days=[DAY])
+    db.commit()
+
+
+def test_daily_summary_query_count_does_not_grow_with_entries(db, make_user, statements):
+    user = make_user()
+    _log_day(db, user)
+    db.expire_all()
+    statements.clear()
+
+    summary = get_daily_summary(target_date=DAY, db=db, current_user=user)
+
+    assert len(summary.meals) == MEALS
+    assert sum(len(meal.entries) for meal in summary.meals) == MEALS * ENTRIES_PER_MEAL
+    enriched = [detail for meal in summary.meals for entry in meal.entries for detail in entry.deconstruction_details]
+    assert len(enriched) == MEALS * ENTRIES_PER_MEAL * INGREDIENTS_PER_ENTRY
+    assert all(detail["nutrients_per_100g"] for detail in enriched)
+    assert summary.calories_consumed == 100 * MEALS * ENTRIES_PER_MEAL
+    assert len(statements) <= SUMMARY_QUERY_CEILING, statements
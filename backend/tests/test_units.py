@@ -0,0 +1,146 @@
+import math
+import random
+
+import pytest
+
+from app.core import units
+from app.models.enums import ProductState
+
+# Poprzednia implementacja (lista jednostek + łańcuch warunków) - wzorzec zachowania dla skompilowanej tablicy
+LEGACY_KNOWN_UNITS = [
+    "g", "gram", "gramy",
+    "dag", "dkg", "dekagram",
+    "kg", "kilogram", "kilogramy",
+    "ml", "mililitr", "mililitry",
+    "l", "litr", "litry",
+    "szklanka", "szklanki",
+    "łyżka", "łyżki",
+    "łyżeczka", "łyżeczki",
+    "talerz", "miska", "plaster", "kromka", "garść",
+    "sztuka", "sztuki", "szt.", "szt"
+]
+LEGACY_SOLID = {
+    "g": 1, "gram": 1, "gramy": 1, "dag": 10, "dkg": 10, "dekagram": 10, "kg": 1000, "kilogram": 1000, "kilogramy": 1000,
+    "szklanka": 150.0, "szklanki": 150.0, "łyżka": 15.0, "łyżki": 15.0, "łyżeczka": 5.0, "łyżeczki": 5.0,
+    "talerz": 200.0, "miska": 180.0, "plaster": 20.0, "kromka": 35.0, "garść": 30.0,
+}
+LEGACY_LIQUID = {
+    "ml": 1, "mililitr": 1, "mililitry": 1, "l": 1000, "litr": 1000, "litry": 1000,
+    "szklanka": 250.0, "szklanki": 250.0, "łyżka": 15.0, "łyżki": 15.0, "łyżeczka": 5.0, "łyżeczki": 5.0,
+    "talerz": 300.0, "miska": 400.0,
+}
+
+
+def legacy_standardize_unit(amount, unit, state, average_weight_g=None):
+    unit_lower = str(unit).lower().strip()
+    is_piece_unit = unit_lower in ["sztuka", "sztuki", "szt.", "szt"]
+    if (unit_lower not in LEGACY_KNOWN_UNITS or is_piece_unit) and average_weight_g is not None and average_weight_g > 0:
+        return amount * average_weight_g, "g"
+    if state == ProductState.SOLID and unit_lower in LEGACY_SOLID:
+        return amount * LEGACY_SOLID[unit_lower], "g"
+    if state == ProductState.LIQUID and unit_lower in LEGACY_LIQUID:
+        return amount * LEGACY_LIQUID[unit_lower], "ml"
+    raise ValueError(unit)
+
+
+def outcome(func, *args):
+    try:
+        return func(*args)
+    except ValueError:
+        return ValueError
+
+
+def random_cases(count: int = 5000, seed: int = 42):
+    rng = random.Random(seed)
+    unit_pool = LEGACY_KNOWN_UNITS + ["jabłko", "jajka", "porcja", "opakowanie", ""]
+    cases = []
+    for _ in range(count):
+        unit = rng.choice(unit_pool)
+        unit = rng.choice([unit, unit.upper(), f"  {unit} "])
+        state = rng.choice([ProductState.SOLID, ProductState.LIQUID, "solid", "liquid"])
+        cases.append((round(rng.uniform(0, 500), 2), unit, state, rng.choice([None, 0, -5, 55.5, 120])))
+    return cases
+
+
+def is_cross_state(unit, state) -> bool:
+    return (unit.lower().strip(), units.ProductState(state)) in units.CROSS_STATE_TABLE
+
+
+def test_matches_legacy_implementation_for_legacy_units():
+    """Ten sam wynik (lub błąd) co poprzednia implementacja; jedyny wyjątek to przeliczenia przez gęstość (dawniej błąd)."""
+    for case in random_cases():
+        amount, unit, state, average_weight_g = case
+        legacy = outcome(legacy_standardize_unit, *case)
+        new = outcome(units.standardize_unit, *case)
+        if legacy is ValueError and is_cross_state(unit, state):
+            continue
+        assert new == legacy, case
+
+
+def test_standardize_many_agrees_with_standardize_unit():
+    cases = random_cases()
+    amounts, unit_names, states, average_weights = zip(*cases)
+    values, base_units = units.standardize_many(amounts, unit_names, states, average_weights)
+    assert len(values) == len(base_units) == len(cases)
+    for case, value, base_unit in zip(cases, values, base_units):
+        expected = outcome(units.standardize_unit, *case)
+        if expected is ValueError:
+            assert base_unit is None and math.isnan(value), case
+        else:
+            assert value == pytest.approx(expected[0]) and base_unit == expected[1], case
+
+
+def test_standardize_many_passes_densities_per_item():
+    values, base_units = units.standardize_many(
+        [206, 100, 2], ["g", "ml", "łyżki"], ["liquid", "solid", "solid"], densities_g_per_ml=[1.03, 0.55, 2.0]
+    )
+    assert list(values) == pytest.approx([200.0, 55.0, 30.0])
+    assert base_units == ["ml", "g", "g"]
+
+
+@pytest.mark.parametrize("amount, unit, state", [
+    (250, "g", ProductState.SOLID), (3, "łyżek", ProductState.SOLID), (2, "kromki", ProductState.SOLID),
+    (1.5, "l", ProductState.LIQUID), (1, "szklankę", ProductState.LIQUID), (2, "kg", ProductState.LIQUID),
+])
+def test_standardized_amount_is_stable_in_its_base_unit(amount, unit, state):
+    """Wynik podany ponownie w jednostce bazowej (g/ml) nie zmienia się - przeliczenie jest idempotentne."""
+    value, base_unit = units.standardize_unit(amount, unit, state)
+    assert units.standardize_unit(value, base_unit, state) == (pytest.approx(value), base_unit)
+
+
+@pytest.mark.parametrize("args, expected", [
+    ((3, "łyżek", ProductState.SOLID), (45.0, "g")),
+    ((1, "szklankę", ProductState.LIQUID), (250.0, "ml")),
+    ((2, "plasterki", ProductState.SOLID), (40.0, "g")),
+    ((2, "kromek", ProductState.SOLID, 25), (70.0, "g")),
+    ((3, "szt.", ProductState.SOLID, 55.5), (166.5, "g")),
+    ((2, "jabłko", ProductState.SOLID, 120), (240.0, "g")),
+])
+def test_unit_forms_and_piece_weights(args, expected):
+    value, base_unit = units.standardize_unit(*args)
+    assert (value, base_unit) == (pytest.approx(expected[0]), expected[1])
+
+
+@pytest.mark.parametrize("density", [None, 0, -1, 0.55, 1.03, 2.5])
+def test_cross_state_conversion_round_trips_through_density(density):
+    """Masa płynu -> objętość (dzieląc przez gęstość) i z powrotem daje wyjściową masę; brak gęstości to 1 g/ml."""
+    effective = density if density and density > 0 else units.DEFAULT_DENSITY_G_PER_ML
+    volume, volume_unit = units.standardize_unit(300, "g", ProductState.LIQUID, None, density)
+    assert (volume, volume_unit) == (pytest.approx(300 / effective), "ml")
+    mass, mass_unit = units.standardize_unit(volume, "ml", ProductState.SOLID, None, density)
+    assert (mass, mass_unit) == (pytest.approx(300), "g")
+
+
+def test_density_does_not_affect_same_state_units():
+    assert units.standardize_unit(2, "szklanki", ProductState.LIQUID, None, 1.5) == (500.0, "ml")
+    assert units.standardize_unit(2, "kg", ProductState.SOLID, None, 0.5) == (2000.0, "g")
+
+
+@pytest.mark.parametrize("args", [
+    (1, "jabłko", ProductState.SOLID),
+    (2, "sztuki", ProductState.LIQUID, 0),
+    (1, "plaster", ProductState.LIQUID),
+])
+def test_unconvertible_units_raise(args):
+    with pytest.raises(ValueError):
+        units.standardize_unit(*args)